@@ -0,0 +1,43 @@
+`timescale 1ps/1ps
+// ram_1r1w_sync with a byte-enable write port: only the bytes selected by
+// wr_mask_i are written, so sub-word stores don't need a read-modify-write
+module ram_1r1w_sync_be
+  #(parameter [31:0] width_p = 32
+  ,parameter [31:0] depth_p = 512)
+  (input [0:0] clk_i
+  ,input [0:0] reset_i
+
+  ,input [0:0] wr_valid_i
+  ,input [width_p-1:0] wr_data_i
+  ,input [(width_p/8)-1:0] wr_mask_i
+  ,input [$clog2(depth_p) - 1 : 0] wr_addr_i
+
+  ,input [0:0] rd_valid_i
+  ,input [$clog2(depth_p) - 1 : 0] rd_addr_i
+  ,output [width_p-1:0] rd_data_o);
+
+  logic [width_p-1:0] mem[depth_p-1:0];
+
+   reg [width_p-1:0] rd_data_r;
+
+   always_ff @(posedge clk_i) begin
+    if(reset_i) begin
+      rd_data_r <= '0;
+    end else begin
+      //reading
+      if(rd_valid_i) begin
+        rd_data_r <= mem[rd_addr_i];
+      end
+      //writing, one enable per byte lane
+      if(wr_valid_i) begin
+        for (int i = 0; i < width_p/8; i++) begin
+          if (wr_mask_i[i]) mem[wr_addr_i][8*i +: 8] <= wr_data_i[8*i +: 8];
+        end
+      end
+    end
+   end
+   //output a read data register, not the data directly
+   //this is what makes it a synchronous read memory
+   assign rd_data_o = rd_data_r;
+
+endmodule
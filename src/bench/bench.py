@@ -0,0 +1,99 @@
+"""Benchmark programs for the cores and their expected results.
+
+Every *.s file in this directory is a benchmark. Comment lines like
+
+    # expect: a0 = 0xcbf43926
+    # expect: lens = 0, 1, 6
+    # expect: signed+64 = -161, -149
+
+give the register value, or the data memory words starting at a data
+symbol (plus a byte offset), the program must leave behind when it
+reaches ecall. Results are checked outside the simulator so the same
+expectations work against the RV32I model.
+"""
+import re
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "cpu"))
+from rv32i_asm import REGISTERS, load_image  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+MASK32 = 0xFFFFFFFF
+
+EXPECT_RE = re.compile(r"#\s*expect:\s*([\w.$]+)\s*(?:\+\s*(\w+))?\s*=\s*(.+)$")
+
+Benchmark = namedtuple("Benchmark", "name path program expects")
+# register is None for memory expectations, address is then a byte address
+Expect = namedtuple("Expect", "text register address values")
+
+
+def parse_expects(source, symbols, name="benchmark"):
+    expects = []
+    for line in source.splitlines():
+        match = EXPECT_RE.search(line)
+        if not match:
+            continue
+        target, offset, values = match.groups()
+        values = [int(value, 0) & MASK32 for value in values.split(",")]
+        if target in REGISTERS and offset is None:
+            if len(values) != 1:
+                raise ValueError(f"{name}: {line.strip()!r} gives more than one register value")
+            expects.append(Expect(line.strip(), REGISTERS[target], None, values))
+        elif target in symbols:
+            address = symbols[target] + (int(offset, 0) if offset else 0)
+            expects.append(Expect(line.strip(), None, address, values))
+        else:
+            raise ValueError(f"{name}: {target!r} is neither a register nor a symbol")
+    if not expects:
+        raise ValueError(f"{name} has no '# expect:' lines")
+    return expects
+
+
+def load_benchmark(path):
+    path = Path(path)
+    program = load_image(path)
+    return Benchmark(path.stem, path, program, parse_expects(path.read_text(), program.symbols, path.stem))
+
+
+def load_benchmarks(names=None, bench_dir=BENCH_DIR):
+    """Benchmarks in bench_dir, all of them or the ones named (in that order)"""
+    paths = {path.stem: path for path in sorted(Path(bench_dir).glob("*.s"))}
+    if names:
+        unknown = [name for name in names if name not in paths]
+        if unknown:
+            raise ValueError(f"unknown benchmarks {unknown}, have {sorted(paths)}")
+        paths = {name: paths[name] for name in names}
+    return [load_benchmark(path) for path in paths.values()]
+
+
+def check(benchmark, regs, data_words):
+    """Mismatches between the final state and the expectations, [] if it passed"""
+    errors = []
+    for expect in benchmark.expects:
+        if expect.register is not None:
+            actual = [regs[expect.register] & MASK32]
+        else:
+            first = expect.address // 4
+            actual = [data_words[(first + i) % len(data_words)] & MASK32 for i in range(len(expect.values))]
+        if actual != expect.values:
+            errors.append(f"{expect.text}: got {', '.join(f'{value:#x}' for value in actual)}")
+    return errors
+
+
+def result(benchmark, cycles, instret, errors, icache=None, branches=None):
+    """One benchmark's entry in the results file.
+
+    icache and branches are the core's ICacheStats and BranchStats, if it has them.
+    """
+    return {
+        "name": benchmark.name,
+        "cycles": cycles,
+        "instret": instret,
+        "cpi": round(cycles / instret, 4) if instret else None,
+        "icache": icache._asdict() if icache else None,
+        "branches": branches._asdict() if branches else None,
+        "passed": not errors,
+        "errors": errors,
+    }
@@ -0,0 +1,60 @@
+import json
+import os
+
+import cocotb
+from cocotb.clock import Clock
+
+from bench import check, load_benchmarks, result
+from core_coverage import save_coverage, start_coverage
+from lockstep import LockstepChecker
+from perf_report import log_report, read_icache, read_predictor
+from program_loader import load_program, run_until_halt
+from tb_utils import CLOCK_PERIOD_NS, read_memory, read_registers, reset
+from waves import record_waves
+
+@cocotb.test()
+@record_waves
+async def test_benchmarks(dut):
+    """Run every benchmark (or BENCH=name,name) to ecall and check its results.
+
+    Cycles, instructions and CPI per benchmark go to BENCH_JSON if set.
+    BENCH_LOCKSTEP=0 lets the core run freely instead of checking every
+    instruction against the model, only the final results are checked.
+    """
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+    coverage = start_coverage(dut)
+
+    names = [name for name in os.getenv("BENCH", "").split(",") if name]
+    lockstep = os.getenv("BENCH_LOCKSTEP", "1") != "0"
+    results = []
+    for benchmark in load_benchmarks(names):
+        await load_program(dut, benchmark.program)
+        await reset(dut)
+
+        # Lockstep points at the first wrong instruction rather than just a wrong result
+        try:
+            if lockstep:
+                await LockstepChecker(dut).run(max_cycles=1000000)
+            else:
+                await run_until_halt(dut, max_cycles=1000000)
+        except AssertionError as e:
+            results.append(result(benchmark, None, None, [str(e)]))
+            continue
+        counters = log_report(dut, benchmark.name)
+
+        regs = read_registers(dut, x=0)
+        errors = check(benchmark, regs, read_memory(dut.data_mem.data_ram.mem))
+        results.append(result(benchmark, counters.cycles, counters.instret, errors, read_icache(dut),
+                              read_predictor(dut)))
+
+    if os.getenv("BENCH_JSON"):
+        with open(os.environ["BENCH_JSON"], "w") as f:
+            json.dump({"core": dut._name, "benchmarks": results}, f, indent=2)
+
+    for entry in results:
+        dut._log.info(f"{entry['name']:12} {entry['cycles'] or 0:8} cycles {entry['instret'] or 0:8} "
+                      f"instructions CPI {entry['cpi'] or 0:6.3f} {'PASS' if entry['passed'] else 'FAIL'}")
+    save_coverage(coverage, "test_benchmarks")
+    failed = {entry["name"]: entry["errors"] for entry in results if not entry["passed"]}
+    assert not failed, f"benchmarks failed: {failed}"
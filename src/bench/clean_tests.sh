@@ -0,0 +1 @@
+rm -rf __pycache__ .pytest_cache bench_sim_build riscv_core_bench_sim_build riscv_core_pipelined_bench_sim_build
@@ -0,0 +1,48 @@
+# crc32: bitwise CRC-32 (reflected, polynomial 0xedb88320) of the standard
+# check string and of the bytes 0..255.
+# expect: a0 = 0xcbf43926
+# expect: a1 = 0x29058c73
+        .data
+check:  .ascii "123456789"
+        .align 2
+ramp:   .space 256
+        .text
+        li   sp, 4096
+        la   t0, ramp
+        li   t1, 0
+        li   t2, 256
+fill:   add  t3, t0, t1
+        sb   t1, 0(t3)
+        addi t1, t1, 1
+        bne  t1, t2, fill
+
+        la   a0, check
+        li   a1, 9
+        call crc32
+        mv   s0, a0
+        la   a0, ramp
+        li   a1, 256
+        call crc32
+        mv   a1, a0
+        mv   a0, s0
+halt:   ecall
+
+# crc32(a0 = buffer, a1 = bytes) -> a0
+crc32:  li   t0, -1
+        li   t3, 0xedb88320
+cbyte:  beqz a1, cdone
+        lbu  t1, 0(a0)
+        xor  t0, t0, t1
+        li   t2, 8
+cbit:   andi t4, t0, 1
+        neg  t4, t4             # all ones when the low bit is set
+        and  t4, t4, t3
+        srli t0, t0, 1
+        xor  t0, t0, t4
+        addi t2, t2, -1
+        bnez t2, cbit
+        addi a0, a0, 1
+        addi a1, a1, -1
+        j    cbyte
+cdone:  not  a0, t0
+        ret
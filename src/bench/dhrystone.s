@@ -0,0 +1,112 @@
+# dhrystone: Dhrystone-flavoured loop. Each run copies a record through a
+# nested call, compares two strings, updates an array and goes through
+# a small switch, all folded into a checksum.
+# expect: a0 = 0x00004b5e
+# expect: a1 = 8000
+# expect: arr = 1099, 1141, 870, 906, 942, 978, 1014, 1050
+# expect: rec_b = 1177, 2, 3, 52
+        .equ RUNS, 50
+        .data
+rec_a:  .word 1, 2, 3, 4
+rec_b:  .space 16
+arr:    .space 32
+str_1:  .asciz "DHRYSTONE PROGRAM, 1'ST STRING"
+str_2:  .asciz "DHRYSTONE PROGRAM, 2'ND STRING"
+        .text
+        li   sp, 4096
+        li   s0, 0              # run
+        li   s1, 0              # checksum
+        li   s2, RUNS
+run:    la   a0, rec_b
+        la   a1, rec_a
+        call proc_1
+        # Change rec_a so each run copies something new
+        la   t0, rec_a
+        lw   t1, 0(t0)
+        add  t1, t1, s0
+        sw   t1, 0(t0)
+        lw   t1, 12(t0)
+        xor  t1, t1, s0
+        sw   t1, 12(t0)
+
+        la   a0, str_1
+        la   a1, str_2
+        call strcmp
+        add  s1, s1, a0
+
+        # arr[run % 8] += 5 * (run + 3) - 2 + run
+        addi t0, s0, 3
+        slli t1, t0, 2
+        add  t1, t1, t0
+        addi t1, t1, -2
+        andi t2, s0, 7
+        slli t2, t2, 2
+        la   t3, arr
+        add  t3, t3, t2
+        lw   t4, 0(t3)
+        add  t4, t4, t1
+        add  t4, t4, s0
+        sw   t4, 0(t3)
+
+        andi t0, s0, 3
+        beqz t0, case_0
+        li   t5, 1
+        beq  t0, t5, case_1
+        li   t5, 2
+        beq  t0, t5, case_2
+        addi s1, s1, 7
+        j    switched
+case_0: addi s1, s1, 1
+        j    switched
+case_1: xori s1, s1, 0x55
+        j    switched
+case_2: sub  s1, s1, s0
+switched:
+        la   t0, rec_b
+        lw   t1, 0(t0)
+        lw   t2, 12(t0)
+        add  s1, s1, t1
+        xor  s1, s1, t2
+        addi s0, s0, 1
+        bltu s0, s2, run
+
+        la   t0, arr
+        li   t1, 8
+        li   a1, 0
+asum:   lw   t2, 0(t0)
+        add  a1, a1, t2
+        addi t0, t0, 4
+        addi t1, t1, -1
+        bnez t1, asum
+        mv   a0, s1
+halt:   ecall
+
+# proc_1(a0 = dst, a1 = src): record assignment through a second call
+proc_1: addi sp, sp, -16
+        sw   ra, 12(sp)
+        call copy_rec
+        lw   ra, 12(sp)
+        addi sp, sp, 16
+        ret
+
+copy_rec:
+        lw   t0, 0(a1)
+        lw   t1, 4(a1)
+        lw   t2, 8(a1)
+        lw   t3, 12(a1)
+        sw   t0, 0(a0)
+        sw   t1, 4(a0)
+        sw   t2, 8(a0)
+        sw   t3, 12(a0)
+        ret
+
+# strcmp(a0, a1) -> difference of the first differing bytes, 0 if equal
+strcmp: lbu  t0, 0(a0)
+        lbu  t1, 0(a1)
+        bne  t0, t1, sdiff
+        beqz t0, sdiff
+        addi a0, a0, 1
+        addi a1, a1, 1
+        j    strcmp
+sdiff:  sub  a0, t0, t1
+        ret
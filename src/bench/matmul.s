@@ -0,0 +1,84 @@
+# matmul: C = A * B for 8x8 signed word matrices. RV32I has no multiply,
+# mul is a shift-and-add subroutine.
+# expect: a0 = 32
+# expect: a1 = 4294967246
+# expect: C = -16, -9, 111, -21, -164, 68, 92, -32
+# expect: C+224 = -104, 151, -78, -83, -2, 5, 44, 14
+        .equ N, 8
+        .data
+A:      .word 2, -4, 4, -7, -6, -5, 3, -7
+        .word 8, -2, -7, -6, 5, 5, -6, -1
+        .word -6, 5, -7, -5, -1, -7, 4, -7
+        .word -1, -7, -4, 1, 5, -4, -5, 1
+        .word -3, -5, -2, 3, -5, -6, -7, -2
+        .word 7, 5, 2, 6, 6, 3, 1, -1
+        .word -3, -1, -6, 1, 8, 7, 2, 6
+        .word 1, -6, -5, 8, 5, -3, 2, -4
+B:      .word 7, 5, -7, -6, 2, 2, 3, 7
+        .word 6, -6, -6, 0, 7, -6, -7, 1
+        .word 6, 1, 4, 3, -8, 6, 3, -3
+        .word -5, 7, -7, -2, 1, -4, -1, 4
+        .word 4, 7, -6, -3, 6, 4, 0, -4
+        .word 5, 0, 5, 3, 4, -1, -4, -6
+        .word -3, -4, -1, -1, -8, 7, -3, 0
+        .word 1, -8, -4, 5, 3, 2, -4, 8
+C:      .space 256
+        .text
+        li   sp, 4096
+        la   s0, A              # row i of A
+        la   s6, C              # C[i][j]
+        li   s1, 0              # i
+row:    li   s2, 0              # j
+col:    li   s5, 0              # sum
+        mv   s3, s0             # A[i][k]
+        la   s4, B
+        slli t0, s2, 2
+        add  s4, s4, t0         # B[k][j]
+        li   s7, N              # k countdown
+dot:    lw   a0, 0(s3)
+        lw   a1, 0(s4)
+        call mul
+        add  s5, s5, a0
+        addi s3, s3, 4
+        addi s4, s4, 32
+        addi s7, s7, -1
+        bnez s7, dot
+        sw   s5, 0(s6)
+        addi s6, s6, 4
+        addi s2, s2, 1
+        li   t0, N
+        bne  s2, t0, col
+        addi s0, s0, 32
+        addi s1, s1, 1
+        bne  s1, t0, row
+
+        # Checksum and trace of C
+        la   t0, C
+        li   t1, 64
+        li   a0, 0
+csum:   lw   t2, 0(t0)
+        add  a0, a0, t2
+        addi t0, t0, 4
+        addi t1, t1, -1
+        bnez t1, csum
+        la   t0, C
+        li   t1, N
+        li   a1, 0
+trace:  lw   t2, 0(t0)
+        add  a1, a1, t2
+        addi t0, t0, 36
+        addi t1, t1, -1
+        bnez t1, trace
+halt:   ecall
+
+# mul(a0, a1) -> a0, low 32 bits of the product (signed or unsigned)
+mul:    li   t0, 0
+mloop:  beqz a1, mdone
+        andi t1, a1, 1
+        beqz t1, mskip
+        add  t0, t0, a0
+mskip:  slli a0, a0, 1
+        srli a1, a1, 1
+        j    mloop
+mdone:  mv   a0, t0
+        ret
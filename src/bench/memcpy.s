@@ -0,0 +1,61 @@
+# memcpy: fill a 1 KiB buffer from an xorshift32 generator, copy 1023
+# bytes of it a word at a time plus a byte tail, then checksum the copy.
+# expect: a0 = 0x031a1576
+# expect: dst = 0x2b1f4d63, 0x94dacb7a, 0x7b0859a0, 0x77b0567e
+# expect: a1 = 0x003132bf
+        .equ WORDS, 256
+        .equ BYTES, 1023
+        .data
+src:    .space 1024
+dst:    .space 1024
+        .text
+        li   sp, 4096
+        # xorshift32 into src
+        la   t0, src
+        li   t1, WORDS
+        li   t2, 2463534242
+fill:   slli t3, t2, 13
+        xor  t2, t2, t3
+        srli t3, t2, 17
+        xor  t2, t2, t3
+        slli t3, t2, 5
+        xor  t2, t2, t3
+        sw   t2, 0(t0)
+        addi t0, t0, 4
+        addi t1, t1, -1
+        bnez t1, fill
+
+        la   a0, dst
+        la   a1, src
+        li   a2, BYTES
+        call memcpy
+
+        # Sum every word of dst, the last one only partly copied
+        la   t0, dst
+        li   t1, WORDS
+        li   a0, 0
+sum:    lw   a1, 0(t0)
+        add  a0, a0, a1
+        addi t0, t0, 4
+        addi t1, t1, -1
+        bnez t1, sum
+halt:   ecall
+
+# memcpy(a0 = dst, a1 = src, a2 = bytes), dst and src word aligned
+memcpy: andi t0, a2, -4
+        add  t0, a1, t0         # end of the whole words
+        andi t2, a2, 3          # tail bytes
+words:  beq  a1, t0, tail
+        lw   t1, 0(a1)
+        addi a1, a1, 4
+        sw   t1, 0(a0)
+        addi a0, a0, 4
+        j    words
+tail:   beqz t2, done
+        lbu  t1, 0(a1)
+        addi a1, a1, 1
+        sb   t1, 0(a0)
+        addi a0, a0, 1
+        addi t2, t2, -1
+        j    tail
+done:   ret
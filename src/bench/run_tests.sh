@@ -0,0 +1 @@
+pytest test_bench_runner.py
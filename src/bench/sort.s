@@ -0,0 +1,68 @@
+# sort: insertion sort of signed words and bubble sort of unsigned words,
+# in place. The extremes of both ranges are in there, so the compares
+# have to get the sign right.
+# expect: signed = -2147483648, -848, -697, -628, -590, -578, -554, -498, -457, -378, -367, -324, -275, -161, -149, -41
+# expect: signed+64 = -38, 20, 63, 79, 91, 113, 184, 260, 302, 336, 411, 441, 452, 467, 481, 490
+# expect: signed+128 = 490, 491, 497, 505, 541, 550, 553, 585, 664, 702, 775, 785, 817, 893, 972, 2147483647
+# expect: unsigned = 0x10c1525a, 0x1915ec28, 0x21cb664a, 0x2b790602, 0x34f81895, 0x54f1b974, 0x55e3679f, 0x5656a72a, 0x7707af4d, 0x94bdca5e, 0x9fa71a59, 0xaf1f7fa6
+# expect: unsigned+48 = 0xafc3434b, 0xb2122b13, 0xb56211cc, 0xb6770b11, 0xc48ff480, 0xd7f35ceb, 0xdc769927, 0xdc79e8e8, 0xecad86a1, 0xf0a737c3, 0xf0edeb0c, 0xffc9492c
+        .equ SIGNED, 48
+        .equ UNSIGNED, 24
+        .data
+signed: .word -578, 497, -378, 411, -498, 585, 260, 491
+        .word -590, 2147483647, 553, -275, 550, 302, 505, 441
+        .word 336, 452, 702, 664, 490, -38, -554, -628
+        .word -848, -41, 63, 817, 20, 467, -2147483648, 113
+        .word 541, -457, 785, 79, 972, -149, -161, 481
+        .word -324, -697, 893, 490, 184, -367, 91, 775
+unsigned:.word 0x9fa71a59, 0x5656a72a, 0x55e3679f, 0xf0a737c3, 0xb56211cc, 0xffc9492c
+        .word 0xb6770b11, 0x7707af4d, 0xdc79e8e8, 0x2b790602, 0xaf1f7fa6, 0xb2122b13
+        .word 0xc48ff480, 0xdc769927, 0x21cb664a, 0x54f1b974, 0xecad86a1, 0x34f81895
+        .word 0x94bdca5e, 0xafc3434b, 0x10c1525a, 0x1915ec28, 0xf0edeb0c, 0xd7f35ceb
+        .text
+        li   sp, 4096
+        la   a0, signed
+        li   a1, SIGNED
+        call isort
+        la   a0, unsigned
+        li   a1, UNSIGNED
+        call bsort
+halt:   ecall
+
+# isort(a0 = words, a1 = count), signed ascending
+isort:  li   t0, 1              # i
+iloop:  bge  t0, a1, idone
+        slli t1, t0, 2
+        add  t1, a0, t1         # hole
+        lw   t2, 0(t1)          # key
+ishift: beq  t1, a0, iplace
+        lw   t3, -4(t1)
+        bge  t2, t3, iplace
+        sw   t3, 0(t1)
+        addi t1, t1, -4
+        j    ishift
+iplace: sw   t2, 0(t1)
+        addi t0, t0, 1
+        j    iloop
+idone:  ret
+
+# bsort(a0 = words, a1 = count), unsigned ascending, stops early once sorted
+bsort:  addi a1, a1, -1         # compares in the next pass
+bpass:  blez a1, bdone
+        mv   t0, a0
+        slli t1, a1, 2
+        add  t1, a0, t1         # last element of the pass
+        li   t4, 0              # swapped
+bstep:  beq  t0, t1, bnext
+        lw   t2, 0(t0)
+        lw   t3, 4(t0)
+        bleu t2, t3, bkeep
+        sw   t3, 0(t0)
+        sw   t2, 4(t0)
+        li   t4, 1
+bkeep:  addi t0, t0, 4
+        j    bstep
+bnext:  beqz t4, bdone
+        addi a1, a1, -1
+        j    bpass
+bdone:  ret
@@ -0,0 +1,41 @@
+# strlen: length of each string in a table with a byte-at-a-time loop,
+# lengths stored to lens and summed.
+# expect: a0 = 432
+# expect: lens = 0, 1, 6, 43, 231, 32, 100, 19
+        .equ COUNT, 8
+        .data
+strs:   .word s0, s1, s2, s3, s4, s5, s6, s7
+lens:   .space 32
+s0:     .asciz ""
+s1:     .asciz "a"
+s2:     .asciz "RISC-V"
+s3:     .asciz "The quick brown fox jumps over the lazy dog"
+s4:     .asciz "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat."
+s5:     .asciz "0123456789abcdef0123456789abcdef"
+s6:     .asciz "xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+s7:     .asciz "\tTabs and\nnewlines\n"
+        .text
+        li   sp, 4096
+        la   s0, strs
+        la   s1, lens
+        li   s2, COUNT
+        li   s3, 0              # total
+next:   lw   a0, 0(s0)
+        call strlen
+        sw   a0, 0(s1)
+        add  s3, s3, a0
+        addi s0, s0, 4
+        addi s1, s1, 4
+        addi s2, s2, -1
+        bnez s2, next
+        mv   a0, s3
+halt:   ecall
+
+# strlen(a0 = string) -> a0
+strlen: mv   t0, a0
+scan:   lbu  t1, 0(t0)
+        addi t0, t0, 1
+        bnez t1, scan
+        sub  a0, t0, a0
+        addi a0, a0, -1
+        ret
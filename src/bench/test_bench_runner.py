@@ -0,0 +1,62 @@
+"""Benchmark runner: every program in src/bench on a core, results to JSON.
+
+    python test_bench_runner.py --sim verilator
+    python test_bench_runner.py --sim verilator --core riscv_core_pipelined -b crc32 -b sort
+    python test_bench_runner.py --sim verilator --no-lockstep   # final results only, faster
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "cpu"))
+from test_riscv_core_runner import run_tests as run_core_tests  # noqa: E402
+
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}]
+
+def run_tests(sim=None, build_dir="bench_sim_build", parameters=None, results_xml=None,
+              toplevel="riscv_core", benchmarks=None, results_json=None, lockstep=True):
+    """Run the benchmarks (all by default) and write bench_results.json to the build directory"""
+    results_json = Path(results_json or Path(build_dir) / "bench_results.json").resolve()
+    results_json.parent.mkdir(parents=True, exist_ok=True)
+    # Goes to the simulator only, this process keeps its environment
+    env = {"BENCH_JSON": str(results_json), "BENCH": ",".join(benchmarks or []),
+           "BENCH_LOCKSTEP": "1" if lockstep else "0"}
+    return run_core_tests(sim, build_dir, parameters, results_xml, testcase="test_benchmarks",
+                          toplevel=toplevel, test_module="bench_tb", extra_env=env)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark programs on a core")
+    parser.add_argument("--sim", default=os.getenv("SIM", "icarus"))
+    parser.add_argument("--core", default="riscv_core", choices=["riscv_core", "riscv_core_pipelined"])
+    parser.add_argument("-b", "--bench", action="append", help="only run this benchmark (repeatable)")
+    parser.add_argument("--out", help="results JSON (default: bench_results.json in the build directory)")
+    parser.add_argument("--no-lockstep", action="store_true",
+                        help="don't check every instruction against the model, just the results")
+    args = parser.parse_args(argv)
+
+    build_dir = Path(f"{args.core}_bench_sim_build")
+    results_json = Path(args.out or build_dir / "bench_results.json")
+    run_tests(args.sim, build_dir, toplevel=args.core, benchmarks=args.bench, results_json=results_json,
+              lockstep=not args.no_lockstep)
+    results = json.loads(results_json.read_text())
+    for entry in results["benchmarks"]:
+        # Benchmarks that failed lockstep or never halted have no counts
+        print(f"{entry['name']:12} {entry['cycles'] or 0:>8} cycles {entry['instret'] or 0:>8} instructions "
+              f"CPI {entry['cpi'] or float('nan'):6.3f}  {'PASS' if entry['passed'] else 'FAIL'}")
+        for error in entry["errors"]:
+            print(f"    {error}")
+    print(f"Results: {results_json}")
+    return 0 if all(entry["passed"] for entry in results["benchmarks"]) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+@pytest.mark.parametrize("simulator", SIMULATORS)
+def test_bench_runner(simulator):
+    run_tests(simulator)
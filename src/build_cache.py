@@ -0,0 +1,194 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import cocotb
+
+# Bump this to invalidate every cached build after changing how keys are made
+CACHE_VERSION = 1
+STAMP_FILE = ".build_key"
+# How many configurations to keep around per build directory
+KEEP_BUILDS = 4
+
+HEADER_SUFFIXES = (".vh", ".svh")
+
+# Build profiles, picked with SIM_PROFILE. debug keeps the simulators'
+# defaults (and tracing, if WAVES asks for it). fast is for throughput
+# runs: an optimized, multithreaded Verilator model with X handling that
+# costs nothing, and never any tracing. Icarus has nothing to tune.
+DEFAULT_PROFILE = "debug"
+PROFILES = {
+    "debug": {},
+    "fast": {
+        "verilator": ["-O3", "--x-assign", "fast", "--x-initial", "fast", "--threads", "{threads}",
+                      "-CFLAGS", "-O2"],
+    },
+}
+TRACE_FLAGS = ("--trace", "--trace-fst", "--trace-structs")
+# What a failed run_tests() raises, cocotb reports build failures as SystemExit
+RUN_ERRORS = (Exception, SystemExit)
+VERSION_COMMANDS = {
+    "icarus": ["iverilog", "-V"],
+    "verilator": ["verilator", "--version"],
+}
+
+
+@lru_cache(maxsize=None)
+def simulator_version(sim):
+    """Return the first line of the simulator's version banner ("" if unknown)"""
+    cmd = VERSION_COMMANDS.get(sim)
+    if cmd is None:
+        return ""
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True).stdout
+    except OSError:
+        return ""
+    return out.splitlines()[0] if out else ""
+
+
+def include_dirs(build_kwargs):
+    dirs = [Path(d) for d in build_kwargs.get("includes", [])]
+    for arg in build_kwargs.get("build_args", []):
+        arg = str(arg)
+        if arg.startswith("-I"):
+            dirs.append(Path(arg[2:]))
+        elif arg.startswith("+incdir+"):
+            dirs.append(Path(arg[len("+incdir+"):]))
+    return dirs
+
+
+def parameter_file(value):
+    # INIT_FILE style parameters are passed as quoted strings
+    if not isinstance(value, str):
+        return None
+    path = Path(value.strip('"'))
+    return path if value.strip('"') and path.is_file() else None
+
+
+def build_key(sim, build_kwargs):
+    """Hash everything that can change the output of runner.build()"""
+    h = hashlib.sha256()
+
+    def add(*parts):
+        for part in parts:
+            h.update(str(part).encode())
+            h.update(b"\0")
+
+    add(CACHE_VERSION, sim, simulator_version(sim), cocotb.__version__)
+
+    sources = list(build_kwargs.get("verilog_sources", [])) + list(build_kwargs.get("sources", []))
+    for src in sources:
+        add(src)
+        h.update(Path(src).read_bytes())
+
+    for inc in include_dirs(build_kwargs):
+        add(inc)
+        if inc.is_dir():
+            for header in sorted(inc.iterdir()):
+                if header.suffix in HEADER_SUFFIXES:
+                    add(header)
+                    h.update(header.read_bytes())
+
+    for name, value in sorted(build_kwargs.get("parameters", {}).items()):
+        add(name, value)
+        path = parameter_file(value)
+        if path is not None:
+            h.update(path.read_bytes())
+
+    # build_args, defines, waves, timescale, ...
+    for name in sorted(build_kwargs):
+        if name not in ("verilog_sources", "sources", "includes", "parameters"):
+            add(name, repr(build_kwargs[name]))
+
+    return h.hexdigest()
+
+
+def prune(build_dir, keep=KEEP_BUILDS):
+    """Delete all but the `keep` most recently used builds in build_dir"""
+    stamps = sorted(Path(build_dir).glob(f"*/{STAMP_FILE}"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stamp in stamps[keep:]:
+        shutil.rmtree(stamp.parent, ignore_errors=True)
+
+
+def build_profile():
+    """The SIM_PROFILE build profile, debug unless set"""
+    profile = os.getenv("SIM_PROFILE") or DEFAULT_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"SIM_PROFILE={profile!r}, must be one of {', '.join(PROFILES)}")
+    return profile
+
+
+def add_profile_argument(parser):
+    """The --profile option of the command line runners, fast unless given"""
+    parser.add_argument("--profile", default="fast", choices=sorted(PROFILES),
+                        help="simulator build profile (SIM_PROFILE)")
+
+
+def use_profile(profile, jobs=1):
+    """Build with `profile` from here on, here and in any worker processes started after"""
+    # Workers inherit the environment, and pass it on to the simulators
+    os.environ["SIM_PROFILE"] = profile
+    if jobs > 1:
+        # The jobs already keep every core busy, extra model threads only contend
+        os.environ.setdefault("SIM_THREADS", "1")
+
+
+def profile_build_args(sim, profile):
+    """Extra build arguments of a profile for one simulator"""
+    # Model threads, SIM_THREADS=1 when many jobs already share the machine
+    threads = os.getenv("SIM_THREADS", "2")
+    return [arg.format(threads=threads) for arg in PROFILES[profile].get(sim, [])]
+
+
+def apply_profile(sim, profile, build_kwargs):
+    """build_kwargs with the profile's arguments added, tracing removed for fast builds"""
+    build_kwargs = dict(build_kwargs)
+    build_args = [str(arg) for arg in build_kwargs.get("build_args", [])]
+    if profile != DEFAULT_PROFILE:
+        build_args = [arg for arg in build_args if arg not in TRACE_FLAGS]
+        build_kwargs["waves"] = False
+    build_kwargs["build_args"] = build_args + profile_build_args(sim, profile)
+    return build_kwargs
+
+
+def cached_build(runner, sim, build_dir, **build_kwargs):
+    """Call runner.build() unless this exact configuration has already been built.
+
+    Each configuration gets its own directory, build_dir/<sim>-<key>, so
+    switching simulators or parameters doesn't throw the other builds away.
+    Set SIM_BUILD_CACHE=0 to force a rebuild. Returns the directory used.
+    The build profile (SIM_PROFILE) adds its arguments first. The time it
+    took and the profile end up in runner.build_seconds/build_cached/
+    build_profile for sim_stats to record.
+    """
+    start = time.monotonic()
+    runner.build_profile = build_profile()
+    build_kwargs = apply_profile(sim, runner.build_profile, build_kwargs)
+    key = build_key(sim, build_kwargs)
+    cache_dir = Path(build_dir).resolve() / f"{sim}-{key[:16]}"
+    stamp = cache_dir / STAMP_FILE
+
+    if os.getenv("SIM_BUILD_CACHE", "1") != "0" and stamp.is_file() and stamp.read_text() == key:
+        print(f"INFO: Reusing cached build in {cache_dir}")
+        # runner.test() depends on the state build() records, so still go
+        # through build(). The directory holds exactly this configuration,
+        # so the simulator's own up-to-date check (icarus' timestamps,
+        # verilator's make) has at most the unchanged sources to redo.
+        runner.build(build_dir=cache_dir, always=False, **build_kwargs)
+        stamp.touch()
+        runner.build_seconds, runner.build_cached = time.monotonic() - start, True
+        return cache_dir
+
+    if stamp.exists():
+        stamp.unlink()
+    # always=True: icarus' own timestamp check can't see parameter changes
+    runner.build(build_dir=cache_dir, always=True, **build_kwargs)
+    # Only written once the build succeeded
+    stamp.write_text(key)
+    prune(build_dir)
+    runner.build_seconds, runner.build_cached = time.monotonic() - start, False
+    return cache_dir
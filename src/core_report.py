@@ -0,0 +1,120 @@
+"""Compare riscv_core and riscv_core_pipelined: CPI and achievable clock.
+
+CPI comes from running each program to ecall on both cores (test_lockstep
+with PERF_JSON set). Fmax comes from yosys synth_ice40 and nextpnr-ice40
+for the iCEBreaker's UP5K; without those tools installed that column
+reads n/a. Time per instruction is CPI / Fmax, the number that decides
+which core is faster. Each --predictor adds a row for the pipelined core
+built with that branch predictor.
+
+    python core_report.py --sim verilator
+    python core_report.py --sim verilator --program memory/sum_program.s --no-fmax
+    python core_report.py --sim verilator --predictor static --predictor gshare --program bench/sort.s
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SRC_DIR / "cpu"))
+from riscv_pkg import predictor_e  # noqa: E402
+from test_riscv_core_runner import core_sources, run_tests  # noqa: E402
+
+CORES = ["riscv_core", "riscv_core_pipelined"]
+PREDICTORS = {predictor.name[len("BP_"):].lower(): predictor for predictor in predictor_e}
+DEFAULT_PROGRAMS = [SRC_DIR / "memory" / "sum_program.s"]
+FMAX_RE = re.compile(r"Max frequency for clock\s+'[^']*':\s+([\d.]+) MHz")
+
+
+def job_name(core, parameters):
+    """riscv_core_pipelined/gshare for the pipelined core with a predictor"""
+    predictor = parameters.get("BRANCH_PREDICTOR")
+    return core if predictor is None else f"{core}/{predictor_e(predictor).name[len('BP_'):].lower()}"
+
+
+def measure_cpi(core, program, sim, out_dir, parameters=None):
+    """Cycle and instruction counts for one program on one core"""
+    job_dir = out_dir / job_name(core, parameters or {})
+    perf_json = job_dir / f"{Path(program).stem}.json"
+    job_dir.mkdir(parents=True, exist_ok=True)
+    if perf_json.exists():
+        perf_json.unlink()
+    run_tests(sim, build_dir=job_dir / "build", parameters=parameters, program=program,
+              testcase="test_lockstep", results_xml=str(job_dir / "results.xml"), toplevel=core,
+              extra_env={"PERF_JSON": str(perf_json)})
+    if not perf_json.exists():
+        raise RuntimeError(f"{core} didn't finish {program}, see the log above")
+    return json.loads(perf_json.read_text())
+
+
+def measure_fmax(core, out_dir, parameters=None, device="up5k", package="sg48"):
+    """Post place-and-route Fmax in MHz, None when yosys/nextpnr-ice40 aren't installed"""
+    if not (shutil.which("yosys") and shutil.which("nextpnr-ice40")):
+        return None
+    parameters = parameters or {}
+    job_dir = out_dir / job_name(core, parameters)
+    job_dir.mkdir(parents=True, exist_ok=True)
+    netlist = job_dir / f"{core}.json"
+    sources = " ".join(str(path) for path in core_sources(core))
+    # halted_o is the cores' only output, keep the write-back value so
+    # synthesis doesn't optimise the whole datapath away
+    chparams = "".join(f"chparam -set {key} {value} {core}; " for key, value in parameters.items())
+    script = (f"read_verilog -sv {sources}; {chparams}hierarchy -top {core}; "
+              f"setattr -set keep 1 {core}/w:write_back_data; synth_ice40 -top {core} -json {netlist}")
+    subprocess.run(["yosys", "-q", "-l", str(job_dir / "yosys.log"), "-p", script], check=True)
+    pnr = subprocess.run(["nextpnr-ice40", f"--{device}", "--package", package, "--json", str(netlist),
+                          "--pcf-allow-unconstrained", "--freq", "12"],
+                         capture_output=True, text=True, check=True)
+    (job_dir / "nextpnr.log").write_text(pnr.stderr)
+    # nextpnr prints the estimate after placement and again after routing
+    matches = FMAX_RE.findall(pnr.stderr)
+    return float(matches[-1]) if matches else None
+
+
+def format_table(rows):
+    lines = [f"{'core':30} {'program':16} {'cycles':>8} {'instret':>8} {'CPI':>6} {'Fmax MHz':>9} {'ns/instr':>9}"]
+    for row in rows:
+        cpi = row["cycles"] / row["instret"] if row["instret"] else float("nan")
+        fmax = f"{row['fmax']:9.1f}" if row["fmax"] else f"{'n/a':>9}"
+        time = f"{1000 * cpi / row['fmax']:9.1f}" if row["fmax"] else f"{'n/a':>9}"
+        lines.append(f"{row['core']:30} {row['program']:16} {row['cycles']:8} {row['instret']:8} "
+                     f"{cpi:6.3f} {fmax} {time}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CPI and Fmax of the single-cycle and pipelined cores")
+    parser.add_argument("--sim", default=os.getenv("SIM", "icarus"), help="simulator for the CPI runs")
+    parser.add_argument("--program", action="append", help="assembly/ELF/hex program (repeatable)")
+    parser.add_argument("--predictor", action="append", choices=sorted(PREDICTORS),
+                        help="also the pipelined core with this branch predictor (repeatable)")
+    parser.add_argument("--no-fmax", action="store_true", help="skip synthesis and place-and-route")
+    parser.add_argument("--out", default=str(SRC_DIR / "core_report_out"), help="build directory")
+    args = parser.parse_args(argv)
+
+    out_dir = Path(args.out).resolve()
+    programs = [Path(p).resolve() for p in args.program] if args.program else DEFAULT_PROGRAMS
+    builds = [(core, {}) for core in CORES]
+    builds += [("riscv_core_pipelined", {"BRANCH_PREDICTOR": int(PREDICTORS[name])})
+               for name in args.predictor or []]
+    rows = []
+    for core, parameters in builds:
+        fmax = None if args.no_fmax else measure_fmax(core, out_dir, parameters)
+        for program in programs:
+            counters = measure_cpi(core, program, args.sim, out_dir, parameters)
+            rows.append(dict(core=job_name(core, parameters), program=program.stem, fmax=fmax, **counters))
+
+    print(format_table(rows))
+    if not args.no_fmax and all(row["fmax"] is None for row in rows):
+        print("Fmax: yosys and nextpnr-ice40 not found, only CPI was measured")
+    (out_dir / "report.json").write_text(json.dumps(rows, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
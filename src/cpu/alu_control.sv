@@ -71,7 +71,13 @@ module alu_control (
             B_TYPE: begin
                 alu_src1_o = ALU_SRC_REG;
                 alu_src2_o = ALU_SRC_REG;
-                alu_op_o = ALU_SUB;
+                // beq/bne test the difference for zero, the rest take the
+                // branch when the set-less-than result is non-zero (or zero)
+                case (funct3_i)
+                    3'b100, 3'b101: alu_op_o = ALU_SLT;  // BLT, BGE
+                    3'b110, 3'b111: alu_op_o = ALU_SLTU; // BLTU, BGEU
+                    default:        alu_op_o = ALU_SUB;  // BEQ, BNE
+                endcase
             end
             U_TYPE: begin
                 alu_src1_o = alu_src_e'((opcode_i == OP_AUIPC) ? ALU_SRC_PC : ALU_SRC_ZERO); // AUIPC or LUI
@@ -79,8 +85,9 @@ module alu_control (
                 alu_op_o = ALU_ADD;
             end
             J_TYPE: begin
+                // Link address, the target comes from branch_target_generator
                 alu_src1_o = ALU_SRC_PC;
-                alu_src2_o = ALU_SRC_IMM;
+                alu_src2_o = ALU_SRC_FOUR;
                 alu_op_o = ALU_ADD;
             end
             default: begin
@@ -0,0 +1,20 @@
+from enum import IntEnum
+
+class alu_op_e(IntEnum):
+    ALU_ADD  = 0b0000
+    ALU_SUB  = 0b0001
+    ALU_AND  = 0b0010
+    ALU_OR   = 0b0011
+    ALU_XOR  = 0b0100
+    ALU_SLT  = 0b0101
+    ALU_SLTU = 0b0110
+    ALU_SLL  = 0b0111
+    ALU_SRL  = 0b1000
+    ALU_SRA  = 0b1001
+
+class alu_src_e(IntEnum):
+    ALU_SRC_REG  = 0b000
+    ALU_SRC_PC   = 0b001
+    ALU_SRC_ZERO = 0b010
+    ALU_SRC_IMM  = 0b011
+    ALU_SRC_FOUR = 0b100
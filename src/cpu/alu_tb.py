@@ -1,7 +1,17 @@
+import os
+import time
+
 import cocotb
 from cocotb.triggers import Timer
 from cocotb.binary import BinaryValue
 
+from alu_pkg import alu_op_e
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 async def set_alu_inputs(dut, d1, d2, op):
     dut.d1_i.value = d1
     dut.d2_i.value = d2
@@ -45,6 +55,12 @@ async def test_slt(dut):
     assert dut.result_o.value == 0b0, f"SLT failed: 1010 < 0101 = {int(dut.result_o.value):04b}, expected 0"
 
 
+@cocotb.test()
+async def test_sltu(dut):
+    """Test ALU SLTU operation"""
+    await set_alu_inputs(dut, 0b0101, 0xFFFFFFFF, "0110")  # ALU_SLTU
+    assert dut.result_o.value == 0b1, f"SLTU failed: 0101 < FFFFFFFF = {int(dut.result_o.value):04b}, expected 1"
+
 @cocotb.test()
 async def test_sll(dut):
     """Test ALU SLL operation"""
@@ -57,6 +73,12 @@ async def test_SRL(dut):
     await set_alu_inputs(dut, 0b1010, 0b0001, "1000")  # ALU_SRL
     assert dut.result_o.value == 0b0101, f"SRL failed: 1010 >> 0001 = {int(dut.result_o.value):04b}, expected 0101"
 
+@cocotb.test()
+async def test_sra(dut):
+    """Test ALU SRA operation"""
+    await set_alu_inputs(dut, 0xFFFFFFF0, 0b0010, "1001")  # ALU_SRA
+    assert dut.result_o.value == 0xFFFFFFFC, f"SRA failed: FFFFFFF0 >>> 0010 = {int(dut.result_o.value):08x}, expected FFFFFFFC"
+
 @cocotb.test()
 async def test_zero_flag(dut):
     """Test ALU zero flag"""
@@ -68,3 +90,82 @@ async def test_sign_flag(dut):
     """Test ALU sign flag"""
     await set_alu_inputs(dut, 3, 5, "0001")  # ALU_SUB
     assert dut.sign_o.value == 1, f"Sign flag not set when result is negative"
+
+
+# Operands worth hitting with every op, crossed with each other and with every shift amount
+CORNER_VALUES = [0, 1, 2, 0x7FFFFFFF, 0x80000000, 0x80000001, 0xFFFFFFFE, 0xFFFFFFFF,
+                 0x55555555, 0xAAAAAAAA]
+
+def alu_vectors(count, seed):
+    """Random and corner-case (op, d1, d2) vectors as uint32 arrays"""
+    rng = np.random.default_rng(seed)
+    ops = np.array([op.value for op in alu_op_e], dtype=np.uint32)
+
+    corners = np.array(CORNER_VALUES, dtype=np.uint32)
+    d2_corners = np.concatenate([corners, np.arange(32, dtype=np.uint32)])
+    op_c, d1_c, d2_c = (a.ravel() for a in np.meshgrid(ops, corners, d2_corners, indexing="ij"))
+
+    op_r = rng.choice(ops, count)
+    d1_r = rng.integers(0, 1 << 32, count, dtype=np.uint32)
+    d2_r = rng.integers(0, 1 << 32, count, dtype=np.uint32)
+    # Half the random shifts/compares use small d2 so shift amounts aren't all masked garbage
+    small = rng.random(count) < 0.5
+    d2_r[small] &= 0x3F
+
+    return (np.concatenate([op_c, op_r]), np.concatenate([d1_c, d1_r]), np.concatenate([d2_c, d2_r]))
+
+def alu_expected(op, d1, d2):
+    """Reference result/zero/sign for every vector in one vectorized pass"""
+    s1, s2 = d1.view(np.int32), d2.view(np.int32)
+    shamt = d2 & 31
+    reference = {
+        alu_op_e.ALU_ADD:  lambda m: d1[m] + d2[m],
+        alu_op_e.ALU_SUB:  lambda m: d1[m] - d2[m],
+        alu_op_e.ALU_AND:  lambda m: d1[m] & d2[m],
+        alu_op_e.ALU_OR:   lambda m: d1[m] | d2[m],
+        alu_op_e.ALU_XOR:  lambda m: d1[m] ^ d2[m],
+        alu_op_e.ALU_SLT:  lambda m: (s1[m] < s2[m]).astype(np.uint32),
+        alu_op_e.ALU_SLTU: lambda m: (d1[m] < d2[m]).astype(np.uint32),
+        alu_op_e.ALU_SLL:  lambda m: d1[m] << shamt[m],
+        alu_op_e.ALU_SRL:  lambda m: d1[m] >> shamt[m],
+        alu_op_e.ALU_SRA:  lambda m: (s1[m] >> shamt[m].astype(np.int32)).view(np.uint32),
+    }
+    result = np.zeros_like(d1)
+    for alu_op, fn in reference.items():
+        mask = op == alu_op
+        result[mask] = fn(mask)
+    return result, (result == 0).astype(np.uint32), result >> 31
+
+@cocotb.test(skip=np is None)
+async def test_bulk_random(dut):
+    """Stream random and corner-case vectors for every ALU op against a NumPy reference"""
+    count = int(os.getenv("ALU_VECTORS", "200000"))
+    seed = int(os.getenv("ALU_SEED", cocotb.RANDOM_SEED))
+    op, d1, d2 = alu_vectors(count, seed)
+    expected = alu_expected(op, d1, d2)
+
+    # Plain ints and cached handles keep the per-vector loop as short as possible
+    d1_h, d2_h, op_h = dut.d1_i, dut.d2_i, dut.alu_op_i
+    result_h, zero_h, sign_h = dut.result_o, dut.zero_o, dut.sign_o
+    results, zeros, signs = [], [], []
+    settle = Timer(1, units="step")
+
+    start = time.perf_counter()
+    for o, a, b in zip(op.tolist(), d1.tolist(), d2.tolist()):
+        op_h.value = o
+        d1_h.value = a
+        d2_h.value = b
+        await settle
+        results.append(result_h.value.integer)
+        zeros.append(zero_h.value.integer)
+        signs.append(sign_h.value.integer)
+    elapsed = time.perf_counter() - start
+    dut._log.info(f"{len(op)} vectors in {elapsed:.2f}s ({len(op) / elapsed:.0f} vectors/s, seed {seed})")
+
+    actual = (np.array(results, dtype=np.uint32), np.array(zeros, dtype=np.uint32), np.array(signs, dtype=np.uint32))
+    bad = np.flatnonzero((actual[0] != expected[0]) | (actual[1] != expected[1]) | (actual[2] != expected[2]))
+    for i in bad[:10]:
+        dut._log.error(f"{alu_op_e(int(op[i])).name} {int(d1[i]):08x}, {int(d2[i]):08x}: "
+                       f"got {int(actual[0][i]):08x} z={int(actual[1][i])} s={int(actual[2][i])}, "
+                       f"expected {int(expected[0][i]):08x} z={int(expected[1][i])} s={int(expected[2][i])}")
+    assert len(bad) == 0, f"{len(bad)} of {len(op)} ALU vectors mismatched (seed {seed})"
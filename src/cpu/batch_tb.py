@@ -0,0 +1,125 @@
+"""Many programs in one simulation, on the cores of riscv_core_batch.
+
+Every core runs programs off a shared queue: load the next program while
+the core is held in reset, release it, run it to ecall, record the
+result, repeat. The cores don't wait for each other, a core that finishes
+a short program starts the next one while the others are still running.
+Only the core being reloaded goes through reset.
+"""
+import json
+import os
+from collections import deque
+from pathlib import Path
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge
+
+from lockstep import LockstepChecker
+from perf_report import read_counters
+from program_loader import load_program, run_until_halt
+from rv32i_asm import assemble
+from rv32i_random import generate, parse_seeds
+from tb_utils import CLOCK_PERIOD_NS, read_memory
+from waves import record_waves
+
+
+class Batch:
+    """The cores of a riscv_core_batch, each loaded and reset on its own"""
+
+    def __init__(self, dut):
+        self.dut = dut
+        self.cores = [dut.gen_core[i].core for i in range(len(dut.rst_i))]
+        self.resets = (1 << len(self.cores)) - 1   # rst_i bits, every core held to start with
+        dut.rst_i.value = self.resets
+
+    def hold(self, core):
+        self.resets |= 1 << core
+        self.dut.rst_i.value = self.resets
+
+    def release(self, core):
+        self.resets &= ~(1 << core)
+        self.dut.rst_i.value = self.resets
+
+    async def run(self, core, name, program, lockstep=True, max_cycles=100000):
+        """Load a program into one core, reset it and run it to ecall, return its result"""
+        dut = self.cores[core]
+        self.hold(core)
+        await load_program(dut, program)
+        # Like tb_utils.reset(), only for this core's bit
+        for _ in range(2):
+            await RisingEdge(self.dut.clk_i)
+        self.release(core)
+        await RisingEdge(self.dut.clk_i)
+
+        error = None
+        try:
+            if lockstep:
+                checker = LockstepChecker(dut)
+                await checker.run(max_cycles=max_cycles)
+                words = read_memory(dut.data_mem.data_ram.mem)
+                expected = [int.from_bytes(checker.model.dmem[i:i + 4], "little")
+                            for i in range(0, len(checker.model.dmem), 4)]
+                mismatches = [f"word {i}: core {a:08x}, model {b:08x}"
+                              for i, (a, b) in enumerate(zip(words, expected)) if a != b]
+                assert not mismatches, "Data memory differs from the model's:\n  " + "\n  ".join(mismatches[:20])
+            else:
+                await run_until_halt(dut, max_cycles)
+        except AssertionError as e:
+            error = str(e)
+        counters = read_counters(dut)
+        return {"name": name, "core": core, "passed": error is None, "cycles": counters.cycles,
+                "instret": counters.instret, "error": error}
+
+
+def batch_programs():
+    """(name, program) pairs from BATCH_PROGRAMS files and BATCH_SEEDS random seeds"""
+    programs = []
+    for path in filter(None, os.getenv("BATCH_PROGRAMS", "").split(os.pathsep)):
+        programs.append((Path(path).stem, path))
+    length = int(os.getenv("BATCH_LENGTH", "200"))
+    for seed in parse_seeds(os.getenv("BATCH_SEEDS", "" if programs else "0-15")):
+        programs.append((f"seed {seed}", assemble(generate(seed, length), name=f"seed {seed}")))
+    return programs
+
+
+@cocotb.test()
+@record_waves
+async def test_batch_programs(dut):
+    """Run every program of the batch on the first free core, each in lockstep with the model.
+
+    BATCH_PROGRAMS is a list of assembly, ELF or .hex files (separated like
+    PATH), BATCH_SEEDS random program seeds of BATCH_LENGTH instructions
+    ("0-15" if neither is set). BATCH_LOCKSTEP=0 only checks that each
+    program halts. Per-program results go to BATCH_JSON if set.
+    """
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    batch = Batch(dut)
+    queue = deque(batch_programs())
+    count = len(queue)
+    lockstep = os.getenv("BATCH_LOCKSTEP", "1") != "0"
+    max_cycles = int(os.getenv("BATCH_MAX_CYCLES", "100000"))
+    results = []
+
+    async def worker(core):
+        while queue:
+            name, program = queue.popleft()
+            result = await batch.run(core, name, program, lockstep, max_cycles)
+            if not result["passed"]:
+                dut._log.error(f"{name} failed on core {core}: {result['error']}")
+            results.append(result)
+        batch.hold(core)
+
+    workers = [cocotb.start_soon(worker(core)) for core in range(len(batch.cores))]
+    for task in workers:
+        await task
+
+    if os.getenv("BATCH_JSON"):
+        with open(os.environ["BATCH_JSON"], "w") as f:
+            json.dump({"cores": len(batch.cores), "lockstep": lockstep, "programs": results}, f, indent=2)
+
+    failed = [result["name"] for result in results if not result["passed"]]
+    dut._log.info(f"{count - len(failed)}/{count} programs passed on {len(batch.cores)} cores")
+    assert not failed, f"programs failed: {failed}"
@@ -0,0 +1,139 @@
+`timescale 1ns/1ps
+
+// Branch predictor and branch target buffer for riscv_core_pipelined's fetch.
+//
+// Every cycle fetch_i is set, the address being fetched is looked up and
+// the prediction registered, so predict_taken_o/predict_target_o belong to
+// the instruction coming out of the instruction RAM in the next cycle and
+// can steer the fetch after it. predict_index_o travels down the pipeline
+// with the instruction and comes back as resolve_index_i when it resolves.
+//
+// The BTB is direct mapped on the PC with full tags, holding the target of
+// every branch and jump seen taken. Whether a BTB hit is predicted taken
+// depends on predictor_p (riscv_pkg BP_*):
+//
+//   BP_NONE     never, every taken branch redirects late as without a predictor
+//   BP_STATIC   jumps and backward branches
+//   BP_BIMODAL  jumps, and branches whose 2-bit counter (indexed by PC) says so
+//   BP_GSHARE   as bimodal, the counter indexed by PC xor the last
+//               history_bits_p branch outcomes
+//
+// Counters and history are trained when a branch resolves in EX, not
+// speculatively. predictions counts the branches and jumps resolved,
+// mispredictions the instructions of any kind whose prediction turned out
+// wrong (a BTB hit on a non-branch included), each costing a redirect.
+module branch_predictor
+    import riscv_pkg::*;
+#(
+    parameter width_p = 32,
+    parameter predictor_p = BP_NONE,
+    parameter btb_entries_p = 16,
+    parameter bht_entries_p = 64,
+    parameter history_bits_p = 6
+) (
+    input  logic                                clk_i,
+    input  logic                                rst_i,
+
+    // Fetch
+    input  logic                                fetch_i,
+    input  logic [width_p-1:0]                  fetch_pc_i,
+    output logic                                predict_taken_o,
+    output logic [width_p-1:0]                  predict_target_o,
+    output logic [$clog2(bht_entries_p)-1:0]    predict_index_o,
+
+    // The instruction in EX
+    input  logic                                resolve_i,
+    input  logic [width_p-1:0]                  resolve_pc_i,
+    input  logic                                is_branch_i,
+    input  logic                                is_jump_i,
+    input  logic                                taken_i,
+    input  logic [width_p-1:0]                  target_i,
+    input  logic [$clog2(bht_entries_p)-1:0]    resolve_index_i,
+    input  logic                                mispredict_i
+);
+
+    localparam BTB_W = $clog2(btb_entries_p);
+    localparam BHT_W = $clog2(bht_entries_p);
+    localparam TAG_W = width_p - 2 - BTB_W;
+    localparam logic [BHT_W-1:0] HISTORY_MASK = (1 << history_bits_p) - 1;
+
+    logic [31:0] predictions;
+    logic [31:0] mispredictions;
+
+    logic btb_valid [btb_entries_p];
+    logic btb_jump [btb_entries_p];
+    logic [TAG_W-1:0] btb_tag [btb_entries_p];
+    logic [width_p-1:0] btb_target [btb_entries_p];
+    logic [1:0] counters [bht_entries_p];
+    logic [BHT_W-1:0] history;
+
+    // Lookup of the fetch address
+    logic [BTB_W-1:0] btb_index;
+    logic btb_hit;
+    logic [BHT_W-1:0] bht_index;
+    logic taken;
+
+    assign btb_index = fetch_pc_i[2 +: BTB_W];
+    assign btb_hit = btb_valid[btb_index] && btb_tag[btb_index] == fetch_pc_i[width_p-1 -: TAG_W];
+    assign bht_index = predictor_p == BP_GSHARE ? fetch_pc_i[2 +: BHT_W] ^ (history & HISTORY_MASK)
+                                                : fetch_pc_i[2 +: BHT_W];
+
+    logic direction;
+    always_comb begin
+        case (predictor_p)
+            BP_STATIC:  direction = btb_jump[btb_index] || btb_target[btb_index] < fetch_pc_i;
+            BP_BIMODAL,
+            BP_GSHARE:  direction = btb_jump[btb_index] || counters[bht_index][1];
+            default:    direction = 1'b0;
+        endcase
+    end
+    assign taken = btb_hit && direction;
+
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            predict_taken_o <= 1'b0;
+            predict_target_o <= '0;
+            predict_index_o <= '0;
+        end else if (fetch_i) begin
+            predict_taken_o <= taken;
+            predict_target_o <= btb_target[btb_index];
+            predict_index_o <= bht_index;
+        end
+    end
+
+    // Training on the resolved instruction
+    logic [BTB_W-1:0] resolve_btb_index;
+    assign resolve_btb_index = resolve_pc_i[2 +: BTB_W];
+
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            history <= '0;
+            predictions <= '0;
+            mispredictions <= '0;
+            for (int i = 0; i < btb_entries_p; i++) begin
+                btb_valid[i] <= 1'b0;
+            end
+            for (int i = 0; i < bht_entries_p; i++) begin
+                counters[i] <= 2'b01;     // Weakly not taken
+            end
+        end else if (resolve_i) begin
+            if (is_branch_i || is_jump_i) predictions <= predictions + 1;
+            if (mispredict_i) mispredictions <= mispredictions + 1;
+            if (taken_i) begin
+                btb_valid[resolve_btb_index] <= 1'b1;
+                btb_jump[resolve_btb_index] <= is_jump_i;
+                btb_tag[resolve_btb_index] <= resolve_pc_i[width_p-1 -: TAG_W];
+                btb_target[resolve_btb_index] <= target_i;
+            end
+            if (is_branch_i) begin
+                if (taken_i && counters[resolve_index_i] != 2'b11) begin
+                    counters[resolve_index_i] <= counters[resolve_index_i] + 1'b1;
+                end else if (!taken_i && counters[resolve_index_i] != 2'b00) begin
+                    counters[resolve_index_i] <= counters[resolve_index_i] - 1'b1;
+                end
+                history <= {history[BHT_W-2:0], taken_i};
+            end
+        end
+    end
+
+endmodule
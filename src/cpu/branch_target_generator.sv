@@ -6,20 +6,20 @@ module branch_target_generator #(
     input logic                    is_branch_i,
     input logic                    is_jal_i,
     input logic                    is_jalr_i,
-    input logic [width_p-1:0]      pc_i,
+    input logic [width_p-1:0]      pc_i,           // Address of the branch/jump itself
     input logic [width_p-1:0]      immediate_i,
-    input logic [width_p-1:0]      alu_result_i,
+    input logic [width_p-1:0]      rs1_i,
     output logic [width_p-1:0]     branch_target_o
 );
 
+    // The ALU computes the link address for jumps, so JALR gets its own adder
     always_comb begin
         if (is_jalr_i) begin
-            // JALR: Use ALU result (rs1 + immediate) and clear LSB
-            branch_target_o = alu_result_i & ~32'b1;
+            // JALR: rs1 + immediate with the LSB cleared
+            branch_target_o = (rs1_i + immediate_i) & ~32'b1;
         end else if (is_branch_i || is_jal_i) begin
-            // Branch or JAL: PC-relative (pc + immediate)
-            // TODO: make less stupid
-            branch_target_o = pc_i - 4 + immediate_i; // - 4 to get current instruction location
+            // Branch or JAL: PC-relative
+            branch_target_o = pc_i + immediate_i;
         end else begin
             // Default (not used)
             branch_target_o = pc_i + 4;
@@ -0,0 +1,143 @@
+"""Architectural checkpoints of riscv_core: save at any cycle, restore into a fresh run.
+
+A checkpoint is the state the next instruction sees: its PC, the register
+file (with the result still in the write-back stage applied), both
+memories and the performance counters. The file is a small JSON header
+followed by the register and memory words, gzip compressed for .gz paths:
+
+    checkpoint = capture(dut)                 # on a falling clock edge
+    save_checkpoint(checkpoint, "deep.ckpt")
+    ...
+    checkpoint = load_checkpoint("deep.ckpt")   # in another simulation
+    await restore(dut, checkpoint)
+    await LockstepChecker(dut, model_from_checkpoint(checkpoint)).run()
+
+restore() replaces load_program() plus reset(): it loads the memories,
+resets the core and writes the PC, registers and counters through the
+hierarchy as reset is released. from_model() makes a checkpoint out of the
+RV32I model, which can fast-forward through a long program far quicker
+than the RTL. Only riscv_core is supported, the pipelined core has
+instructions in flight that no checkpoint describes.
+"""
+import gzip
+import json
+import struct
+from collections import namedtuple
+
+from cocotb.triggers import FallingEdge, RisingEdge
+
+from perf_report import PerfCounters, read_counters
+from program_loader import load_program
+from rv32i_model import RV32IModel
+from tb_utils import RESET_NAMES, read_int, read_memory, read_registers
+
+MAGIC = b"RVCKPT01"
+HEADER = struct.Struct("<8sI")  # magic, length of the JSON header that follows
+# Counter registers in the perf_counters instance, in PerfCounters order
+COUNTER_NAMES = ["mcycle", "minstret", "load_stall_cycles", "store_stall_cycles", "branches_taken",
+                 "flush_cycles"]
+SUPPORTED_CORES = ("riscv_core",)
+
+# regs/imem/dmem are word lists, counters a PerfCounters
+Checkpoint = namedtuple("Checkpoint", "pc regs imem dmem counters")
+
+
+def check_core(dut):
+    if dut._name not in SUPPORTED_CORES:
+        raise ValueError(f"checkpoints only support {', '.join(SUPPORTED_CORES)}, not {dut._name}")
+
+
+def capture(dut):
+    """Architectural state of riscv_core, call on a falling clock edge"""
+    check_core(dut)
+    regs = read_registers(dut, x=0)
+    # The write-back stage writes the register file on the next edge, it's already architectural
+    if read_int(dut.wb_valid):
+        rd = read_int(dut.wb_rd)
+        if rd:
+            regs[rd] = read_int(dut.write_back_data) or 0
+    # Before the first fetch after reset nothing is executing yet
+    pc = read_int(dut.retire_pc) if read_int(dut.instr_valid) else read_int(dut.pc_inst.pc_o)
+    return Checkpoint(pc, regs, read_memory(dut.instr_mem.instruction_ram.mem),
+                      read_memory(dut.data_mem.data_ram.mem), read_counters(dut))
+
+
+async def capture_at(dut, cycle):
+    """Checkpoint of the state after `cycle` clocks from now"""
+    for _ in range(cycle):
+        await RisingEdge(dut.clk_i)
+    await FallingEdge(dut.clk_i)
+    return capture(dut)
+
+
+def from_model(model):
+    """Checkpoint of an RV32IModel, e.g. after fast-forwarding it through a program.
+
+    The model has no notion of cycles, mcycle starts at its instruction count.
+    """
+    dmem = [int.from_bytes(model.dmem[i:i + 4], "little") for i in range(0, len(model.dmem), 4)]
+    counters = PerfCounters(model.retired, model.retired, 0, 0, 0, 0)
+    return Checkpoint(model.pc, list(model.regs), list(model.imem), dmem, counters)
+
+
+def model_from_checkpoint(checkpoint):
+    """RV32I model in the checkpoint's state, for checking a restored run in lockstep"""
+    model = RV32IModel(checkpoint.imem, checkpoint.dmem, mem_depth=len(checkpoint.imem))
+    model.regs = list(checkpoint.regs)
+    model.pc = checkpoint.pc
+    model.retired = checkpoint.counters.instret
+    return model
+
+
+def open_checkpoint(path, mode):
+    return gzip.open(path, mode, compresslevel=1) if str(path).endswith(".gz") else open(path, mode)
+
+
+def save_checkpoint(checkpoint, path):
+    header = json.dumps({"pc": checkpoint.pc, "regs": len(checkpoint.regs), "imem": len(checkpoint.imem),
+                         "dmem": len(checkpoint.dmem), "counters": checkpoint.counters._asdict()}).encode()
+    with open_checkpoint(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(header)))
+        f.write(header)
+        for words in (checkpoint.regs, checkpoint.imem, checkpoint.dmem):
+            f.write(struct.pack(f"<{len(words)}I", *words))
+
+
+def load_checkpoint(path):
+    with open_checkpoint(path, "rb") as f:
+        data = f.read()
+    magic, length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint (or was written by another version)")
+    header = json.loads(data[HEADER.size:HEADER.size + length])
+    offset = HEADER.size + length
+    sections = []
+    for name in ("regs", "imem", "dmem"):
+        sections.append(list(struct.unpack_from(f"<{header[name]}I", data, offset)))
+        offset += 4 * header[name]
+    return Checkpoint(header["pc"], *sections, PerfCounters(**header["counters"]))
+
+
+async def restore(dut, checkpoint, cycles=2):
+    """Reset riscv_core into a checkpoint, returns one clock after reset like tb_utils.reset().
+
+    The first instruction fetched after that is the one at checkpoint.pc.
+    mcycle comes out one higher than saved, for the cycle that fetch takes.
+    """
+    check_core(dut)
+    await load_program(dut, checkpoint.imem, checkpoint.dmem)
+    rst = next(getattr(dut, name) for name in RESET_NAMES if hasattr(dut, name))
+    rst.value = 1
+    for _ in range(cycles):
+        await RisingEdge(dut.clk_i)
+    # Reset clears the PC, registers and counters on every clock, so the
+    # state goes in right after the last reset edge, as reset is released
+    rst.value = 0
+    dut.pc_inst.pc_o.value = checkpoint.pc
+    registers = dut.reg_file.registers
+    for i, value in enumerate(checkpoint.regs):
+        if i:
+            registers[i].value = value
+    for name, value in zip(COUNTER_NAMES, checkpoint.counters):
+        getattr(dut.perf, name).value = value
+    await RisingEdge(dut.clk_i)
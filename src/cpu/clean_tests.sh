@@ -1 +1 @@
-rm -rf __pycache__ .pytest_cache alu_sim_build id_sim_build program_counter_sim_build rf_sim_build riscv_core_sim_build
+rm -rf __pycache__ .pytest_cache alu_sim_build id_sim_build program_counter_sim_build rf_sim_build riscv_core_sim_build riscv_core_pipelined_sim_build random_sim_build *_random_sim_build icache_sim_build icache_sweep_sim_build batch_sim_build
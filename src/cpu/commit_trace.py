@@ -0,0 +1,211 @@
+"""Compact binary trace of every instruction riscv_core retires.
+
+CommitTraceMonitor packs each retired instruction into a fixed-size
+record in a preallocated buffer and writes it out a chunk at a time, so a
+million-cycle run costs a few file writes instead of a print per cycle.
+Paths ending in .gz are gzip compressed. TraceReader memory-maps an
+uncompressed trace and decodes records lazily:
+
+    for record in TraceReader("run.trace"):
+        print(record.cycle, hex(record.pc))
+"""
+import gzip
+import mmap
+import struct
+from collections import namedtuple
+
+from cocotb.triggers import FallingEdge
+
+from rv32i_model import is_halt
+from tb_utils import read_int
+
+MAGIC = b"RVTRACE1"
+HEADER = struct.Struct("<8sI")  # magic, record size
+# cycle, pc, instruction, wdata, mem_addr, mem_data, rd, flags
+RECORD = struct.Struct("<QIIIIIBB")
+
+RD_WRITTEN = 1
+MEM_ACCESS = 2
+MEM_WRITE = 4
+
+# rd/wdata are None when no register is written, mem_* when memory isn't accessed
+TraceRecord = namedtuple("TraceRecord", "cycle pc instruction rd wdata mem_addr mem_data mem_write")
+
+
+def decode(fields):
+    cycle, pc, instruction, wdata, mem_addr, mem_data, rd, flags = fields
+    written = flags & RD_WRITTEN
+    access = flags & MEM_ACCESS
+    return TraceRecord(cycle, pc, instruction, rd if written else None, wdata if written else None,
+                       mem_addr if access else None, mem_data if access else None,
+                       bool(flags & MEM_WRITE))
+
+
+def open_trace(path, mode):
+    path = str(path)
+    if path.endswith(".gz"):
+        # Level 1: the trace should never be what slows the simulation down
+        return gzip.open(path, mode, compresslevel=1) if "w" in mode else gzip.open(path, mode)
+    return open(path, mode)
+
+
+class TraceWriter:
+    """Fixed-size binary records written through a chunk-sized buffer"""
+
+    def __init__(self, path, chunk_records=4096):
+        self.file = open_trace(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, RECORD.size))
+        self.buffer = bytearray(chunk_records * RECORD.size)
+        self.offset = 0
+        self.count = 0
+
+    def append(self, cycle, pc, instruction, rd=None, wdata=None, mem_addr=None, mem_data=None,
+               mem_write=False):
+        flags = ((RD_WRITTEN if rd is not None else 0) | (MEM_ACCESS if mem_addr is not None else 0)
+                 | (MEM_WRITE if mem_write else 0))
+        RECORD.pack_into(self.buffer, self.offset, cycle, pc, instruction, wdata or 0,
+                         mem_addr or 0, mem_data or 0, rd or 0, flags)
+        self.offset += RECORD.size
+        self.count += 1
+        if self.offset == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.offset])
+        self.offset = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    """Lazy reader for trace files, memory-mapped unless compressed"""
+
+    def __init__(self, path, chunk_records=4096):
+        self.path = str(path)
+        self.chunk_size = chunk_records * RECORD.size
+        self.map = None
+        if not self.path.endswith(".gz"):
+            with open(self.path, "rb") as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.check_header(self.map[:HEADER.size])
+
+    def check_header(self, header):
+        magic, record_size = HEADER.unpack(header)
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{self.path} is not a commit trace (or was written by another version)")
+
+    def __len__(self):
+        if self.map is None:
+            raise TypeError("compressed traces don't know their length without reading them")
+        return (len(self.map) - HEADER.size) // RECORD.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return decode(RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size))
+
+    def __iter__(self):
+        if self.map is not None:
+            view = memoryview(self.map)[HEADER.size:HEADER.size + len(self) * RECORD.size]
+            try:
+                for fields in RECORD.iter_unpack(view):
+                    yield decode(fields)
+            finally:
+                view.release()
+            return
+        with open_trace(self.path, "rb") as f:
+            self.check_header(f.read(HEADER.size))
+            while chunk := f.read(self.chunk_size):
+                for fields in RECORD.iter_unpack(chunk):
+                    yield decode(fields)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CommitTraceMonitor:
+    """Records every instruction riscv_core retires into a trace file.
+
+    Start run() with cocotb.start_soon() after reset and call close() at
+    the end of the test to flush the last chunk. The halting ecall/ebreak
+    is recorded as well, and ends the monitor.
+    """
+
+    def __init__(self, dut, path, chunk_records=4096):
+        self.writer = TraceWriter(path, chunk_records)
+        # Look the handles up once, attribute access on dut is slow
+        self.clk = dut.clk_i
+        self.instr_valid = dut.instr_valid
+        self.retire = dut.retire
+        self.pc = dut.retire_pc
+        self.instruction = dut.retire_instruction
+        self.mem_read = dut.retire_mem_read
+        self.mem_write = dut.retire_mem_write
+        self.mem_addr = dut.retire_mem_addr
+        self.store_data = dut.retire_store_data
+        self.wb_valid = dut.wb_valid
+        self.wb_rd = dut.wb_rd
+        self.write_back_data = dut.write_back_data
+        self.cycle = 0
+        # Fields of the instruction retired last cycle, its register write
+        # and load data only show up in this cycle's write-back stage
+        self.pending = None
+
+    def sample(self):
+        instruction = read_int(self.instruction) or 0
+        halting = is_halt(instruction)
+        if not (self.retire.value or halting):
+            return False
+        mem_write = bool(self.mem_write.value)
+        load = bool(self.mem_read.value)
+        mem_addr = read_int(self.mem_addr) if mem_write or load else None
+        store_data = read_int(self.store_data) if mem_write else None
+        if halting:
+            # Nothing to wait for, and this cycle's write-back belongs to the instruction before
+            self.writer.append(self.cycle, read_int(self.pc) or 0, instruction)
+            return True
+        self.pending = (self.cycle, read_int(self.pc) or 0, instruction, mem_addr, store_data, mem_write, load)
+        return False
+
+    def complete(self):
+        cycle, pc, instruction, mem_addr, mem_data, mem_write, load = self.pending
+        self.pending = None
+        rd = wdata = None
+        if self.wb_valid.value:
+            rd, wdata = read_int(self.wb_rd), read_int(self.write_back_data)
+        if load:
+            # Write-back carries the load data even when rd is x0
+            mem_data = read_int(self.write_back_data)
+        self.writer.append(cycle, pc, instruction, rd, wdata, mem_addr, mem_data, mem_write)
+
+    async def run(self, max_cycles=None):
+        edge = FallingEdge(self.clk)
+        while max_cycles is None or self.cycle < max_cycles:
+            await edge
+            self.cycle += 1
+            if self.pending is not None:
+                self.complete()
+            if self.instr_valid.value and self.sample():
+                break
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
@@ -18,7 +18,10 @@ module control_unit (
     // Signals for branch control
     output logic                        is_branch_o,
     output logic                        is_jal_o,
-    output logic                        is_jalr_o
+    output logic                        is_jalr_o,
+
+    // Zicsr read, rd gets the CSR value
+    output logic                        is_csr_o
     );
 
     always_comb begin
@@ -31,6 +34,7 @@ module control_unit (
         is_jal_o = 1'b0;
         is_jalr_o = 1'b0;
         mem_write_mask_o = 4'b0000;
+        is_csr_o = 1'b0;
 
         case (inst_type_i)
             R_TYPE: begin
@@ -66,6 +70,12 @@ module control_unit (
             end
             default: ; // Do nothing for UNKNOWN_TYPE
         endcase
+
+        // SYSTEM with funct3 != 0 is a CSR instruction, ecall/ebreak do nothing
+        if (opcode_i == OP_SYSTEM && funct3_i != 3'b000) begin
+            reg_write_o = 1'b1;
+            is_csr_o = 1'b1;
+        end
     end
 
 endmodule
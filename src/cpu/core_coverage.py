@@ -0,0 +1,156 @@
+"""Functional coverage of riscv_core, sampled from its decoder and control outputs.
+
+CoverageMonitor samples the decoder (opcode/funct3/funct7/rd/rs1/rs2),
+control_unit, alu_control, branch and store lane signals of every retiring
+instruction. Each cycle costs a few handle reads and adding one tuple to a
+set; the tuples are only turned into bins when the coverage is saved, by
+which time a program has usually repeated most of them many times over.
+
+With COVERAGE_DIR set (regress.py sets it for every job), start_coverage()
+starts a monitor and save_coverage() writes its bitmap there; without it
+both do nothing. Only the single-cycle core is covered: in
+riscv_core_pipelined the decoder outputs belong to a younger instruction
+than the one retiring.
+"""
+import os
+import uuid
+from pathlib import Path
+
+import cocotb
+from cocotb.triggers import FallingEdge
+
+from alu_pkg import alu_op_e
+from func_coverage import Coverage
+from riscv_pkg import instruction_type_e, opcode_e
+from rv32i_asm import OP, OP_IMM, SHIFT_IMM
+from rv32i_model import BRANCH_NAMES, CSR_NAMES, LOAD_NAMES, STORE_NAMES
+from tb_utils import read_int
+
+COVERED_CORES = ("riscv_core",)
+
+# (mnemonic, opcode, funct3, funct7[5]), None where the field isn't decoded
+INSTRUCTIONS = (
+    [("lui", opcode_e.OP_LUI, None, None), ("auipc", opcode_e.OP_AUIPC, None, None),
+     ("jal", opcode_e.OP_JAL, None, None), ("jalr", opcode_e.OP_JALR, 0, None)]
+    + [(name, opcode_e.OP_BRANCH, funct3, None) for funct3, name in BRANCH_NAMES.items()]
+    + [(name, opcode_e.OP_LOAD, funct3, None) for funct3, name in LOAD_NAMES.items()]
+    + [(name, opcode_e.OP_STORE, funct3, None) for funct3, name in STORE_NAMES.items()]
+    + [(name, opcode_e.OP_OP_IMM, funct3, None) for name, funct3 in OP_IMM.items()]
+    + [(name, opcode_e.OP_OP_IMM, funct3, funct7 >> 5) for name, (funct3, funct7) in SHIFT_IMM.items()]
+    + [(name, opcode_e.OP_OP, funct3, funct7 >> 5) for name, (funct3, funct7) in OP.items()]
+    + [("fence", opcode_e.OP_MISC_MEM, 0, None), ("ecall/ebreak", opcode_e.OP_SYSTEM, 0, None)]
+    + [(name, opcode_e.OP_SYSTEM, funct3, None) for funct3, name in CSR_NAMES.items()]
+)
+INSTRUCTION_BINS = {(opcode, funct3, funct7): i for i, (_, opcode, funct3, funct7) in enumerate(INSTRUCTIONS)}
+
+# Bin indices of the other coverpoints by their raw signal values
+ALU_OP_BINS = {int(op): i for i, op in enumerate(alu_op_e)}
+BRANCH_BINS = {funct3: 2 * i for i, funct3 in enumerate(BRANCH_NAMES)}
+# (funct3, byte offset) of loads, shifted store_mask values of stores
+LOAD_BINS = {(funct3, offset): i for i, (funct3, offset) in enumerate(
+    (funct3, offset) for funct3, name in LOAD_NAMES.items()
+    for offset in range(0, 4, 4 if name == "lw" else 2 if name in ("lh", "lhu") else 1))}
+STORE_MASKS = {0b0001: "sb@0", 0b0010: "sb@1", 0b0100: "sb@2", 0b1000: "sb@3",
+               0b0011: "sh@0", 0b1100: "sh@2", 0b1111: "sw"}
+STORE_BINS = {mask: i for i, mask in enumerate(STORE_MASKS)}
+# Instruction types that read rs1/rs2
+READS_RS1 = {instruction_type_e.R_TYPE, instruction_type_e.I_TYPE, instruction_type_e.S_TYPE,
+             instruction_type_e.B_TYPE}
+READS_RS2 = {instruction_type_e.R_TYPE, instruction_type_e.S_TYPE, instruction_type_e.B_TYPE}
+
+POINTS = {
+    "instruction": [name for name, *_ in INSTRUCTIONS],
+    "alu_op": [op.name[len("ALU_"):].lower() for op in alu_op_e],
+    "branch": [f"{name} {outcome}" for name in BRANCH_NAMES.values() for outcome in ("not taken", "taken")],
+    "load": [f"{LOAD_NAMES[funct3]}@{offset}" for funct3, offset in LOAD_BINS],
+    "store_mask": list(STORE_MASKS.values()),
+    "rd": [f"x{i}" for i in range(1, 32)],
+    "forwarding": ["rs1", "rs2"],
+}
+
+
+def instruction_bin(opcode, funct3, funct7):
+    for key in ((opcode, funct3, funct7 >> 5 & 1), (opcode, funct3, None), (opcode, None, None)):
+        index = INSTRUCTION_BINS.get(key)
+        if index is not None:
+            return index
+    return None
+
+
+class CoverageMonitor:
+    """Samples riscv_core every cycle into a set of raw decoder/control tuples.
+
+    Start run() with cocotb.start_soon() after reset, coverage() turns what
+    has been seen so far into a Coverage.
+    """
+
+    def __init__(self, dut):
+        # Look the handles up once, attribute access on dut is slow
+        self.clk = dut.clk_i
+        self.retire = dut.retire
+        self.halt = dut.halt
+        self.fields = [dut.opcode, dut.funct3, dut.funct7, dut.rd, dut.rs1, dut.rs2, dut.inst_type,
+                       dut.alu_op, dut.reg_write, dut.is_branch, dut.take_branch, dut.mem_read,
+                       dut.mem_write, dut.store_mask, dut.wb_valid, dut.wb_rd]
+        # Only its low bits matter, keeping the whole address would make every sample unique
+        self.address = dut.alu_result
+        self.seen = set()
+
+    async def run(self):
+        edge = FallingEdge(self.clk)
+        fields, seen = self.fields, self.seen
+        while True:
+            await edge
+            # ecall/ebreak never retire, they stall the core for good
+            if self.retire.value or self.halt.value:
+                address = read_int(self.address)
+                seen.add((*[read_int(field) for field in fields], None if address is None else address & 3))
+
+    def coverage(self):
+        coverage = Coverage(POINTS)
+        for sample in self.seen:
+            if None in sample:
+                continue
+            (opcode, funct3, funct7, rd, rs1, rs2, inst_type, alu_op, reg_write, is_branch,
+             take_branch, mem_read, mem_write, store_mask, wb_valid, wb_rd, offset) = sample
+            index = instruction_bin(opcode, funct3, funct7)
+            if index is None:
+                continue  # Not an RV32I instruction, nothing else about it means much
+            coverage.hit("instruction", index)
+            if alu_op in ALU_OP_BINS:
+                coverage.hit("alu_op", ALU_OP_BINS[alu_op])
+            if is_branch:
+                coverage.hit("branch", BRANCH_BINS[funct3] + take_branch)
+            if mem_read and (funct3, offset) in LOAD_BINS:
+                coverage.hit("load", LOAD_BINS[funct3, offset])
+            if mem_write and store_mask in STORE_BINS:
+                coverage.hit("store_mask", STORE_BINS[store_mask])
+            if reg_write and rd:
+                coverage.hit("rd", rd - 1)
+            # The write-back stage feeding an operand straight to the next instruction
+            if wb_valid and inst_type in READS_RS1 and wb_rd == rs1 and rs1:
+                coverage.hit("forwarding", 0)
+            if wb_valid and inst_type in READS_RS2 and wb_rd == rs2 and rs2:
+                coverage.hit("forwarding", 1)
+        return coverage
+
+
+def start_coverage(dut):
+    """Start a CoverageMonitor if COVERAGE_DIR is set and the core is covered"""
+    if not os.getenv("COVERAGE_DIR") or dut._name not in COVERED_CORES:
+        return None
+    monitor = CoverageMonitor(dut)
+    cocotb.start_soon(monitor.run())
+    return monitor
+
+
+def save_coverage(monitor, name):
+    """Write the monitor's bitmap to COVERAGE_DIR/<name>.<unique id>.cov"""
+    if monitor is None:
+        return None
+    out_dir = Path(os.environ["COVERAGE_DIR"])
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # Several simulations can share COVERAGE_DIR, never overwrite another run's file
+    path = out_dir / f"{name}.{uuid.uuid4().hex[:12]}.cov"
+    monitor.coverage().save(path)
+    return path
@@ -0,0 +1,29 @@
+`timescale 1ns/1ps
+
+// Picks the byte/halfword a load addressed out of the data RAM word and
+// sign or zero extends it. The RAM is word wide, offset_i is the low two
+// bits of the load address; like store_align, halfwords only look at bit 1
+// and words ignore it.
+module load_extend #(
+    parameter width_p = 32
+) (
+    input  logic [2:0]          funct3_i,
+    input  logic [1:0]          offset_i,
+    input  logic [width_p-1:0]  word_i,
+    output logic [width_p-1:0]  data_o
+);
+
+    logic [width_p-1:0] shifted;
+    assign shifted = word_i >> {offset_i[1], offset_i[0] & !funct3_i[0], 3'b000};
+
+    always_comb begin
+        case (funct3_i)
+            3'b000:  data_o = {{24{shifted[7]}}, shifted[7:0]};     // LB
+            3'b001:  data_o = {{16{shifted[15]}}, shifted[15:0]};   // LH
+            3'b100:  data_o = {24'b0, shifted[7:0]};                // LBU
+            3'b101:  data_o = {16'b0, shifted[15:0]};               // LHU
+            default: data_o = word_i;                               // LW
+        endcase
+    end
+
+endmodule
@@ -0,0 +1,119 @@
+from collections import deque
+
+from cocotb.triggers import FallingEdge
+
+from rv32i_model import RV32IModel, disassemble, is_halt
+from tb_utils import read_int, read_memory
+
+
+def model_from_dut(dut):
+    """RV32I model loaded with whatever riscv_core's memories currently hold"""
+    program = read_memory(dut.instr_mem.instruction_ram.mem)
+    data = read_memory(dut.data_mem.data_ram.mem)
+    return RV32IModel(program, data, mem_depth=len(program))
+
+
+class LockstepChecker:
+    """Runs the RV32I model in lockstep with riscv_core or riscv_core_pipelined.
+
+    Each instruction the core retires is also stepped on the model and the
+    PC, instruction, destination register and write-back data are compared.
+    The register write shows up in the core's write-back stage one cycle
+    after the instruction retires, so that part is checked a cycle later.
+    The first mismatch fails with the last few retired instructions for
+    context. Create it after reset so the model sees the loaded program.
+    """
+
+    def __init__(self, dut, model=None, context=8):
+        self.dut = dut
+        self.model = model or model_from_dut(dut)
+        # Look the handles up once, run() samples them every cycle
+        self.clk = dut.clk_i
+        self.instr_valid = dut.instr_valid
+        self.retire = dut.retire
+        self.retire_pc = dut.retire_pc
+        self.retire_instruction = dut.retire_instruction
+        self.wb_valid = dut.wb_valid
+        self.wb_rd = dut.wb_rd
+        self.write_back_data = dut.write_back_data
+        csr_rdata = dut.csr_rdata
+        # The model can't know cycle counts, it takes those CSR reads from the core
+        self.model.csr_hook = lambda csr: read_int(csr_rdata)
+        self.history = deque(maxlen=context)
+        self.cycle = 0
+        self.pending = None  # Retired instruction whose write-back is next cycle
+
+    def sample(self):
+        return read_int(self.retire_pc), read_int(self.retire_instruction)
+
+    def sample_write(self):
+        """(rd, data) written by the write-back stage this cycle, (None, None) if nothing"""
+        if not read_int(self.wb_valid):
+            return None, None
+        return read_int(self.wb_rd), read_int(self.write_back_data)
+
+    def fail(self, errors):
+        raise AssertionError(
+            f"Core diverged from the RV32I model at cycle {self.cycle} "
+            f"(instruction {self.model.retired}):\n  " + "\n  ".join(errors)
+            + "\nLast retired instructions (cycle, pc, instruction):\n" + "\n".join(self.history))
+
+    def check(self):
+        pc, instruction = self.sample()
+        expected = self.model.step()
+
+        errors = []
+        if pc != expected.pc:
+            errors.append(f"pc: core {fmt(pc)}, model {fmt(expected.pc)}")
+        if instruction != expected.instruction:
+            errors.append(f"instruction: core {fmt(instruction)}, model {fmt(expected.instruction)}")
+
+        self.history.append(f"{self.cycle:8} {fmt(pc)}  {fmt(instruction)}  "
+                            f"{disassemble(expected.instruction):24}")
+        if errors:
+            self.fail(errors)
+        self.pending = expected
+        return expected
+
+    def check_write(self):
+        """Compare the write-back stage against the instruction retired last cycle"""
+        rd, wdata = self.sample_write()
+        expected, self.pending = self.pending, None
+        if expected is None:
+            if rd is not None:
+                self.fail([f"x{rd} written with {fmt(wdata)} but no instruction retired last cycle"])
+            return
+
+        if rd is not None:
+            self.history[-1] += f" {reg(rd)} <- {fmt(wdata)}"
+        if rd != expected.rd:
+            self.fail([f"rd: core {reg(rd)}, model {reg(expected.rd)}"])
+        if wdata != expected.wdata:
+            self.fail([f"x{rd} data: core {fmt(wdata)}, model {fmt(expected.wdata)}"])
+
+    async def run(self, max_cycles=10000):
+        """Check every retired instruction until the core reaches ecall/ebreak"""
+        edge = FallingEdge(self.clk)
+        while self.cycle < max_cycles:
+            await edge
+            self.cycle += 1
+            self.check_write()
+            if not read_int(self.instr_valid):
+                continue
+            # The core stalls on ecall/ebreak forever, they never retire
+            halting = is_halt(read_int(self.retire_instruction) or 0)
+            if read_int(self.retire) or halting:
+                retired = self.check()
+                if retired.halt:
+                    # Let the last write-back land in the register file
+                    await edge
+                    return retired
+        raise AssertionError(f"Program did not halt within {max_cycles} cycles")
+
+
+def fmt(value):
+    return "X" if value is None else f"{value:08x}"
+
+
+def reg(rd):
+    return "-" if rd is None else f"x{rd}"
@@ -0,0 +1,69 @@
+`timescale 1ns/1ps
+
+// Performance counters, readable with Zicsr instructions through csr_addr_i
+// and from testbenches through the counter registers. All counters are
+// 64 bits wide and read-only, CSR writes are ignored.
+module perf_counters
+    import riscv_pkg::*;
+#(parameter width_p = 32)
+(
+    input  logic                clk_i,
+    input  logic                rst_i,
+
+    input  logic                halt_i,         // Core is parked on ecall/ebreak
+    input  logic                retire_i,       // An instruction retires this cycle
+    input  logic                load_stall_i,   // Stalled waiting on a load
+    input  logic                store_stall_i,  // Stalled finishing a store
+    input  logic                branch_taken_i, // Conditional branch taken this cycle
+    input  logic                flush_i,        // Wrong-path instruction squashed
+
+    input  logic [11:0]         csr_addr_i,
+    output logic [width_p-1:0]  csr_rdata_o
+);
+
+    logic [63:0] mcycle;
+    logic [63:0] minstret;
+    logic [63:0] load_stall_cycles;
+    logic [63:0] store_stall_cycles;
+    logic [63:0] branches_taken;
+    logic [63:0] flush_cycles;
+
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            mcycle <= '0;
+            minstret <= '0;
+            load_stall_cycles <= '0;
+            store_stall_cycles <= '0;
+            branches_taken <= '0;
+            flush_cycles <= '0;
+        end else begin
+            // Cycles spent parked on ecall don't belong to the program
+            if (!halt_i) mcycle <= mcycle + 1;
+            if (retire_i) minstret <= minstret + 1;
+            if (load_stall_i) load_stall_cycles <= load_stall_cycles + 1;
+            if (store_stall_i) store_stall_cycles <= store_stall_cycles + 1;
+            if (branch_taken_i) branches_taken <= branches_taken + 1;
+            if (flush_i) flush_cycles <= flush_cycles + 1;
+        end
+    end
+
+    // Machine counters and their unprivileged read-only shadows read the same
+    always_comb begin
+        case (csr_addr_i)
+            CSR_MCYCLE, CSR_CYCLE:                 csr_rdata_o = mcycle[31:0];
+            CSR_MCYCLEH, CSR_CYCLEH:               csr_rdata_o = mcycle[63:32];
+            CSR_MINSTRET, CSR_INSTRET:             csr_rdata_o = minstret[31:0];
+            CSR_MINSTRETH, CSR_INSTRETH:           csr_rdata_o = minstret[63:32];
+            CSR_MHPMCOUNTER3, CSR_HPMCOUNTER3:     csr_rdata_o = load_stall_cycles[31:0];
+            CSR_MHPMCOUNTER3H, CSR_HPMCOUNTER3H:   csr_rdata_o = load_stall_cycles[63:32];
+            CSR_MHPMCOUNTER4, CSR_HPMCOUNTER4:     csr_rdata_o = store_stall_cycles[31:0];
+            CSR_MHPMCOUNTER4H, CSR_HPMCOUNTER4H:   csr_rdata_o = store_stall_cycles[63:32];
+            CSR_MHPMCOUNTER5, CSR_HPMCOUNTER5:     csr_rdata_o = branches_taken[31:0];
+            CSR_MHPMCOUNTER5H, CSR_HPMCOUNTER5H:   csr_rdata_o = branches_taken[63:32];
+            CSR_MHPMCOUNTER6, CSR_HPMCOUNTER6:     csr_rdata_o = flush_cycles[31:0];
+            CSR_MHPMCOUNTER6H, CSR_HPMCOUNTER6H:   csr_rdata_o = flush_cycles[63:32];
+            default:                               csr_rdata_o = '0;
+        endcase
+    end
+
+endmodule
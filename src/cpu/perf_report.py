@@ -0,0 +1,82 @@
+"""CPI and stall breakdown from the cores' performance counters"""
+from collections import namedtuple
+
+PerfCounters = namedtuple("PerfCounters", "cycles instret load_stalls store_stalls branches_taken flush_cycles")
+ICacheStats = namedtuple("ICacheStats", "hits misses refill_cycles")
+BranchStats = namedtuple("BranchStats", "predictions mispredictions")
+
+
+def read_counters(dut):
+    """Counter values through the hierarchy, no CSR instructions needed"""
+    perf = dut.perf
+    return PerfCounters(int(perf.mcycle.value), int(perf.minstret.value),
+                        int(perf.load_stall_cycles.value), int(perf.store_stall_cycles.value),
+                        int(perf.branches_taken.value), int(perf.flush_cycles.value))
+
+
+def read_icache(dut):
+    """Instruction cache counters, None for a core without the cache or built with none"""
+    icache = getattr(dut, "icache", None)
+    if icache is None:
+        return None
+    stats = ICacheStats(int(icache.hits.value), int(icache.misses.value), int(icache.refill_cycles.value))
+    # Every fetch is a hit or a miss, so a run that fetched anything counted some
+    return stats if stats.hits or stats.misses else None
+
+
+def read_predictor(dut):
+    """Branch predictor counters, None for a core without one"""
+    bp = getattr(dut, "bp", None)
+    if bp is None:
+        return None
+    return BranchStats(int(bp.predictions.value), int(bp.mispredictions.value))
+
+
+def format_predictor(stats):
+    rate = 100 * stats.mispredictions / stats.predictions if stats.predictions else 0
+    return f"  mispredicted   {stats.mispredictions:10} of {stats.predictions} branches and jumps ({rate:5.1f}%)"
+
+
+def format_icache(stats, cycles):
+    lookups = stats.hits + stats.misses
+    return "\n".join([
+        f"  icache hits    {stats.hits:10} ({100 * stats.hits / lookups:5.1f}% of {lookups} fetches)",
+        f"  icache misses  {stats.misses:10}",
+        f"  refill stalls  {stats.refill_cycles:10} cycles ({100 * stats.refill_cycles / cycles if cycles else 0:5.1f}%)",
+    ])
+
+
+def format_report(counters, title="riscv_core"):
+    cycles = counters.cycles
+    cpi = cycles / counters.instret if counters.instret else float("nan")
+    # Whatever isn't an instruction, a stall or a flush: filling the pipeline
+    # after reset, and instruction cache refills
+    other = (cycles - counters.instret - counters.load_stalls - counters.store_stalls
+             - counters.flush_cycles)
+
+    def share(value):
+        return f"{value:10} cycles ({100 * value / cycles if cycles else 0:5.1f}%)"
+
+    return "\n".join([
+        f"{title}: {cycles} cycles, {counters.instret} instructions, CPI {cpi:.3f}",
+        f"  retiring       {share(counters.instret)}",
+        f"  load stalls    {share(counters.load_stalls)}",
+        f"  store stalls   {share(counters.store_stalls)}",
+        f"  flushes        {share(counters.flush_cycles)}",
+        f"  other          {share(other)}",
+        f"  taken branches {counters.branches_taken:10}",
+    ])
+
+
+def log_report(dut, title="riscv_core"):
+    """Log the report for the current counter values and return them"""
+    counters = read_counters(dut)
+    report = format_report(counters, title)
+    icache = read_icache(dut)
+    if icache is not None:
+        report += "\n" + format_icache(icache, counters.cycles)
+    branches = read_predictor(dut)
+    if branches is not None:
+        report += "\n" + format_predictor(branches)
+    dut._log.info(report)
+    return counters
@@ -22,7 +22,9 @@ module program_counter #(
     end
 
     always_comb begin
-        if (take_branch_i) begin
+        if (stall_i) begin
+            pc_n = pc_o;                // Hold while the core is stalled
+        end else if (take_branch_i) begin
             pc_n = branch_target_i;   // Branch or JAL target
         end else begin
             pc_n = pc_o + 4;            // Normal increment
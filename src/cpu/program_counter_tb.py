@@ -2,13 +2,18 @@ import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge, FallingEdge
 
+from tb_utils import CLOCK_PERIOD_NS
+
 @cocotb.test()
 async def test_program_counter(dut):
     """ Test the Program Counter """
 
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
+    dut.stall_i.value = 0
+    dut.take_branch_i.value = 0
+
     # Reset
     dut.rst_i.value = 1
     await RisingEdge(dut.clk_i)
@@ -36,4 +41,11 @@ async def test_program_counter(dut):
     await FallingEdge(dut.clk_i)
     assert dut.pc_o.value == 0x1004, f"PC not incrementing after jump, expected 0x1004, got {hex(dut.pc_o.value)}"
 
+    # Stall holds the PC
+    dut.stall_i.value = 1
+    await RisingEdge(dut.clk_i)
+    await FallingEdge(dut.clk_i)
+    assert dut.pc_o.value == 0x1004, f"PC changed while stalled, expected 0x1004, got {hex(dut.pc_o.value)}"
+    dut.stall_i.value = 0
+
     dut._log.info("Program Counter Test Passed!")
@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from cocotb.triggers import First, RisingEdge, Timer
+from cocotb.utils import get_sim_time
+
+from rv32i_asm import Program, load_image
+from rv32i_model import load_hex
+
+
+def read_image(image):
+    """Word list from a list of ints or a $readmemh file path"""
+    if isinstance(image, (str, Path)):
+        return load_hex(image)
+    return list(image)
+
+
+def read_program(program, data):
+    """(program, data) images, assembly/ELF files and Programs bring their own data"""
+    if isinstance(program, (str, Path)) and Path(program).suffix != ".hex":
+        program = load_image(program)
+    if isinstance(program, Program):
+        return program.text, data or program.data
+    return read_image(program), read_image(data)
+
+
+def write_memory(mem, words):
+    """Backdoor write into a ram_1r1w_sync mem array, zero filling the rest"""
+    depth = len(mem)
+    if len(words) > depth:
+        raise ValueError(f"Image has {len(words)} words but the memory only holds {depth}")
+    for i in range(depth):
+        mem[i].value = words[i] if i < len(words) else 0
+
+
+async def load_program(dut, program, data=()):
+    """Load a program (and data) image into riscv_core's memories through the hierarchy.
+
+    Call before reset is released. Lets one riscv_core build run any
+    number of programs instead of baking one in through INIT_FILE. Data
+    memory is cleared unless a data image is given (or the program has a
+    .data section), since memory contents otherwise carry over between
+    tests in the same simulation.
+
+    program can be a word list, a .hex file, an assembly or ELF file, or
+    a Program from rv32i_asm.
+    """
+    # Wait a step so the $readmemh in the memories' initial blocks can't
+    # overwrite what we load
+    program, data = read_program(program, data)
+    await Timer(1, units="step")
+    write_memory(dut.instr_mem.instruction_ram.mem, program)
+    write_memory(dut.data_mem.data_ram.mem, data)
+
+
+async def run_until_halt(dut, max_cycles):
+    """Let the core run until halted_o rises, return the cycles that took.
+
+    One trigger for the whole run instead of a Python callback every
+    clock, so long programs run at the simulator's own speed. The clock
+    period is measured on the first two edges, the rest of the run waits
+    on halted_o with a timeout of the remaining cycles. The register file
+    and memories hold the final state once it returns. Fails if the core
+    hasn't halted within max_cycles clocks.
+    """
+    if dut.halted_o.value:
+        return 0
+    edges = []
+    for _ in range(2):
+        await RisingEdge(dut.clk_i)
+        edges.append(get_sim_time("step"))
+        # halted_o takes its new value after the edge
+        await Timer(1, units="step")
+        if dut.halted_o.value:
+            return len(edges)
+    period = edges[1] - edges[0]
+    if max_cycles <= len(edges):
+        raise AssertionError(f"Program did not halt within {max_cycles} cycles")
+    # Until half a cycle after the last edge allowed
+    last_edge = edges[0] + (max_cycles - 1) * period
+    timeout = Timer(last_edge + period // 2 - get_sim_time("step"), units="step")
+    if await First(RisingEdge(dut.halted_o), timeout) is timeout:
+        raise AssertionError(f"Program did not halt within {max_cycles} cycles")
+    return round((get_sim_time("step") - edges[0]) / period) + 1
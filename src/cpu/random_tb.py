@@ -0,0 +1,56 @@
+import json
+import os
+
+import cocotb
+from cocotb.clock import Clock
+
+from core_coverage import save_coverage, start_coverage
+from lockstep import LockstepChecker
+from program_loader import load_program
+from rv32i_asm import assemble
+from rv32i_random import BUFFER_WORDS, generate, parse_seeds
+from tb_utils import CLOCK_PERIOD_NS, read_memory, reset
+from waves import record_waves
+
+@cocotb.test()
+@record_waves
+async def test_random_programs(dut):
+    """Run a random program per seed in RANDOM_SEEDS to ecall in lockstep with the model.
+
+    RANDOM_LENGTH sets the program length. One simulation runs all the
+    seeds back to back, a failing seed doesn't stop the rest. Failing
+    seeds and their errors go to RANDOM_JSON if set.
+    """
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+    coverage = start_coverage(dut)
+
+    seeds = parse_seeds(os.getenv("RANDOM_SEEDS", "0-9"))
+    length = int(os.getenv("RANDOM_LENGTH", "200"))
+    failures = {}
+    for seed in seeds:
+        program = assemble(generate(seed, length), name=f"seed {seed}")
+        await load_program(dut, program)
+        await reset(dut)
+
+        checker = LockstepChecker(dut)
+        try:
+            await checker.run(max_cycles=100000)
+            words = read_memory(dut.data_mem.data_ram.mem, 0, BUFFER_WORDS)
+            expected = [int.from_bytes(checker.model.dmem[4 * i:4 * i + 4], "little")
+                        for i in range(BUFFER_WORDS)]
+            mismatches = [f"word {i}: core {a:08x}, model {b:08x}"
+                          for i, (a, b) in enumerate(zip(words, expected)) if a != b]
+            assert not mismatches, "Data memory differs from the model's:\n  " + "\n  ".join(mismatches)
+        except AssertionError as e:
+            failures[seed] = str(e)
+            dut._log.error(f"seed {seed} failed: {e}")
+
+    if os.getenv("RANDOM_JSON"):
+        with open(os.environ["RANDOM_JSON"], "w") as f:
+            json.dump({"core": dut._name, "length": length, "seeds": len(seeds),
+                       "failures": {str(seed): error for seed, error in failures.items()}}, f, indent=2)
+
+    save_coverage(coverage, "test_random_programs")
+    dut._log.info(f"{len(seeds) - len(failures)}/{len(seeds)} random programs passed")
+    assert not failures, f"seeds failed: {sorted(failures)}"
@@ -5,6 +5,8 @@ from cocotb.utils import get_sim_time
 
 import os
 
+from tb_utils import CLOCK_PERIOD_NS
+
 # @cocotb.test()
 # async def test_simple(dut):
 #     # Start the clock
@@ -25,7 +27,7 @@ import os
 
 @cocotb.test()
 async def test_register_file(dut):
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
     # Reset
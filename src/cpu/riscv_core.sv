@@ -4,10 +4,16 @@
 module riscv_core #(
     parameter WIDTH = 32,
     parameter MEM_DEPTH = 1024,
-    parameter INIT_FILE = ""
+    parameter INIT_FILE = "",
+    // Instruction cache in front of the program memory, none with 0 sets
+    parameter ICACHE_SETS = 0,
+    parameter ICACHE_WAYS = 1,
+    parameter ICACHE_LINE_WORDS = 4,
+    parameter IMEM_LATENCY = 0     // Cycles before a refill's first word, with the cache
     ) (
         input  logic        clk_i,
-        input  logic        rst_i
+        input  logic        rst_i,
+        output logic        halted_o    // Parked on ecall/ebreak
     );
         
     import riscv_pkg::*;
@@ -18,10 +24,25 @@ module riscv_core #(
     logic [WIDTH-1:0] alu_result;
     logic [WIDTH-1:0] immediate;
     logic [WIDTH-1:0] rs1_data, rs2_data;
+    logic [WIDTH-1:0] rf_rs1_data, rf_rs2_data;
     logic [WIDTH-1:0] alu_input1, alu_input2;
     logic [WIDTH-1:0] data_mem_read_data;
+    logic [WIDTH-1:0] exec_result;
     logic [WIDTH-1:0] write_back_data;
 
+    // Write-back stage: results are written to the register file the cycle
+    // after the instruction executes, which gives the synchronous data RAM
+    // the cycle it needs without stalling on loads
+    logic wb_valid;
+    logic [4:0] wb_rd;
+    logic wb_from_mem;
+    logic [2:0] wb_funct3;
+    logic [1:0] wb_offset;
+    logic [WIDTH-1:0] wb_result;
+    logic [WIDTH-1:0] load_data;
+    logic [WIDTH-1:0] store_data;
+    logic [3:0] store_mask;
+
     // Control signals
     logic reg_write;
     logic mem_to_reg;
@@ -37,7 +58,11 @@ module riscv_core #(
     instruction_type_e inst_type;
     imm_type_e imm_type;
     logic data_mem_stall_lo;
+    logic fetch_busy;
     logic stall;
+    logic halt;
+    logic is_csr;
+    logic [WIDTH-1:0] csr_rdata;
 
 
     // Decoded instruction fields
@@ -49,16 +74,49 @@ module riscv_core #(
     logic [WIDTH-1:0] branch_target;
 
     logic [WIDTH-1:0] next_instruction_address;
-    assign stall = data_mem_stall_lo || (opcode == OP_SYSTEM);
+    logic [WIDTH-1:0] pc_after_branch;
+    logic [WIDTH-1:0] instr_pc;     // Address of the executing instruction
+    // ecall/ebreak park the core, CSR instructions share the opcode but run normally
+    assign halt = (opcode == OP_SYSTEM) && (funct3 == 3'b000);
+    assign stall = data_mem_stall_lo || halt || fetch_busy;
     assign next_instruction_address = take_branch ? branch_target : pc;
+    // pc is the address after the instruction being fetched, so a taken
+    // branch fetches branch_target now and continues after it
+    assign pc_after_branch = branch_target + 4;
+    assign instr_pc = pc - 4;
+
+    // Retirement info for testbench monitors: the fetched instruction is
+    // valid from the first fetch after reset and retires when not stalled
+    logic instr_valid;
+    logic retire;
+    logic [WIDTH-1:0] retire_pc;
+    logic [WIDTH-1:0] retire_instruction;
+    logic retire_mem_read, retire_mem_write;
+    logic [WIDTH-1:0] retire_mem_addr, retire_store_data;
+
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            instr_valid <= 1'b0;
+        end else begin
+            instr_valid <= 1'b1;
+        end
+    end
+
+    assign retire = instr_valid && !stall;
+    assign retire_pc = instr_pc;
+    assign retire_instruction = instruction;
+    assign retire_mem_read = mem_read;
+    assign retire_mem_write = mem_write;
+    assign retire_mem_addr = alu_result;
+    assign retire_store_data = rs2_data;
 
     branch_target_generator #(.width_p(WIDTH)) branch_tgt_gen (
         .is_branch_i(is_branch),
         .is_jal_i(is_jal),
         .is_jalr_i(is_jalr),
-        .pc_i(pc),
+        .pc_i(instr_pc),
         .immediate_i(immediate),
-        .alu_result_i(alu_result),
+        .rs1_i(rs1_data),
         .branch_target_o(branch_target)
     );
 
@@ -68,16 +126,39 @@ module riscv_core #(
         .rst_i(rst_i),
         .take_branch_i(take_branch),
         .stall_i(stall),
-        .branch_target_i(branch_target),
+        .branch_target_i(pc_after_branch),
         .pc_o(pc)
     );
 
-    instruction_memory #(.width_p(WIDTH), .depth_p(MEM_DEPTH), .init_file_p(INIT_FILE)) instr_mem (
+    logic [WIDTH-1:0] imem_addr;
+    logic imem_stall;
+    logic [WIDTH-1:0] imem_data;
+
+    // Without sets the cache passes fetches straight through to instr_mem
+    instruction_cache #(
+        .width_p(WIDTH),
+        .sets_p(ICACHE_SETS),
+        .ways_p(ICACHE_WAYS),
+        .line_words_p(ICACHE_LINE_WORDS),
+        .mem_latency_p(IMEM_LATENCY)
+    ) icache (
         .clk_i(clk_i),
-        .reset_i(rst_i),
+        .rst_i(rst_i),
         .pc_i(next_instruction_address),
         .stall_i(stall),
         .instruction_o(instruction),
+        .busy_o(fetch_busy),
+        .mem_addr_o(imem_addr),
+        .mem_stall_o(imem_stall),
+        .mem_data_i(imem_data)
+    );
+
+    instruction_memory #(.width_p(WIDTH), .depth_p(MEM_DEPTH), .init_file_p(INIT_FILE)) instr_mem (
+        .clk_i(clk_i),
+        .reset_i(rst_i),
+        .pc_i(imem_addr),
+        .stall_i(imem_stall),
+        .instruction_o(imem_data),
         .load_enable_i(1'b0), // Not implementing instruction loading for now
         .load_addr_i('0),
         .load_data_i('0)
@@ -107,7 +188,8 @@ module riscv_core #(
         .mem_write_mask_o(mem_write_mask),
         .is_branch_o(is_branch),
         .is_jal_o(is_jal),
-        .is_jalr_o(is_jalr)
+        .is_jalr_o(is_jalr),
+        .is_csr_o(is_csr)
     );
 
     alu_control alu_ctrl (
@@ -128,13 +210,17 @@ module riscv_core #(
         .rst_i(rst_i),
         .rs1_addr(rs1),
         .rs2_addr(rs2),
-        .rd_addr(rd),
+        .rd_addr(wb_rd),
         .rd_data(write_back_data),
-        .wr_en(reg_write),
-        .rs1_data(rs1_data),
-        .rs2_data(rs2_data)
+        .wr_en(wb_valid),
+        .rs1_data(rf_rs1_data),
+        .rs2_data(rf_rs2_data)
     );
 
+    // Forward the write-back stage to the instruction reading its result
+    assign rs1_data = (wb_valid && wb_rd == rs1) ? write_back_data : rf_rs1_data;
+    assign rs2_data = (wb_valid && wb_rd == rs2) ? write_back_data : rf_rs2_data;
+
     immediate_generator imm_gen (
         .instruction_i(instruction),
         .imm_type_i(imm_type),
@@ -145,7 +231,7 @@ module riscv_core #(
     always_comb begin
         case (alu_src1)
             ALU_SRC_REG:  alu_input1 = rs1_data;
-            ALU_SRC_PC:   alu_input1 = pc;
+            ALU_SRC_PC:   alu_input1 = instr_pc;
             ALU_SRC_ZERO: alu_input1 = '0;
             default:      alu_input1 = rs1_data;
         endcase
@@ -173,24 +259,77 @@ module riscv_core #(
         .is_jalr_i(is_jalr),
         .funct3_i(funct3),
         .zero_flag_i(alu_zero),
-        .negative_flag_i(alu_sign),
-        .overflow_flag_i(1'b0), // We're not calculating overflow in the ALU currently
         .take_branch_o(take_branch)
     );
 
+    store_align #(.width_p(WIDTH)) store_align_inst (
+        .mask_i(mem_write_mask),
+        .offset_i(alu_result[1:0]),
+        .data_i(rs2_data),
+        .mask_o(store_mask),
+        .data_o(store_data)
+    );
+
     data_memory #(.width_p(WIDTH), .depth_p(MEM_DEPTH)) data_mem (
         .clk_i(clk_i),
         .reset_i(rst_i),
         .addr_i(alu_result),
         .read_enable_i(mem_read),
         .write_enable_i(mem_write),
-        .write_data_i(rs2_data),
-        .write_mask_i(mem_write_mask),
+        .write_data_i(store_data),
+        .write_mask_i(store_mask),
         .read_data_o(data_mem_read_data),
         .busy_o(data_mem_stall_lo)
     );
 
-    // Write-back mux
-    assign write_back_data = mem_to_reg ? data_mem_read_data : alu_result;
+    perf_counters #(.width_p(WIDTH)) perf (
+        .clk_i(clk_i),
+        .rst_i(rst_i),
+        .halt_i(halt),
+        .retire_i(retire),
+        .load_stall_i(data_mem_stall_lo && mem_read),
+        .store_stall_i(data_mem_stall_lo && mem_write),
+        .branch_taken_i(retire && is_branch && take_branch),
+        .flush_i(1'b0),             // Nothing is fetched ahead to flush
+        .csr_addr_i(instruction[31:20]),
+        .csr_rdata_o(csr_rdata)
+    );
+
+    assign exec_result = is_csr ? csr_rdata : alu_result;
+
+    // A cycle after the core parks, so the write-back of the instruction
+    // before the ecall has landed in the register file when this rises
+    always_ff @(posedge clk_i) begin
+        if (rst_i) halted_o <= 1'b0;
+        else halted_o <= halt;
+    end
+
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            wb_valid <= 1'b0;
+            wb_rd <= '0;
+            wb_from_mem <= 1'b0;
+            wb_funct3 <= '0;
+            wb_offset <= '0;
+            wb_result <= '0;
+        end else begin
+            wb_valid <= retire && reg_write && rd != 0;
+            wb_rd <= rd;
+            wb_from_mem <= mem_to_reg;
+            wb_funct3 <= funct3;
+            wb_offset <= alu_result[1:0];
+            wb_result <= exec_result;
+        end
+    end
+
+    load_extend #(.width_p(WIDTH)) load_ext (
+        .funct3_i(wb_funct3),
+        .offset_i(wb_offset),
+        .word_i(data_mem_read_data),
+        .data_o(load_data)
+    );
+
+    // Write-back mux, load data arrives from the RAM during write-back
+    assign write_back_data = wb_from_mem ? load_data : wb_result;
 
 endmodule
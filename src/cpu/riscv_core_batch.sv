@@ -0,0 +1,33 @@
+`timescale 1ns/1ps
+
+// CORES independent riscv_cores in one simulation, so one simulator process
+// (and one build, elaboration and cocotb start) runs many programs. Each
+// core has its own memories, reset bit and halted bit, they only share the
+// clock. Testbenches reach core i as gen_core[i].core and load and reset
+// each one on its own (see batch_tb.py). Simulation only.
+module riscv_core_batch #(
+    parameter CORES = 8,
+    parameter WIDTH = 32,
+    parameter MEM_DEPTH = 1024,
+    parameter INIT_FILE = ""
+    ) (
+        input  logic                clk_i,
+        input  logic [CORES-1:0]    rst_i,
+        output logic [CORES-1:0]    halted_o
+    );
+
+    generate
+    for (genvar i = 0; i < CORES; i++) begin : gen_core
+        riscv_core #(
+            .WIDTH(WIDTH),
+            .MEM_DEPTH(MEM_DEPTH),
+            .INIT_FILE(INIT_FILE)
+        ) core (
+            .clk_i(clk_i),
+            .rst_i(rst_i[i]),
+            .halted_o(halted_o[i])
+        );
+    end
+    endgenerate
+
+endmodule
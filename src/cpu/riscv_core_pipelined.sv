@@ -0,0 +1,487 @@
+`timescale 1ns/1ps
+
+// Five-stage pipelined version of riscv_core: IF, ID, EX, MEM, WB.
+//
+// Same ports, parameters and decode/execute modules as the single-cycle
+// core, so the riscv_core testbench runs on it unchanged. Instead of one
+// path from the instruction RAM through the ALU into the data RAM, each
+// stage ends in pipeline registers:
+//
+//   IF   instruction RAM read at next_instruction_address
+//   ID   decode, register file read (bypassed from WB), load-use interlock
+//   EX   ALU with forwarding from MEM and WB, branches resolve, data RAM
+//        address/write data presented to the RAM
+//   MEM  load data out of the RAM, CSR reads; instructions retire here
+//   WB   register file write
+//
+// Fetch follows branch_predictor: a branch or jump it predicts taken
+// fetches its target right behind it. A prediction found wrong in EX
+// redirects fetch from a register, which flushes the two younger
+// instructions behind it. With BRANCH_PREDICTOR BP_NONE nothing is
+// predicted taken and every taken branch and jump costs those two cycles. A load followed directly by
+// an instruction using its result costs one bubble: load data isn't
+// forwarded out of MEM so the RAM output doesn't end up in front of the
+// ALU again.
+module riscv_core_pipelined #(
+    parameter WIDTH = 32,
+    parameter MEM_DEPTH = 1024,
+    parameter INIT_FILE = "",
+    parameter BRANCH_PREDICTOR = 0,     // riscv_pkg BP_*
+    parameter BTB_ENTRIES = 16,
+    parameter BHT_ENTRIES = 64,         // 2-bit counters of the bimodal and gshare predictors
+    parameter HISTORY_BITS = 6          // Branch outcomes gshare hashes into the counter index
+    ) (
+        input  logic        clk_i,
+        input  logic        rst_i,
+        output logic        halted_o    // Parked on ecall/ebreak
+    );
+
+    import riscv_pkg::*;
+    import alu_pkg::*;
+
+    // ---------------------------------------------------------------- IF --
+    logic [WIDTH-1:0] pc;                       // Next sequential fetch address
+    logic [WIDTH-1:0] next_instruction_address;
+    logic stall;                                // Hold IF and ID
+    logic redirect;                             // Mispredicted instruction in last cycle's EX
+    logic [WIDTH-1:0] redirect_target;          // Where it should have gone
+    logic predict_taken;                        // Prediction for the instruction in ID
+    logic [WIDTH-1:0] predict_target;
+    logic [$clog2(BHT_ENTRIES)-1:0] predict_index;
+
+    assign next_instruction_address = redirect ? redirect_target : predict_taken ? predict_target : pc;
+
+    program_counter #(.width_p(WIDTH)) pc_inst (
+        .clk_i(clk_i),
+        .rst_i(rst_i),
+        .take_branch_i(redirect || predict_taken),
+        .stall_i(stall),
+        .branch_target_i(next_instruction_address + 4),
+        .pc_o(pc)
+    );
+
+    // ---------------------------------------------------------------- ID --
+    logic [WIDTH-1:0] instruction;              // Instruction RAM output
+    logic [WIDTH-1:0] id_pc;
+    logic id_valid;
+
+    instruction_memory #(.width_p(WIDTH), .depth_p(MEM_DEPTH), .init_file_p(INIT_FILE)) instr_mem (
+        .clk_i(clk_i),
+        .reset_i(rst_i),
+        .pc_i(next_instruction_address),
+        .stall_i(stall),
+        .instruction_o(instruction),
+        .load_enable_i(1'b0),
+        .load_addr_i('0),
+        .load_data_i('0)
+    );
+
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            id_valid <= 1'b0;
+            id_pc <= '0;
+        end else if (!stall) begin
+            id_valid <= 1'b1;
+            id_pc <= next_instruction_address;
+        end
+    end
+
+    logic [6:0] opcode;
+    logic [2:0] funct3;
+    logic [6:0] funct7;
+    logic [4:0] rd, rs1, rs2;
+    instruction_type_e inst_type;
+    imm_type_e imm_type;
+    logic reg_write, mem_to_reg, mem_write, mem_read;
+    logic [3:0] mem_write_mask;
+    logic is_branch, is_jal, is_jalr, is_csr;
+    alu_op_e alu_op;
+    alu_src_e alu_src1, alu_src2;
+    logic [WIDTH-1:0] immediate;
+    logic [WIDTH-1:0] rf_rs1_data, rf_rs2_data;
+    logic [WIDTH-1:0] id_rs1_data, id_rs2_data;
+    logic is_halt;
+
+    instruction_decoder instr_decoder (
+        .instruction_i(instruction),
+        .opcode_o(opcode),
+        .funct3_o(funct3),
+        .funct7_o(funct7),
+        .rd_o(rd),
+        .rs1_o(rs1),
+        .rs2_o(rs2),
+        .inst_type_o(inst_type),
+        .imm_type_o(imm_type)
+    );
+
+    control_unit ctrl_unit (
+        .inst_type_i(inst_type),
+        .imm_type_i(imm_type),
+        .opcode_i(opcode),
+        .funct3_i(funct3),
+        .reg_write_o(reg_write),
+        .mem_to_reg_o(mem_to_reg),
+        .mem_write_o(mem_write),
+        .mem_read_o(mem_read),
+        .mem_write_mask_o(mem_write_mask),
+        .is_branch_o(is_branch),
+        .is_jal_o(is_jal),
+        .is_jalr_o(is_jalr),
+        .is_csr_o(is_csr)
+    );
+
+    alu_control alu_ctrl (
+        .inst_type_i(inst_type),
+        .opcode_i(opcode),
+        .funct3_i(funct3),
+        .funct7_i(funct7),
+        .is_branch_i(is_branch),
+        .is_jal_i(is_jal),
+        .is_jalr_i(is_jalr),
+        .alu_op_o(alu_op),
+        .alu_src1_o(alu_src1),
+        .alu_src2_o(alu_src2)
+    );
+
+    immediate_generator imm_gen (
+        .instruction_i(instruction),
+        .imm_type_i(imm_type),
+        .immediate_o(immediate)
+    );
+
+    // Write-back stage signals, declared here for the register file
+    logic wb_valid;
+    logic [4:0] wb_rd;
+    logic [WIDTH-1:0] wb_result;
+    logic [WIDTH-1:0] write_back_data;
+
+    register_file #(.width_p(WIDTH), .depth_p(32)) reg_file (
+        .clk_i(clk_i),
+        .rst_i(rst_i),
+        .rs1_addr(rs1),
+        .rs2_addr(rs2),
+        .rd_addr(wb_rd),
+        .rd_data(write_back_data),
+        .wr_en(wb_valid),
+        .rs1_data(rf_rs1_data),
+        .rs2_data(rf_rs2_data)
+    );
+
+    // The register file is written at the end of WB, bypass it for ID
+    assign id_rs1_data = (wb_valid && wb_rd == rs1) ? write_back_data : rf_rs1_data;
+    assign id_rs2_data = (wb_valid && wb_rd == rs2) ? write_back_data : rf_rs2_data;
+
+    // ecall/ebreak; CSR instructions share the opcode
+    assign is_halt = (opcode == OP_SYSTEM) && (funct3 == 3'b000);
+
+    // EX and MEM stage registers, declared here for the hazard logic
+    logic ex_valid, ex_reg_write, ex_mem_write, ex_mem_read;
+    logic ex_is_branch, ex_is_jal, ex_is_jalr, ex_is_csr, ex_is_halt;
+    logic [3:0] ex_mem_write_mask;
+    logic [2:0] ex_funct3;
+    logic [4:0] ex_rd, ex_rs1, ex_rs2;
+    alu_op_e ex_alu_op;
+    alu_src_e ex_alu_src1, ex_alu_src2;
+    logic [WIDTH-1:0] ex_pc, ex_instruction, ex_immediate, ex_rs1_data, ex_rs2_data;
+    logic ex_predict_taken;
+    logic [WIDTH-1:0] ex_predict_target;
+    logic [$clog2(BHT_ENTRIES)-1:0] ex_predict_index;
+    logic take_branch;
+    logic [WIDTH-1:0] branch_target;
+    logic mispredict;
+
+    logic mem_valid, mem_reg_write, mem_is_load, mem_is_store;
+    logic mem_is_branch, mem_taken, mem_is_csr, mem_is_halt;
+    logic [2:0] mem_funct3;
+    logic [4:0] mem_rd;
+    logic [WIDTH-1:0] mem_pc, mem_instruction, mem_alu_result, mem_store_data;
+
+    // Once the halting ecall has left ID nothing behind it may issue
+    logic halting;
+
+    // Load in EX whose result the instruction in ID needs: hold ID for a
+    // cycle. rs1/rs2 are compared whether or not the instruction reads
+    // them, a spurious bubble is cheaper than decoding which ones it uses.
+    logic load_use;
+    assign load_use = ex_valid && ex_mem_read && ex_rd != 0 && (ex_rd == rs1 || ex_rd == rs2);
+
+    // The instruction in ID is on the wrong path
+    logic flush;
+    assign flush = mispredict || redirect || halting;
+
+    logic issue;
+    assign issue = id_valid && !flush && !load_use;
+    assign stall = (load_use && !flush) || halting;
+
+    // ---------------------------------------------------------------- EX --
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            ex_valid <= 1'b0;
+            halting <= 1'b0;
+        end else begin
+            ex_valid <= issue;
+            if (issue && is_halt) halting <= 1'b1;
+        end
+    end
+
+    always_ff @(posedge clk_i) begin
+        ex_reg_write <= reg_write;
+        ex_mem_write <= mem_write;
+        ex_mem_read <= mem_read;
+        ex_mem_write_mask <= mem_write_mask;
+        ex_is_branch <= is_branch;
+        ex_is_jal <= is_jal;
+        ex_is_jalr <= is_jalr;
+        ex_is_csr <= is_csr;
+        ex_is_halt <= is_halt;
+        ex_funct3 <= funct3;
+        ex_alu_op <= alu_op;
+        ex_alu_src1 <= alu_src1;
+        ex_alu_src2 <= alu_src2;
+        ex_rd <= rd;
+        ex_rs1 <= rs1;
+        ex_rs2 <= rs2;
+        ex_pc <= id_pc;
+        ex_instruction <= instruction;
+        ex_immediate <= immediate;
+        ex_rs1_data <= id_rs1_data;
+        ex_rs2_data <= id_rs2_data;
+        ex_predict_taken <= predict_taken;
+        ex_predict_target <= predict_target;
+        ex_predict_index <= predict_index;
+    end
+
+    logic [WIDTH-1:0] rs1_data, rs2_data;
+    logic [WIDTH-1:0] alu_input1, alu_input2;
+    logic [WIDTH-1:0] alu_result;
+    logic [WIDTH-1:0] mem_result;
+    logic alu_zero, alu_sign;
+    logic fwd_mem_rs1, fwd_mem_rs2;
+
+    // Forward from MEM, then WB. A load in MEM never matches, the
+    // interlock keeps its consumer out of EX until the load reaches WB.
+    assign fwd_mem_rs1 = mem_valid && mem_reg_write && mem_rd != 0 && mem_rd == ex_rs1;
+    assign fwd_mem_rs2 = mem_valid && mem_reg_write && mem_rd != 0 && mem_rd == ex_rs2;
+
+    always_comb begin
+        if (fwd_mem_rs1) rs1_data = mem_result;
+        else if (wb_valid && wb_rd == ex_rs1) rs1_data = write_back_data;
+        else rs1_data = ex_rs1_data;
+
+        if (fwd_mem_rs2) rs2_data = mem_result;
+        else if (wb_valid && wb_rd == ex_rs2) rs2_data = write_back_data;
+        else rs2_data = ex_rs2_data;
+    end
+
+    always_comb begin
+        case (ex_alu_src1)
+            ALU_SRC_REG:  alu_input1 = rs1_data;
+            ALU_SRC_PC:   alu_input1 = ex_pc;
+            ALU_SRC_ZERO: alu_input1 = '0;
+            default:      alu_input1 = rs1_data;
+        endcase
+
+        case (ex_alu_src2)
+            ALU_SRC_REG:  alu_input2 = rs2_data;
+            ALU_SRC_IMM:  alu_input2 = ex_immediate;
+            ALU_SRC_FOUR: alu_input2 = 32'd4;
+            default:      alu_input2 = rs2_data;
+        endcase
+    end
+
+    alu #(.width_p(WIDTH)) alu_inst (
+        .d1_i(alu_input1),
+        .d2_i(alu_input2),
+        .alu_op_i(ex_alu_op),
+        .result_o(alu_result),
+        .zero_o(alu_zero),
+        .sign_o(alu_sign)
+    );
+
+    branch_control branch_ctrl (
+        .is_branch_i(ex_is_branch),
+        .is_jal_i(ex_is_jal),
+        .is_jalr_i(ex_is_jalr),
+        .funct3_i(ex_funct3),
+        .zero_flag_i(alu_zero),
+        .take_branch_o(take_branch)
+    );
+
+    branch_target_generator #(.width_p(WIDTH)) branch_tgt_gen (
+        .is_branch_i(ex_is_branch),
+        .is_jal_i(ex_is_jal),
+        .is_jalr_i(ex_is_jalr),
+        .pc_i(ex_pc),
+        .immediate_i(ex_immediate),
+        .rs1_i(rs1_data),
+        .branch_target_o(branch_target)
+    );
+
+    // The instruction fetched after the one in EX isn't the one that follows it
+    assign mispredict = ex_valid && (take_branch != ex_predict_taken
+                                     || (take_branch && branch_target != ex_predict_target));
+
+    // Registered so the ALU compare doesn't drive the instruction RAM address
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            redirect <= 1'b0;
+        end else begin
+            redirect <= mispredict;
+        end
+        redirect_target <= take_branch ? branch_target : ex_pc + 4;
+    end
+
+    branch_predictor #(
+        .width_p(WIDTH),
+        .predictor_p(BRANCH_PREDICTOR),
+        .btb_entries_p(BTB_ENTRIES),
+        .bht_entries_p(BHT_ENTRIES),
+        .history_bits_p(HISTORY_BITS)
+    ) bp (
+        .clk_i(clk_i),
+        .rst_i(rst_i),
+        .fetch_i(!stall),
+        .fetch_pc_i(next_instruction_address),
+        .predict_taken_o(predict_taken),
+        .predict_target_o(predict_target),
+        .predict_index_o(predict_index),
+        .resolve_i(ex_valid),
+        .resolve_pc_i(ex_pc),
+        .is_branch_i(ex_is_branch),
+        .is_jump_i(ex_is_jal || ex_is_jalr),
+        .taken_i(take_branch),
+        .target_i(branch_target),
+        .resolve_index_i(ex_predict_index),
+        .mispredict_i(mispredict)
+    );
+
+    // The data RAM sees the address at the end of EX and has the load data
+    // ready in MEM. Stores write at the end of EX, nothing older can still
+    // cancel them.
+    logic data_mem_read_enable, data_mem_write_enable;
+    logic [WIDTH-1:0] data_mem_read_data;
+    logic data_mem_busy;
+    logic [WIDTH-1:0] store_data;
+    logic [3:0] store_mask;
+
+    store_align #(.width_p(WIDTH)) store_align_inst (
+        .mask_i(ex_mem_write_mask),
+        .offset_i(alu_result[1:0]),
+        .data_i(rs2_data),
+        .mask_o(store_mask),
+        .data_o(store_data)
+    );
+
+    assign data_mem_read_enable = ex_valid && ex_mem_read;
+    assign data_mem_write_enable = ex_valid && ex_mem_write;
+
+    data_memory #(.width_p(WIDTH), .depth_p(MEM_DEPTH)) data_mem (
+        .clk_i(clk_i),
+        .reset_i(rst_i),
+        .addr_i(alu_result),
+        .read_enable_i(data_mem_read_enable),
+        .write_enable_i(data_mem_write_enable),
+        .write_data_i(store_data),
+        .write_mask_i(store_mask),
+        .read_data_o(data_mem_read_data),
+        .busy_o(data_mem_busy)      // Always 0, no need to stall on it
+    );
+
+    // --------------------------------------------------------------- MEM --
+    logic halt;
+    logic [WIDTH-1:0] csr_rdata;
+
+    // The halting ecall parks in MEM, everything older has retired
+    assign halt = mem_valid && mem_is_halt;
+
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            mem_valid <= 1'b0;
+        end else if (!halt) begin
+            mem_valid <= ex_valid;
+        end
+    end
+
+    always_ff @(posedge clk_i) begin
+        if (!halt) begin
+            mem_reg_write <= ex_reg_write;
+            mem_is_load <= ex_mem_read;
+            mem_is_store <= ex_mem_write;
+            mem_is_branch <= ex_is_branch;
+            mem_taken <= take_branch;
+            mem_is_csr <= ex_is_csr;
+            mem_is_halt <= ex_is_halt;
+            mem_funct3 <= ex_funct3;
+            mem_rd <= ex_rd;
+            mem_pc <= ex_pc;
+            mem_instruction <= ex_instruction;
+            mem_alu_result <= alu_result;
+            mem_store_data <= rs2_data;
+        end
+    end
+
+    perf_counters #(.width_p(WIDTH)) perf (
+        .clk_i(clk_i),
+        .rst_i(rst_i),
+        .halt_i(halt),
+        .retire_i(retire),
+        .load_stall_i(load_use && !flush),
+        .store_stall_i(1'b0),
+        .branch_taken_i(retire && mem_is_branch && mem_taken),
+        .flush_i(mispredict || redirect),
+        .csr_addr_i(mem_instruction[31:20]),
+        .csr_rdata_o(csr_rdata)
+    );
+
+    assign mem_result = mem_is_csr ? csr_rdata : mem_alu_result;
+
+    // A cycle after the core parks, so the write-back of the instruction
+    // before the ecall has landed in the register file when this rises
+    always_ff @(posedge clk_i) begin
+        if (rst_i) halted_o <= 1'b0;
+        else halted_o <= halt;
+    end
+
+    logic [WIDTH-1:0] load_data;
+
+    load_extend #(.width_p(WIDTH)) load_ext (
+        .funct3_i(mem_funct3),
+        .offset_i(mem_alu_result[1:0]),
+        .word_i(data_mem_read_data),
+        .data_o(load_data)
+    );
+
+    // Retirement info for testbench monitors, same meaning as in riscv_core
+    logic instr_valid;
+    logic retire;
+    logic [WIDTH-1:0] retire_pc;
+    logic [WIDTH-1:0] retire_instruction;
+    logic retire_mem_read, retire_mem_write;
+    logic [WIDTH-1:0] retire_mem_addr, retire_store_data;
+
+    assign instr_valid = mem_valid;
+    assign retire = mem_valid && !halt;
+    assign retire_pc = mem_pc;
+    assign retire_instruction = mem_instruction;
+    assign retire_mem_read = mem_is_load;
+    assign retire_mem_write = mem_is_store;
+    assign retire_mem_addr = mem_alu_result;
+    assign retire_store_data = mem_store_data;
+
+    // ---------------------------------------------------------------- WB --
+    always_ff @(posedge clk_i) begin
+        if (rst_i) begin
+            wb_valid <= 1'b0;
+            wb_rd <= '0;
+            wb_result <= '0;
+        end else begin
+            wb_valid <= retire && mem_reg_write && mem_rd != 0;
+            wb_rd <= mem_rd;
+            // Loads are the only instructions writing back memory data
+            wb_result <= mem_is_load ? load_data : mem_result;
+        end
+    end
+
+    assign write_back_data = wb_result;
+
+endmodule
@@ -1,29 +1,43 @@
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
 import cocotb
 from cocotb.triggers import Timer, RisingEdge, FallingEdge
 from cocotb.clock import Clock
-from cocotb.binary import BinaryValue
 
-async def reset(dut):
-    dut.rst_i.value = 1
-    await RisingEdge(dut.clk_i)
-    await RisingEdge(dut.clk_i)
-    dut.rst_i.value = 0
-    await RisingEdge(dut.clk_i)
+from checkpoint import (capture_at, from_model, load_checkpoint, model_from_checkpoint, restore,
+                        save_checkpoint)
+from commit_trace import CommitTraceMonitor, TraceReader
+from core_coverage import CoverageMonitor, save_coverage, start_coverage
+from func_coverage import Coverage
+from lockstep import LockstepChecker
+from perf_report import log_report, read_counters, read_icache, read_predictor
+from program_loader import load_program, run_until_halt
+from rv32i_asm import REGISTERS, assemble, load_image
+from riscv_pkg import opcode_e, predictor_e
+from rv32i_model import RV32IModel, load_hex
+from tb_utils import CLOCK_PERIOD_NS, read_memory, read_registers, reset, resolve_x, to_signed
+from waves import record_waves
+
+MEMORY_DIR = Path(__file__).resolve().parent.parent / "memory"
 
-def resolve_x(value, signed=False):
-    if isinstance(value, BinaryValue):
-        val = value.integer
-        if signed and (val & (1 << 31)):  # Check if MSB is set (negative)
-            val = val - (1 << 32)         # Convert to signed
-        return val
-    return int(value)
+# Cycles after reset before the first instruction retires, by top level
+FILL_CYCLES = {"riscv_core": 1, "riscv_core_pipelined": 3}
+# How the simulator was built, for the tests that only hold for some builds
+TOPLEVEL = os.getenv("TOPLEVEL", "riscv_core")
+CORE_PARAMETERS = json.loads(os.getenv("CORE_PARAMETERS", "{}"))
 
 @cocotb.test()
+@record_waves
 async def test_extended_program(dut):
     """Test the extended program execution"""
 
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
+    coverage = start_coverage(dut)
 
     await reset(dut)
 
@@ -38,47 +52,40 @@ async def test_extended_program(dut):
         11: 0,   # x11 should remain 0 (branch not taken)
     }
 
-    i = 0
-
-    # Run until we hit the ecall (adjust cycle count if needed)
-    while(True):
-        await RisingEdge(dut.clk_i)
-        if resolve_x(dut.instruction) == 0x00000073:  # ecall
-            break
+    # Run until we hit the ecall, checking every instruction against the model
+    checker = LockstepChecker(dut)
+    await checker.run(max_cycles=1000)
 
     # Check the register values
+    registers = read_registers(dut)
     for reg, expected_value in expected_values.items():
-        actual_value = resolve_x(dut.reg_file.registers[reg].value, signed=True)
+        actual_value = to_signed(registers[reg])
         print(f"Value at register {reg} is {actual_value}")
         assert actual_value == expected_value, f"Register x{reg} mismatch. Expected {expected_value}, got {actual_value}"
 
+    assert registers == checker.model.regs, f"Registers {registers} don't match the model's {checker.model.regs}"
+
     # Print final PC value
     final_pc = resolve_x(dut.pc_inst.pc_o.value)
     print(f"Final PC value: {final_pc}")
 
+    log_report(dut, "test_extended_program")
+    save_coverage(coverage, "test_extended_program")
+
 @cocotb.test()
+@record_waves
 async def test_instruction_fetch(dut):
     """Test instruction fetch from memory"""
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
     await reset(dut)
     
-    # Create a map of PC values to expected instructions
-    instr_map = {
-    0: 0x00500093,  # addi x1, x0, 5
-    4: 0x00A00113,  # addi x2, x0, 10
-    8: 0x002081B3,  # add  x3, x1, x2
-    12: 0x40308233, # sub  x4, x1, x3
-    16: 0x00600293, # addi x5, x0, 6
-    20: 0x0051A223, # sw   x5, 4(x3)
-    24: 0x0041A283, # lw   x5, 4(x3)
-    28: 0x0051A023, # sw   x5, 0(x3) 
-    32: 0x00419463, # bne  x3, x4, 8
-    36: 0x00100513, # addi x10, x0, 1 
-    40: 0x00000073, # ecall 
-    44: 0x00200593, # addi x11, x0, 2
-}
+    # Expected instructions come from the assembly source of the INIT_FILE image
+    program = load_image(MEMORY_DIR / "test_program.s")
+    assert program.text == load_hex(MEMORY_DIR / "test_program.hex"), \
+        "test_program.hex is out of date with test_program.s"
+    instr_map = {4 * i: instruction for i, instruction in enumerate(program.text)}
     
     # Store the previous PC to check against the current instruction
     current_pc = 0
@@ -93,20 +100,22 @@ async def test_instruction_fetch(dut):
             assert actual_instr == expected_instr, f"Instruction mismatch for PC {current_pc}. Expected {expected_instr:08x}, got {actual_instr:08x} on instruction: {i}"
         
         # If we hit ecall, we're done
-        if resolve_x(dut.instruction) == 0x00000073:
+        if current_pc == program.symbols["halt"]:
             print("hit ecall")
             break
             
         # Update next PC for next cycle
         if not dut.stall.value:
             current_pc = resolve_x(dut.next_instruction_address.value)
-        
+
+    log_report(dut, "test_instruction_fetch")
 
 @cocotb.test()
+@record_waves
 async def test_memory_operations(dut):
     """Test load and store operations"""
 
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
     await reset(dut)
@@ -134,11 +143,14 @@ async def test_memory_operations(dut):
     stored_value = resolve_x(dut.data_mem.data_ram.mem[19 >> 2])  # 19 is x3's value -> 4
     assert stored_value == 6, f"Memory at address 19 should be 6, got {stored_value}"
 
+    log_report(dut, "test_memory_operations")
+
 @cocotb.test()
+@record_waves
 async def test_branching(dut):
     """Test branching behavior"""
 
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
     await reset(dut)
@@ -170,3 +182,549 @@ async def test_branching(dut):
     # Check if x11 remains 0 (branch not taken)
     x11_value = resolve_x(dut.reg_file.registers[11].value)
     assert x11_value == 0, f"x11 should be 0 (branch not taken), got {x11_value}"
+
+    log_report(dut, "test_branching")
+
+# Tests below load their own programs, tests above rely on INIT_FILE
+
+@cocotb.test()
+@record_waves
+async def test_backdoor_program(dut):
+    """Load a different program into the same build and run it in lockstep"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+    coverage = start_coverage(dut)
+
+    await load_program(dut, MEMORY_DIR / "sum_program.s")
+    await reset(dut)
+
+    checker = LockstepChecker(dut)
+    await checker.run(max_cycles=1000)
+
+    registers = read_registers(dut)
+    x2_value, x3_value = registers[2], registers[3]
+    assert x2_value == 55, f"x2 should be 55 (sum of 1..10), got {x2_value}"
+    assert x3_value == 55, f"x3 should be 55 (loaded back from memory), got {x3_value}"
+
+    log_report(dut, "test_backdoor_program")
+    save_coverage(coverage, "test_backdoor_program")
+
+@cocotb.test()
+@record_waves
+async def test_tab_separated_program(dut):
+    """Tab separated assembly, the way compilers and objdump write it, assembles like spaced source"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    source = (MEMORY_DIR / "sum_program.s").read_text()
+    program = assemble(re.sub(r" +", "\t", source), name="tabbed sum_program.s")
+    assert program == load_image(MEMORY_DIR / "sum_program.s")
+    await load_program(dut, program)
+    await reset(dut)
+
+    checker = LockstepChecker(dut)
+    await checker.run(max_cycles=1000)
+    assert read_registers(dut)[2] == 55, "x2 should be 55 (sum of 1..10)"
+
+ISA_PROGRAM = """
+        .data
+value:  .word 0x8081F2F3
+        .text
+        jal  ra, link           # links pc+4
+link:   auipc t0, 0             # its own address
+        la   t1, target
+        jalr s0, 4(t1)          # rs1 + offset, skipping the first instruction at target
+target: li   s1, 1
+        li   a0, -1
+        li   a1, 1
+        li   t4, 0x80000000
+        li   s2, 0              # one bit per branch not taken
+        blt  t4, a1, b0         # taken, the difference overflows
+        ori  s2, s2, 1
+b0:     bge  a1, t4, b1         # taken
+        ori  s2, s2, 2
+b1:     bltu a0, a1, b2         # not taken, 0xffffffff is the larger
+        ori  s2, s2, 4
+b2:     bgeu t4, a1, b3         # taken
+        ori  s2, s2, 8
+b3:     blt  a1, a0, b4         # not taken
+        ori  s2, s2, 16
+b4:     la   t2, value
+        lb   a2, 0(t2)
+        lbu  a3, 1(t2)
+        lh   a4, 2(t2)
+        lhu  a5, 2(t2)
+        sw   zero, 4(t2)
+        li   t3, 0x55
+        sb   t3, 5(t2)          # lands in its own byte lane
+        li   t3, 0x1234
+        sh   t3, 6(t2)
+        lw   a6, 4(t2)
+halt:   ecall
+"""
+
+@cocotb.test()
+@record_waves
+async def test_isa_corner_cases(dut):
+    """Jumps link pc+4, AUIPC and JALR offsets, signed/unsigned branches, sub-word loads and stores"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    await load_program(dut, assemble(ISA_PROGRAM))
+    await reset(dut)
+
+    checker = LockstepChecker(dut)
+    await checker.run(max_cycles=1000)
+
+    expected = {
+        "ra": 4,                # jal at 0
+        "t0": 4,                # auipc at 4
+        "s0": 20,               # jalr at 16
+        "s1": 0,                # skipped by the jalr offset
+        "s2": 4 | 16,           # bltu and the last blt not taken
+        "a2": 0xFFFFFFF3,       # lb sign extends
+        "a3": 0xF2,             # lbu
+        "a4": 0xFFFF8081,       # lh sign extends
+        "a5": 0x8081,           # lhu
+        "a6": 0x12345500,       # sb and sh into a zeroed word
+    }
+    registers = dut.reg_file.registers
+    for name, value in expected.items():
+        actual = resolve_x(registers[REGISTERS[name]].value)
+        assert actual == value, f"{name} is {actual:08x}, expected {value:08x}"
+
+    log_report(dut, "test_isa_corner_cases")
+
+@cocotb.test()
+@record_waves
+async def test_lockstep(dut):
+    """Run whatever program is loaded (e.g. via +PROGRAM) to ecall in lockstep with the model.
+
+    TRACE=<file> also writes a commit trace of the run, PERF_JSON=<file> the
+    performance counters at the end of it. CHECKPOINT=<file> saves a
+    checkpoint CHECKPOINT_CYCLE clocks into the run, RESTORE=<file> starts
+    the run from one instead of from reset.
+    """
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+    coverage = start_coverage(dut)
+
+    model = None
+    if os.getenv("RESTORE"):
+        checkpoint = load_checkpoint(os.environ["RESTORE"])
+        await restore(dut, checkpoint)
+        model = model_from_checkpoint(checkpoint)
+    else:
+        await reset(dut)
+
+    saving = None
+    if os.getenv("CHECKPOINT"):
+        async def save_at(cycle, path):
+            save_checkpoint(await capture_at(dut, cycle), path)
+        saving = cocotb.start_soon(save_at(int(os.getenv("CHECKPOINT_CYCLE", "0")), os.environ["CHECKPOINT"]))
+    monitor = CommitTraceMonitor(dut, os.environ["TRACE"]) if os.getenv("TRACE") else None
+    if monitor:
+        cocotb.start_soon(monitor.run())
+    checker = LockstepChecker(dut, model)
+    await checker.run(max_cycles=100000)
+    if monitor:
+        monitor.close()
+    if saving is not None:
+        if not saving.done():
+            saving.kill()
+            raise AssertionError(f"The program halted after {checker.cycle} cycles, before "
+                                 f"CHECKPOINT_CYCLE={os.getenv('CHECKPOINT_CYCLE', '0')}, no checkpoint saved")
+        await saving    # Raises whatever saving it did
+
+    counters = log_report(dut, "test_lockstep")
+    if os.getenv("PERF_JSON"):
+        Path(os.environ["PERF_JSON"]).write_text(json.dumps(counters._asdict()))
+    save_coverage(coverage, "test_lockstep")
+
+@cocotb.test()
+@record_waves
+async def test_commit_trace(dut):
+    """The commit trace of a run matches what the model executes"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    program = load_image(MEMORY_DIR / "sum_program.s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("run.trace", "run.trace.gz"):
+            await load_program(dut, program)
+            await reset(dut)
+
+            path = Path(tmp) / name
+            monitor = CommitTraceMonitor(dut, path, chunk_records=4)
+            await monitor.run(max_cycles=1000)
+            monitor.close()
+
+            model = RV32IModel(program.text, program.data)
+            with TraceReader(path) as trace:
+                records = list(trace)
+                if not name.endswith(".gz"):
+                    assert len(trace) == len(records) and trace[-1] == records[-1]
+            for record in records:
+                expected = model.step()
+                assert (record.pc, record.instruction, record.rd, record.wdata, record.mem_addr) == \
+                    (expected.pc, expected.instruction, expected.rd, expected.wdata, expected.mem_addr), \
+                    f"Trace record {record} doesn't match the model's {expected}"
+            assert model.halted, f"Trace stops after {len(records)} instructions, before the ecall"
+            assert [r.cycle for r in records] == sorted(r.cycle for r in records)
+
+    log_report(dut, "test_commit_trace")
+
+PERF_PROGRAM = """
+        li   t0, 3
+loop:   sw   t0, 0(zero)        # full word store, no stall
+        lw   t1, 0(zero)        # load, stalls
+        sb   t0, 8(zero)        # byte store, no stall either
+        addi t0, t0, -1
+        bnez t0, loop           # taken twice
+        rdinstret a0
+        rdcycle a1
+        csrr a2, mhpmcounter3   # load stall cycles
+        csrr a3, mhpmcounter4   # store stall cycles
+        csrr a4, mhpmcounter5   # taken branches
+        rdcycleh a5
+        csrr a6, mhpmcounter6   # flushed cycles
+halt:   ecall
+"""
+
+@cocotb.test()
+@record_waves
+async def test_perf_counters(dut):
+    """Counters seen through CSR reads and the hierarchy add up"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+    coverage = start_coverage(dut)
+
+    await load_program(dut, assemble(PERF_PROGRAM))
+    await reset(dut)
+
+    # The model supplies instret itself, so lockstep checks rdinstret
+    checker = LockstepChecker(dut)
+    await checker.run(max_cycles=1000)
+    counters = log_report(dut, "test_perf_counters")
+
+    loads, iterations = 3, 3
+    fill = FILL_CYCLES[dut._name]
+    assert counters.instret == checker.model.retired - 1, "everything but the ecall retires"
+    assert counters.branches_taken == iterations - 1
+    assert counters.load_stalls % loads == 0, "every load should stall the same number of cycles"
+    assert counters.store_stalls == 0, "stores of any width complete in one cycle"
+    # Filling the pipeline after reset, then each cycle retires, stalls or flushes
+    stalls = counters.load_stalls + counters.store_stalls + counters.flush_cycles
+    assert counters.cycles == fill + counters.instret + stalls
+
+    # Cycles parked on the ecall aren't counted
+    for _ in range(5):
+        await RisingEdge(dut.clk_i)
+    assert read_counters(dut) == counters
+
+    registers = read_registers(dut)
+    rdinstret = registers[10]
+    assert registers[11] == fill + rdinstret + 1 + stalls
+    assert registers[12] == counters.load_stalls
+    assert registers[13] == counters.store_stalls
+    assert registers[14] == counters.branches_taken
+    assert registers[15] == 0
+    assert registers[16] == counters.flush_cycles
+    save_coverage(coverage, "test_perf_counters")
+
+LOAD_PROGRAM = """
+        .data
+table:  .word 0, 4, 8, 12, 16, 20, 24, 28, 32, 36, 40, 44, 48, 52, 56, 60
+        .text
+        la   t0, table
+        addi t4, t0, 64         # end of the table
+        li   t2, 0
+loop:   lw   t1, 0(t0)          # back-to-back loads
+        lw   t3, 4(t0)
+        add  t2, t2, t1
+        lw   t5, 0(t3)          # address from the load before last
+        add  t2, t2, t3
+        add  t2, t2, t5
+        addi t0, t0, 8
+        bne  t0, t4, loop
+        sw   t2, 64(zero)
+halt:   ecall
+"""
+
+@cocotb.test()
+@record_waves
+async def test_back_to_back_loads(dut):
+    """Loads, including dependent ones, issue one per cycle
+
+    No load result is used by the very next instruction, which would cost
+    the pipelined core an interlock bubble.
+    """
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+    coverage = start_coverage(dut)
+
+    await load_program(dut, assemble(LOAD_PROGRAM))
+    await reset(dut)
+
+    checker = LockstepChecker(dut)
+    await checker.run(max_cycles=1000)
+    counters = log_report(dut, "test_back_to_back_loads")
+
+    loads = 3 * 8
+    assert counters.load_stalls == 0, f"{counters.load_stalls} load stall cycles"
+    # Filling the pipeline and then one instruction per cycle, apart from
+    # the taken branches. With the old busy cycle on reads the single-cycle
+    # core took 1 + instret + loads.
+    assert counters.cycles == FILL_CYCLES[dut._name] + counters.instret + counters.flush_cycles, \
+        f"{counters.cycles} cycles for {counters.instret} instructions ({loads} loads)"
+    assert resolve_x(dut.data_mem.data_ram.mem[16].value) == 736
+    save_coverage(coverage, "test_back_to_back_loads")
+
+LOAD_USE_PROGRAM = """
+        .data
+list:   .word 4, 8, 12, 0       # linked list, each word points at the next
+        .text
+        la   t0, list
+        li   t1, 0
+loop:   addi t1, t1, 1
+        lw   t0, 0(t0)
+        bnez t0, loop           # next pointer used right away
+        lw   t2, 0(zero)
+        sw   t2, 16(zero)       # load data straight into a store
+        lw   t3, 16(zero)
+        add  t4, t3, t3
+halt:   ecall
+"""
+
+# Bubbles each load costs when the next instruction uses its result
+LOAD_USE_STALLS = {"riscv_core": 0, "riscv_core_pipelined": 1}
+
+@cocotb.test()
+@record_waves
+async def test_load_use(dut):
+    """A load result used by the next instruction, interlocked where needed"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+    coverage = start_coverage(dut)
+
+    await load_program(dut, assemble(LOAD_USE_PROGRAM))
+    await reset(dut)
+
+    checker = LockstepChecker(dut)
+    await checker.run(max_cycles=1000)
+    counters = log_report(dut, "test_load_use")
+
+    dependent_loads = 4 + 2
+    assert counters.load_stalls == LOAD_USE_STALLS[dut._name] * dependent_loads
+    assert counters.cycles == (FILL_CYCLES[dut._name] + counters.instret + counters.load_stalls
+                               + counters.flush_cycles)
+    registers = read_registers(dut)
+    assert registers[6] == 4, "four list nodes"
+    assert registers[29] == 8, "4 loaded, stored and loaded again, doubled"
+    save_coverage(coverage, "test_load_use")
+
+@cocotb.test()
+@record_waves
+async def test_run_until_halt(dut):
+    """halted_o rises once the program is done, with its results in place"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    program = load_image(MEMORY_DIR / "sum_program.s")
+    await load_program(dut, program)
+    await reset(dut)
+
+    cycles = await run_until_halt(dut, max_cycles=1000)
+    counters = log_report(dut, "test_run_until_halt")
+    model = RV32IModel(program.text, program.data)
+    model.run()
+    assert read_registers(dut) == model.regs, "registers don't match the model's"
+    assert counters.instret == model.retired - 1, "everything but the ecall retires"
+    # halted_o rises on the edge that stops mcycle
+    assert cycles == counters.cycles, f"halted after {cycles} cycles, mcycle is {counters.cycles}"
+
+    # It stays up while the core is parked
+    for _ in range(3):
+        await RisingEdge(dut.clk_i)
+        assert dut.halted_o.value == 1
+    assert await run_until_halt(dut, max_cycles=1) == 0
+
+    # A program that never halts runs out of cycles
+    await load_program(dut, assemble("spin: j spin"))
+    await reset(dut)
+    assert dut.halted_o.value == 0
+    try:
+        await run_until_halt(dut, max_cycles=100)
+    except AssertionError as e:
+        assert "did not halt within 100 cycles" in str(e)
+    else:
+        raise AssertionError("run_until_halt returned on a program that never halts")
+    assert dut.halted_o.value == 0
+
+# The pipelined core's decoder outputs aren't the retiring instruction's
+@cocotb.test(skip=TOPLEVEL != "riscv_core")
+@record_waves
+async def test_coverage(dut):
+    """Coverage bins of a known program, and a saved bitmap merging back"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    await load_program(dut, MEMORY_DIR / "sum_program.s")
+    await reset(dut)
+    monitor = CoverageMonitor(dut)
+    cocotb.start_soon(monitor.run())
+    await LockstepChecker(dut).run(max_cycles=1000)
+    coverage = monitor.coverage()
+
+    assert coverage.covered("instruction") == ["bne", "lw", "sw", "addi", "add", "ecall/ebreak"]
+    assert coverage.covered("branch") == ["bne not taken", "bne taken"]
+    assert coverage.covered("load") == ["lw@0"]
+    assert coverage.covered("store_mask") == ["sw"]
+    assert coverage.covered("rd") == ["x1", "x2", "x3"]
+    # add x2, x2, x1 right after addi x2 and bnez x1 right after addi x1, nothing reads rs2 that early
+    assert coverage.covered("forwarding") == ["rs1"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        coverage.save(Path(tmp) / "run.cov")
+        other = Coverage(coverage.points)
+        other.hit("instruction", coverage.points["instruction"].index("lui"))
+        other.save(Path(tmp) / "other.cov")
+        merged = Coverage.load(Path(tmp) / "run.cov").merge(Coverage.load(Path(tmp) / "other.cov"))
+    assert merged.covered("instruction") == ["lui"] + coverage.covered("instruction")
+    assert merged.holes("rd") == coverage.holes("rd")
+
+# The pipelined core has instructions in flight a checkpoint can't hold
+@cocotb.test(skip=TOPLEVEL != "riscv_core")
+@record_waves
+async def test_checkpoint(dut):
+    """A run restored from a mid-program checkpoint ends where the full run does"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    program = assemble(LOAD_PROGRAM)
+    await load_program(dut, program)
+    await reset(dut)
+    saving = cocotb.start_soon(capture_at(dut, 20))
+    await LockstepChecker(dut).run(max_cycles=1000)
+    checkpoint = await saving
+    final_registers = read_registers(dut)
+    final_data = read_memory(dut.data_mem.data_ram.mem)
+    final_instret = read_counters(dut).instret
+    assert 0 < checkpoint.counters.instret < final_instret
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "mid.ckpt.gz"
+        save_checkpoint(checkpoint, path)
+        assert load_checkpoint(path) == checkpoint
+
+    # The model fast-forwarded through as many instructions gets to the same state
+    model = RV32IModel(program.text, program.data)
+    for _ in range(checkpoint.counters.instret):
+        model.step()
+    fast_forwarded = from_model(model)
+    assert (fast_forwarded.pc, fast_forwarded.regs, fast_forwarded.dmem) == \
+        (checkpoint.pc, checkpoint.regs, checkpoint.dmem)
+
+    for start in (checkpoint, fast_forwarded):
+        await restore(dut, start)
+        await LockstepChecker(dut, model_from_checkpoint(start)).run(max_cycles=1000)
+        assert read_registers(dut) == final_registers
+        assert read_memory(dut.data_mem.data_ram.mem) == final_data
+        assert read_counters(dut).instret == final_instret
+
+# Only riscv_core has the cache, and only test_icache_runner builds it in
+@cocotb.test(skip=TOPLEVEL != "riscv_core" or not CORE_PARAMETERS.get("ICACHE_SETS"))
+@record_waves
+async def test_icache(dut):
+    """The instruction cache misses on each line once and hits on every loop iteration after"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    program = assemble(LOAD_PROGRAM)
+    await load_program(dut, program)
+    await reset(dut)
+    checker = LockstepChecker(dut)
+    await checker.run(max_cycles=10000)
+    counters = log_report(dut, "test_icache")
+    stats = read_icache(dut)
+    assert stats is not None, "no instruction cache counters"
+
+    # Fetching never stalls on anything but a refill here: one lookup after
+    # reset and one for every instruction retiring after that
+    fill = FILL_CYCLES[dut._name]
+    assert stats.hits + stats.misses == fill + counters.instret
+    assert counters.cycles == fill + counters.instret + counters.load_stalls + stats.refill_cycles
+    assert stats.refill_cycles % stats.misses == 0, "every refill should take the same number of cycles"
+    # The loop runs 8 times, after its first pass it has nothing left to miss on
+    loop_words = (program.symbols["halt"] - program.symbols["loop"]) // 4
+    assert stats.hits >= 7 * loop_words, f"{stats.hits} hits"
+    assert stats.misses <= len(program.text), f"{stats.misses} misses"
+
+    # Reset invalidates the cache, the same program misses the same way again
+    await reset(dut)
+    await LockstepChecker(dut).run(max_cycles=10000)
+    assert read_icache(dut) == stats
+
+BRANCH_LOOP_PROGRAM = """
+        li   t0, 32
+        li   t1, 0
+loop:   add  t1, t1, t0
+        addi t0, t0, -1
+        bnez t0, loop           # taken 31 times, then falls through
+        sw   t1, 0(zero)
+halt:   ecall
+"""
+
+# riscv_core resolves branches before the next fetch, nothing to predict
+@cocotb.test(skip=TOPLEVEL != "riscv_core_pipelined")
+@record_waves
+async def test_branch_predictor(dut):
+    """Mispredictions cost two flushed cycles each, a trained predictor misses a loop branch twice"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    program = assemble(BRANCH_LOOP_PROGRAM)
+    await load_program(dut, program)
+    await reset(dut)
+    await LockstepChecker(dut).run(max_cycles=10000)
+    counters = log_report(dut, "test_branch_predictor")
+    stats = read_predictor(dut)
+    assert stats is not None, "no branch predictor counters"
+
+    # Branches and jumps retired, and how many of them were taken
+    model = RV32IModel(program.text, program.data)
+    transfers = taken = 0
+    while model.imem[model.pc // 4] != 0x00000073:
+        pc = model.pc
+        is_transfer = (model.imem[pc // 4] & 0x7F) in (opcode_e.OP_BRANCH, opcode_e.OP_JAL, opcode_e.OP_JALR)
+        model.step()
+        transfers += is_transfer
+        taken += is_transfer and model.pc != pc + 4
+    assert (transfers, taken) == (32, 31)
+
+    assert stats.predictions == transfers
+    assert counters.flush_cycles == 2 * stats.mispredictions
+    predictor = predictor_e(CORE_PARAMETERS.get("BRANCH_PREDICTOR", predictor_e.BP_NONE))
+    if predictor == predictor_e.BP_NONE:
+        assert stats.mispredictions == taken, "without a predictor every taken branch redirects"
+    elif predictor == predictor_e.BP_GSHARE:
+        # Until the history saturates every iteration trains a counter of its own
+        assert stats.mispredictions <= 2 + CORE_PARAMETERS.get("HISTORY_BITS", 6), f"{stats.mispredictions}"
+    else:
+        # Missing the BTB the first time round and the final fall-through
+        assert stats.mispredictions == 2, f"{predictor.name}: {stats.mispredictions} mispredictions"
+    assert resolve_x(dut.data_mem.data_ram.mem[0].value) == sum(range(33))
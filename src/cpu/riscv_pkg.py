@@ -16,3 +16,60 @@ class imm_type_e(IntEnum):
     IMM_U = 3
     IMM_J = 4
     IMM_NONE = 7
+
+class opcode_e(IntEnum):
+    OP_LOAD      = 0b0000011
+    OP_LOAD_FP   = 0b0000111
+    OP_CUSTOM_0  = 0b0001011
+    OP_MISC_MEM  = 0b0001111
+    OP_OP_IMM    = 0b0010011
+    OP_AUIPC     = 0b0010111
+    OP_OP_IMM_32 = 0b0011011
+    OP_STORE     = 0b0100011
+    OP_STORE_FP  = 0b0100111
+    OP_CUSTOM_1  = 0b0101011
+    OP_AMO       = 0b0101111
+    OP_OP        = 0b0110011
+    OP_LUI       = 0b0110111
+    OP_OP_32     = 0b0111011
+    OP_MADD      = 0b1000011
+    OP_MSUB      = 0b1000111
+    OP_NMSUB     = 0b1001011
+    OP_NMADD     = 0b1001111
+    OP_OP_FP     = 0b1010011
+    OP_BRANCH    = 0b1100011
+    OP_JALR      = 0b1100111
+    OP_JAL       = 0b1101111
+    OP_SYSTEM    = 0b1110011
+
+class predictor_e(IntEnum):
+    BP_NONE    = 0
+    BP_STATIC  = 1
+    BP_BIMODAL = 2
+    BP_GSHARE  = 3
+
+class csr_e(IntEnum):
+    CSR_MCYCLE        = 0xB00
+    CSR_MINSTRET      = 0xB02
+    CSR_MHPMCOUNTER3  = 0xB03
+    CSR_MHPMCOUNTER4  = 0xB04
+    CSR_MHPMCOUNTER5  = 0xB05
+    CSR_MHPMCOUNTER6  = 0xB06
+    CSR_MCYCLEH       = 0xB80
+    CSR_MINSTRETH     = 0xB82
+    CSR_MHPMCOUNTER3H = 0xB83
+    CSR_MHPMCOUNTER4H = 0xB84
+    CSR_MHPMCOUNTER5H = 0xB85
+    CSR_MHPMCOUNTER6H = 0xB86
+    CSR_CYCLE         = 0xC00
+    CSR_INSTRET       = 0xC02
+    CSR_HPMCOUNTER3   = 0xC03
+    CSR_HPMCOUNTER4   = 0xC04
+    CSR_HPMCOUNTER5   = 0xC05
+    CSR_HPMCOUNTER6   = 0xC06
+    CSR_CYCLEH        = 0xC80
+    CSR_INSTRETH      = 0xC82
+    CSR_HPMCOUNTER3H  = 0xC83
+    CSR_HPMCOUNTER4H  = 0xC84
+    CSR_HPMCOUNTER5H  = 0xC85
+    CSR_HPMCOUNTER6H  = 0xC86
@@ -47,5 +47,38 @@ package riscv_pkg;
         OP_JAL       = 7'b1101111,
         OP_SYSTEM    = 7'b1110011  // ecall, ebreak, etc.
     } opcode_e;
+
+    // riscv_core_pipelined's BRANCH_PREDICTOR, see branch_predictor
+    localparam int BP_NONE    = 0;
+    localparam int BP_STATIC  = 1;
+    localparam int BP_BIMODAL = 2;
+    localparam int BP_GSHARE  = 3;
+
+    // Counter CSR addresses (Zicsr). mhpmcounter3-6 are the load stall,
+    // store stall, taken branch and pipeline flush counters.
+    localparam logic [11:0] CSR_MCYCLE        = 12'hB00;
+    localparam logic [11:0] CSR_MINSTRET      = 12'hB02;
+    localparam logic [11:0] CSR_MHPMCOUNTER3  = 12'hB03;
+    localparam logic [11:0] CSR_MHPMCOUNTER4  = 12'hB04;
+    localparam logic [11:0] CSR_MHPMCOUNTER5  = 12'hB05;
+    localparam logic [11:0] CSR_MHPMCOUNTER6  = 12'hB06;
+    localparam logic [11:0] CSR_MCYCLEH       = 12'hB80;
+    localparam logic [11:0] CSR_MINSTRETH     = 12'hB82;
+    localparam logic [11:0] CSR_MHPMCOUNTER3H = 12'hB83;
+    localparam logic [11:0] CSR_MHPMCOUNTER4H = 12'hB84;
+    localparam logic [11:0] CSR_MHPMCOUNTER5H = 12'hB85;
+    localparam logic [11:0] CSR_MHPMCOUNTER6H = 12'hB86;
+    localparam logic [11:0] CSR_CYCLE         = 12'hC00;
+    localparam logic [11:0] CSR_INSTRET       = 12'hC02;
+    localparam logic [11:0] CSR_HPMCOUNTER3   = 12'hC03;
+    localparam logic [11:0] CSR_HPMCOUNTER4   = 12'hC04;
+    localparam logic [11:0] CSR_HPMCOUNTER5   = 12'hC05;
+    localparam logic [11:0] CSR_HPMCOUNTER6   = 12'hC06;
+    localparam logic [11:0] CSR_CYCLEH        = 12'hC80;
+    localparam logic [11:0] CSR_INSTRETH      = 12'hC82;
+    localparam logic [11:0] CSR_HPMCOUNTER3H  = 12'hC83;
+    localparam logic [11:0] CSR_HPMCOUNTER4H  = 12'hC84;
+    localparam logic [11:0] CSR_HPMCOUNTER5H  = 12'hC85;
+    localparam logic [11:0] CSR_HPMCOUNTER6H  = 12'hC86;
 endpackage
 `endif
@@ -3,3 +3,7 @@ pytest test_instruction_decoder_runner.py
 pytest test_program_counter_runner.py
 pytest test_register_file_runner.py
 pytest test_riscv_core_runner.py
+pytest test_riscv_core_pipelined_runner.py
+pytest test_random_runner.py
+pytest test_icache_runner.py
+pytest test_batch_runner.py
@@ -0,0 +1,551 @@
+"""RV32I assembler and ELF loader.
+
+Turns assembly source or a linked RV32I ELF into word images for
+riscv_core's instruction and data memories, plus a symbol table so
+testbenches can use labels instead of magic PCs:
+
+    program = load_image("test_program.s")
+    program.text, program.data, program.symbols["halt"]
+
+riscv_core has separate instruction and data memories, so .text and .data
+both start at address 0. load_image() caches its output by content hash,
+repeat runs of an unchanged program skip assembly entirely.
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+import struct
+from collections import namedtuple
+from pathlib import Path
+
+from riscv_pkg import csr_e, opcode_e
+from rv32i_model import BRANCH_NAMES, CSR_NAMES, LOAD_NAMES, STORE_NAMES, sext
+
+# text/data are word lists for instruction/data memory, symbols maps name -> address
+Program = namedtuple("Program", "text data symbols")
+
+CACHE_DIR = Path(__file__).resolve().parent / "asm_cache"
+
+
+class AssemblerError(Exception):
+    pass
+
+
+ABI_NAMES = ["zero", "ra", "sp", "gp", "tp", "t0", "t1", "t2", "s0", "s1",
+             "a0", "a1", "a2", "a3", "a4", "a5", "a6", "a7",
+             "s2", "s3", "s4", "s5", "s6", "s7", "s8", "s9", "s10", "s11",
+             "t3", "t4", "t5", "t6"]
+REGISTERS = {f"x{i}": i for i in range(32)}
+REGISTERS.update({name: i for i, name in enumerate(ABI_NAMES)})
+REGISTERS["fp"] = 8
+
+# mnemonic -> (funct3, funct7)
+OP = {"add": (0b000, 0), "sub": (0b000, 0x20), "sll": (0b001, 0), "slt": (0b010, 0),
+      "sltu": (0b011, 0), "xor": (0b100, 0), "srl": (0b101, 0), "sra": (0b101, 0x20),
+      "or": (0b110, 0), "and": (0b111, 0)}
+SHIFT_IMM = {"slli": (0b001, 0), "srli": (0b101, 0), "srai": (0b101, 0x20)}
+# mnemonic -> funct3
+OP_IMM = {"addi": 0b000, "slti": 0b010, "sltiu": 0b011, "xori": 0b100, "ori": 0b110, "andi": 0b111}
+BRANCHES = {name: funct3 for funct3, name in BRANCH_NAMES.items()}
+LOADS = {name: funct3 for funct3, name in LOAD_NAMES.items()}
+STORES = {name: funct3 for funct3, name in STORE_NAMES.items()}
+CSRS = {name: funct3 for funct3, name in CSR_NAMES.items()}
+CSR_NUMBERS = {csr.name[len("CSR_"):].lower(): int(csr) for csr in csr_e}
+FIXED = {"ecall": 0x00000073, "ebreak": 0x00100073, "fence": 0x0FF0000F}
+
+SECTIONS = {".text": "text", ".data": "data", ".rodata": "data", ".bss": "data", ".sdata": "data"}
+IGNORED_DIRECTIVES = {".globl", ".global", ".local", ".type", ".size", ".file", ".option", ".attribute"}
+DATA_SIZES = {".byte": 1, ".half": 2, ".short": 2, ".word": 4, ".long": 4}
+
+SYMBOL = r"[A-Za-z_.$][\w.$]*"
+LITERAL = re.compile(r"[+-]?(0x[0-9a-fA-F]+|0b[01]+|\d+)")
+
+
+def strip_comment(line):
+    """Drop # and // comments, leaving string literals alone"""
+    quote = None
+    for i, c in enumerate(line):
+        if quote:
+            if c == "\\":
+                continue
+            if c == quote and line[i - 1] != "\\":
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c == "#" or line.startswith("//", i):
+            return line[:i]
+    return line
+
+
+def split_operands(text):
+    """Split on commas outside parentheses and strings"""
+    operands, depth, quote, start = [], 0, None, 0
+    for i, c in enumerate(text):
+        if quote:
+            if c == quote and text[i - 1] != "\\":
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            operands.append(text[start:i].strip())
+            start = i + 1
+    if text.strip():
+        operands.append(text[start:].strip())
+    return operands
+
+
+def fits(value, bits):
+    return -(1 << (bits - 1)) <= value < (1 << (bits - 1))
+
+
+def r_type(opcode, funct3, funct7, rd, rs1, rs2):
+    return funct7 << 25 | rs2 << 20 | rs1 << 15 | funct3 << 12 | rd << 7 | opcode
+
+
+def i_type(opcode, funct3, rd, rs1, imm):
+    if not fits(imm, 12):
+        raise AssemblerError(f"immediate {imm} does not fit in 12 bits")
+    return (imm & 0xFFF) << 20 | rs1 << 15 | funct3 << 12 | rd << 7 | opcode
+
+
+def s_type(funct3, rs1, rs2, imm):
+    if not fits(imm, 12):
+        raise AssemblerError(f"offset {imm} does not fit in 12 bits")
+    imm &= 0xFFF
+    return (imm >> 5) << 25 | rs2 << 20 | rs1 << 15 | funct3 << 12 | (imm & 0x1F) << 7 | opcode_e.OP_STORE
+
+
+def b_type(funct3, rs1, rs2, offset):
+    if offset & 1 or not fits(offset, 13):
+        raise AssemblerError(f"branch offset {offset} is out of range or odd")
+    imm = offset & 0x1FFF
+    return ((imm >> 12) << 31 | ((imm >> 5) & 0x3F) << 25 | rs2 << 20 | rs1 << 15 | funct3 << 12
+            | ((imm >> 1) & 0xF) << 8 | ((imm >> 11) & 1) << 7 | opcode_e.OP_BRANCH)
+
+
+def u_type(opcode, rd, imm):
+    if not -(1 << 19) <= imm < (1 << 20):
+        raise AssemblerError(f"upper immediate {imm} does not fit in 20 bits")
+    return (imm & 0xFFFFF) << 12 | rd << 7 | opcode
+
+
+def j_type(rd, offset):
+    if offset & 1 or not fits(offset, 21):
+        raise AssemblerError(f"jump offset {offset} is out of range or odd")
+    imm = offset & 0x1FFFFF
+    return ((imm >> 20) << 31 | ((imm >> 1) & 0x3FF) << 21 | ((imm >> 11) & 1) << 20
+            | ((imm >> 12) & 0xFF) << 12 | rd << 7 | opcode_e.OP_JAL)
+
+
+def hi(value):
+    return ((value + 0x800) >> 12) & 0xFFFFF
+
+
+def lo(value):
+    return sext(value & 0xFFF, 12)
+
+
+def expand(mnemonic, ops, constant):
+    """Rewrite a pseudo-instruction as base instructions, [(mnemonic, operands)].
+
+    constant(expr) returns the value of expr if it is already known, li
+    uses it to pick between one and two instructions.
+    """
+    branch_zero = {"beqz": ("beq", 0), "bnez": ("bne", 0), "bltz": ("blt", 0),
+                   "bgez": ("bge", 0), "blez": ("bge", 1), "bgtz": ("blt", 1)}
+    swapped = {"bgt": "blt", "ble": "bge", "bgtu": "bltu", "bleu": "bgeu"}
+
+    if mnemonic == "nop":
+        return [("addi", ["zero", "zero", "0"])]
+    if mnemonic == "li":
+        value = constant(ops[1]) if len(ops) == 2 else None
+        if value is not None and fits(value, 12):
+            return [("addi", [ops[0], "zero", ops[1]])]
+        return [("lui", [ops[0], f"%hi({ops[1]})"]), ("addi", [ops[0], ops[0], f"%lo({ops[1]})"])]
+    if mnemonic == "la":
+        return [("lui", [ops[0], f"%hi({ops[1]})"]), ("addi", [ops[0], ops[0], f"%lo({ops[1]})"])]
+    if mnemonic == "mv":
+        return [("addi", ops + ["0"])]
+    if mnemonic == "not":
+        return [("xori", ops + ["-1"])]
+    if mnemonic == "neg":
+        return [("sub", ops[:1] + ["zero"] + ops[1:])]
+    if mnemonic == "seqz":
+        return [("sltiu", ops + ["1"])]
+    if mnemonic == "snez":
+        return [("sltu", ops[:1] + ["zero"] + ops[1:])]
+    if mnemonic == "j":
+        return [("jal", ["zero"] + ops)]
+    if mnemonic == "jal" and len(ops) == 1:
+        return [("jal", ["ra"] + ops)]
+    if mnemonic == "call":
+        return [("jal", ["ra"] + ops)]
+    if mnemonic == "tail":
+        return [("jal", ["zero"] + ops)]
+    if mnemonic == "jr":
+        return [("jalr", ["zero", f"0({ops[0]})" if ops else ""])]
+    if mnemonic == "jalr" and len(ops) == 1:
+        return [("jalr", ["ra", f"0({ops[0]})"])]
+    if mnemonic == "ret":
+        return [("jalr", ["zero", "0(ra)"])]
+    if mnemonic == "csrr":
+        return [("csrrs", ops + ["zero"])]
+    if mnemonic in ("csrw", "csrs", "csrc"):
+        return [("csrr" + mnemonic[3], ["zero"] + ops)]
+    if mnemonic in ("rdcycle", "rdcycleh", "rdinstret", "rdinstreth"):
+        return [("csrrs", ops + [mnemonic[2:], "zero"])]
+    if mnemonic in branch_zero and len(ops) == 2:
+        base, zero_first = branch_zero[mnemonic]
+        return [(base, ["zero", ops[0], ops[1]] if zero_first else [ops[0], "zero", ops[1]])]
+    if mnemonic in swapped and len(ops) == 3:
+        return [(swapped[mnemonic], [ops[1], ops[0], ops[2]])]
+    return [(mnemonic, ops)]
+
+
+class Assembler:
+    """Two pass assembler: the first pass lays out statements and labels,
+    the second encodes them once every symbol is known."""
+
+    def __init__(self, name="<source>"):
+        self.name = name
+        self.symbols = {}
+        self.statements = []  # (section, address, kind, payload, lineno)
+        self.location = {"text": 0, "data": 0}
+        self.section = "text"
+
+    def error(self, lineno, message):
+        return AssemblerError(f"{self.name}:{lineno}: {message}")
+
+    def evaluate(self, text, pc=None):
+        """Integer value of an expression: literals, symbols, + and -, %hi()/%lo()"""
+        text = text.strip()
+        match = re.fullmatch(r"%(hi|lo)\((.*)\)", text)
+        if match:
+            value = self.evaluate(match.group(2), pc)
+            return hi(value) if match.group(1) == "hi" else lo(value)
+        if not text:
+            raise AssemblerError("missing operand")
+
+        value, sign = 0, 1
+        for token in re.split(r"\s*([+-])\s*", text):
+            if token in ("+", "-"):
+                sign = sign if token == "+" else -sign
+                continue
+            if not token:
+                continue
+            if token == ".":
+                term = pc
+            elif token[0] == "'" and token[-1] == "'":
+                term = ord(ast.literal_eval(token))
+            elif LITERAL.fullmatch(token):
+                term = int(token, 0)
+            elif token in self.symbols:
+                term = self.symbols[token]
+            else:
+                raise AssemblerError(f"undefined symbol {token!r}")
+            if term is None:
+                raise AssemblerError(f"can't use {token!r} here")
+            value += sign * term
+            sign = 1
+        return value
+
+    def constant(self, text):
+        try:
+            return self.evaluate(text)
+        except AssemblerError:
+            return None
+
+    def register(self, text):
+        if text not in REGISTERS:
+            raise AssemblerError(f"unknown register {text!r}")
+        return REGISTERS[text]
+
+    def memory_operand(self, text, pc):
+        """offset(reg) -> (reg, offset)"""
+        match = re.fullmatch(r"(.*)\(\s*(\w+)\s*\)", text)
+        if not match:
+            raise AssemblerError(f"expected offset(register), got {text!r}")
+        offset = match.group(1).strip()
+        return self.register(match.group(2)), self.evaluate(offset, pc) if offset else 0
+
+    def target(self, text, pc):
+        # Bare numbers are pc relative offsets (the disassembler prints them
+        # that way), anything else is an address
+        text = text.strip()
+        if LITERAL.fullmatch(text):
+            return int(text, 0)
+        return self.evaluate(text, pc) - pc
+
+    def emit(self, kind, payload, size, lineno):
+        self.statements.append((self.section, self.location[self.section], kind, payload, lineno))
+        self.location[self.section] += size
+
+    def first_pass(self, source):
+        for lineno, line in enumerate(source.splitlines(), 1):
+            line = strip_comment(line).strip()
+            try:
+                while True:
+                    match = re.match(rf"({SYMBOL})\s*:", line)
+                    if not match:
+                        break
+                    self.define(match.group(1), self.location[self.section])
+                    line = line[match.end():].strip()
+                if not line:
+                    continue
+                # Compilers and objdump separate with tabs
+                mnemonic, rest = (line.split(None, 1) + [""])[:2]
+                mnemonic = mnemonic.lower()
+                ops = split_operands(rest)
+                if mnemonic.startswith("."):
+                    self.directive(mnemonic, ops, lineno)
+                else:
+                    for instruction in expand(mnemonic, ops, self.constant):
+                        self.emit("instruction", instruction, 4, lineno)
+            except (AssemblerError, ValueError, SyntaxError) as e:
+                raise self.error(lineno, e) from None
+
+    def define(self, name, value):
+        if name in self.symbols:
+            raise AssemblerError(f"symbol {name!r} is already defined")
+        self.symbols[name] = value
+
+    def directive(self, name, ops, lineno):
+        if name in SECTIONS:
+            self.section = SECTIONS[name]
+        elif name == ".section":
+            if not ops or ops[0] not in SECTIONS:
+                raise AssemblerError(f"unsupported section {' '.join(ops)!r}")
+            self.section = SECTIONS[ops[0]]
+        elif name in IGNORED_DIRECTIVES:
+            pass
+        elif name in (".equ", ".set"):
+            self.define(ops[0], self.evaluate(ops[1]))
+        elif name in DATA_SIZES:
+            size = DATA_SIZES[name]
+            self.emit("values", (size, ops), size * len(ops), lineno)
+        elif name in (".space", ".zero", ".skip"):
+            count = self.evaluate(ops[0])
+            fill = self.evaluate(ops[1]) if len(ops) > 1 else 0
+            self.emit("bytes", bytes([fill & 0xFF]) * count, count, lineno)
+        elif name in (".align", ".p2align", ".balign"):
+            # .align is a power of two on RISC-V, like .p2align
+            alignment = self.evaluate(ops[0])
+            if name != ".balign":
+                alignment = 1 << alignment
+            padding = -self.location[self.section] % alignment
+            self.emit("bytes", bytes(padding), padding, lineno)
+        elif name in (".ascii", ".asciz", ".string"):
+            data = b""
+            for op in ops:
+                data += ast.literal_eval(op).encode("latin-1")
+                if name != ".ascii":
+                    data += b"\0"
+            self.emit("bytes", data, len(data), lineno)
+        else:
+            raise AssemblerError(f"unknown directive {name}")
+
+    def encode(self, mnemonic, ops, pc):
+        def count(n):
+            if len(ops) != n:
+                raise AssemblerError(f"{mnemonic} takes {n} operands, got {len(ops)}")
+
+        if mnemonic in OP:
+            count(3)
+            funct3, funct7 = OP[mnemonic]
+            return r_type(opcode_e.OP_OP, funct3, funct7, *(self.register(op) for op in ops))
+        if mnemonic in OP_IMM:
+            count(3)
+            return i_type(opcode_e.OP_OP_IMM, OP_IMM[mnemonic], self.register(ops[0]),
+                          self.register(ops[1]), self.evaluate(ops[2], pc))
+        if mnemonic in SHIFT_IMM:
+            count(3)
+            funct3, funct7 = SHIFT_IMM[mnemonic]
+            shamt = self.evaluate(ops[2], pc)
+            if not 0 <= shamt < 32:
+                raise AssemblerError(f"shift amount {shamt} out of range")
+            return r_type(opcode_e.OP_OP_IMM, funct3, funct7, self.register(ops[0]),
+                          self.register(ops[1]), shamt)
+        if mnemonic in LOADS:
+            count(2)
+            rs1, offset = self.memory_operand(ops[1], pc)
+            return i_type(opcode_e.OP_LOAD, LOADS[mnemonic], self.register(ops[0]), rs1, offset)
+        if mnemonic in STORES:
+            count(2)
+            rs1, offset = self.memory_operand(ops[1], pc)
+            return s_type(STORES[mnemonic], rs1, self.register(ops[0]), offset)
+        if mnemonic in BRANCHES:
+            count(3)
+            return b_type(BRANCHES[mnemonic], self.register(ops[0]), self.register(ops[1]),
+                          self.target(ops[2], pc))
+        if mnemonic in ("lui", "auipc"):
+            count(2)
+            opcode = opcode_e.OP_LUI if mnemonic == "lui" else opcode_e.OP_AUIPC
+            return u_type(opcode, self.register(ops[0]), self.evaluate(ops[1], pc))
+        if mnemonic == "jal":
+            count(2)
+            return j_type(self.register(ops[0]), self.target(ops[1], pc))
+        if mnemonic == "jalr":
+            if len(ops) == 3:  # jalr rd, rs1, imm
+                rs1, offset = self.register(ops[1]), self.evaluate(ops[2], pc)
+            else:
+                count(2)
+                rs1, offset = self.memory_operand(ops[1], pc)
+            return i_type(opcode_e.OP_JALR, 0b000, self.register(ops[0]), rs1, offset)
+        if mnemonic in CSRS:
+            count(3)
+            csr = CSR_NUMBERS.get(ops[1].lower())
+            csr = self.evaluate(ops[1], pc) if csr is None else csr
+            if not 0 <= csr < 4096:
+                raise AssemblerError(f"CSR number {csr} out of range")
+            funct3 = CSRS[mnemonic]
+            # The immediate forms put a 5 bit zero-extended value where rs1 goes
+            source = self.evaluate(ops[2], pc) if funct3 & 0b100 else self.register(ops[2])
+            if not 0 <= source < 32:
+                raise AssemblerError(f"CSR immediate {source} out of range")
+            return csr << 20 | source << 15 | funct3 << 12 | self.register(ops[0]) << 7 | opcode_e.OP_SYSTEM
+        if mnemonic in FIXED:
+            return FIXED[mnemonic]
+        raise AssemblerError(f"unknown instruction {mnemonic!r}")
+
+    def second_pass(self):
+        images = {"text": bytearray(self.location["text"]), "data": bytearray(self.location["data"])}
+        for section, address, kind, payload, lineno in self.statements:
+            try:
+                if kind == "instruction":
+                    data = self.encode(*payload, address).to_bytes(4, "little")
+                elif kind == "values":
+                    size, values = payload
+                    data = b"".join((self.evaluate(value, address) & ((1 << 8 * size) - 1))
+                                    .to_bytes(size, "little") for value in values)
+                else:
+                    data = payload
+            except (AssemblerError, ValueError, SyntaxError) as e:
+                raise self.error(lineno, e) from None
+            images[section][address:address + len(data)] = data
+        return images
+
+    def assemble(self, source):
+        self.first_pass(source)
+        images = self.second_pass()
+        return Program(to_words(images["text"]), to_words(images["data"]), dict(self.symbols))
+
+
+def assemble(source, name="<source>"):
+    """Assemble RV32I source text into a Program"""
+    return Assembler(name).assemble(source)
+
+
+def to_words(image):
+    image = bytes(image) + bytes(-len(image) % 4)
+    return [int.from_bytes(image[i:i + 4], "little") for i in range(0, len(image), 4)]
+
+
+def place(image, address, data, mem_bytes):
+    offset = address % mem_bytes
+    if offset + len(data) > mem_bytes:
+        raise ValueError(f"segment at {address:#x} ({len(data)} bytes) does not fit in {mem_bytes} bytes of memory")
+    if len(image) < offset + len(data):
+        image.extend(bytes(offset + len(data) - len(image)))
+    image[offset:offset + len(data)] = data
+
+
+ELF_HEADER = struct.Struct("<16sHHIIIIIHHHHHH")
+PROGRAM_HEADER = struct.Struct("<IIIIIIII")
+SECTION_HEADER = struct.Struct("<IIIIIIIIII")
+ELF_SYMBOL = struct.Struct("<IIIBBH")
+EM_RISCV = 243
+PT_LOAD = 1
+PF_X = 1
+SHT_SYMTAB = 2
+STT_SECTION, STT_FILE = 3, 4
+
+
+def load_elf(contents, mem_depth=1024):
+    """Program from the bytes of a 32-bit little-endian RISC-V ELF.
+
+    Executable segments go to instruction memory, the rest to data memory.
+    Addresses wrap at the memory size like they do in the hardware, and
+    the entry point must be at address 0 since that's where riscv_core
+    comes out of reset.
+    """
+    mem_bytes = mem_depth * 4
+    (ident, _, machine, _, entry, phoff, shoff, _, _, phentsize, phnum,
+     shentsize, shnum, _) = ELF_HEADER.unpack_from(contents)
+    if ident[:4] != b"\x7fELF" or ident[4] != 1 or ident[5] != 1 or machine != EM_RISCV:
+        raise ValueError("not a 32-bit little-endian RISC-V ELF")
+    if entry % mem_bytes:
+        raise ValueError(f"entry point {entry:#x} is not at address 0, riscv_core starts executing there")
+
+    text, data = bytearray(), bytearray()
+    for i in range(phnum):
+        p_type, offset, vaddr, _, filesz, memsz, flags, _ = \
+            PROGRAM_HEADER.unpack_from(contents, phoff + i * phentsize)
+        if p_type != PT_LOAD or memsz == 0:
+            continue
+        segment = contents[offset:offset + filesz] + bytes(memsz - filesz)
+        place(text if flags & PF_X else data, vaddr, segment, mem_bytes)
+
+    sections = [SECTION_HEADER.unpack_from(contents, shoff + i * shentsize) for i in range(shnum)]
+    symbols = {}
+    for _, sh_type, _, _, offset, size, link, _, _, entsize in sections:
+        if sh_type != SHT_SYMTAB:
+            continue
+        strtab = sections[link][4]
+        for pos in range(offset, offset + size, entsize):
+            name, value, _, info, _, shndx = ELF_SYMBOL.unpack_from(contents, pos)
+            if not name or shndx == 0 or info & 0xF in (STT_SECTION, STT_FILE):
+                continue
+            end = contents.index(b"\0", strtab + name)
+            symbols[contents[strtab + name:end].decode()] = value % mem_bytes
+    return Program(to_words(text), to_words(data), symbols)
+
+
+def load_image(path, mem_depth=1024, cache_dir=CACHE_DIR):
+    """Program from an assembly (.s/.S/.asm) or ELF file, cached by content hash.
+
+    SIM_ASM_CACHE=0 bypasses the cache.
+    """
+    path = Path(path)
+    contents = path.read_bytes()
+    is_elf = contents[:4] == b"\x7fELF"
+    if not is_elf and path.suffix not in (".s", ".S", ".asm"):
+        raise ValueError(f"{path}: expected an assembly source or ELF file")
+
+    h = hashlib.sha256()
+    # Key on the assembler and the tables its encodings come from too, so
+    # fixing any of them invalidates old images
+    for module in ("rv32i_asm.py", "rv32i_model.py", "riscv_pkg.py"):
+        h.update((Path(__file__).resolve().parent / module).read_bytes())
+    h.update(f"{is_elf}:{mem_depth}".encode())
+    h.update(contents)
+    cache_file = Path(cache_dir) / f"{h.hexdigest()}.json"
+    use_cache = os.getenv("SIM_ASM_CACHE", "1") != "0"
+    if use_cache and cache_file.exists():
+        return Program(**json.loads(cache_file.read_text()))
+
+    if is_elf:
+        program = load_elf(contents, mem_depth)
+    else:
+        program = assemble(contents.decode(), name=str(path))
+
+    if use_cache:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Regression jobs run in parallel, write then rename so nobody reads half a file
+        tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(program._asdict()))
+        os.replace(tmp, cache_file)
+    return program
+
+
+def write_hex(words, path):
+    """Write a word list as a $readmemh file, returns the path"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(f"{word:08x}\n" for word in words))
+    return path
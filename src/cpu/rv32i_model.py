@@ -0,0 +1,277 @@
+from collections import namedtuple
+
+from riscv_pkg import csr_e, opcode_e
+
+MASK32 = 0xFFFFFFFF
+
+# One executed instruction. rd is None when no register is written,
+# mem_addr/mem_data are only set for loads and stores.
+Retired = namedtuple("Retired", "pc instruction rd wdata mem_addr mem_data next_pc halt")
+
+
+class IllegalInstruction(Exception):
+    pass
+
+
+def is_halt(ins):
+    """ecall/ebreak, the rest of the SYSTEM opcode is Zicsr"""
+    return ins & 0x7F == opcode_e.OP_SYSTEM and (ins >> 12) & 0x7 == 0
+
+
+def sext(value, bits):
+    sign = 1 << (bits - 1)
+    return (value & (sign - 1)) - (value & sign)
+
+
+def to_signed(value):
+    return sext(value, 32)
+
+
+def imm_i(ins):
+    return sext(ins >> 20, 12)
+
+
+def imm_s(ins):
+    return sext(((ins >> 25) << 5) | ((ins >> 7) & 0x1F), 12)
+
+
+def imm_b(ins):
+    return sext(((ins >> 31) & 1) << 12 | ((ins >> 7) & 1) << 11
+                | ((ins >> 25) & 0x3F) << 5 | ((ins >> 8) & 0xF) << 1, 13)
+
+
+def imm_u(ins):
+    return ins & 0xFFFFF000
+
+
+def imm_j(ins):
+    return sext(((ins >> 31) & 1) << 20 | ((ins >> 12) & 0xFF) << 12
+                | ((ins >> 20) & 1) << 11 | ((ins >> 21) & 0x3FF) << 1, 21)
+
+
+def alu(funct3, alt, a, b):
+    """Integer op for OP/OP-IMM, alt selects SUB/SRA (funct7[5])"""
+    shamt = b & 0x1F
+    if funct3 == 0b000:
+        result = a - b if alt else a + b
+    elif funct3 == 0b001:
+        result = a << shamt
+    elif funct3 == 0b010:
+        result = int(to_signed(a) < to_signed(b))
+    elif funct3 == 0b011:
+        result = int((a & MASK32) < (b & MASK32))
+    elif funct3 == 0b100:
+        result = a ^ b
+    elif funct3 == 0b101:
+        result = to_signed(a) >> shamt if alt else (a & MASK32) >> shamt
+    elif funct3 == 0b110:
+        result = a | b
+    else:
+        result = a & b
+    return result & MASK32
+
+
+BRANCH_CONDITIONS = {
+    0b000: lambda a, b: a == b,                        # BEQ
+    0b001: lambda a, b: a != b,                        # BNE
+    0b100: lambda a, b: to_signed(a) < to_signed(b),   # BLT
+    0b101: lambda a, b: to_signed(a) >= to_signed(b),  # BGE
+    0b110: lambda a, b: a < b,                         # BLTU
+    0b111: lambda a, b: a >= b,                        # BGEU
+}
+
+# funct3 -> (size in bytes, sign extend)
+LOAD_TYPES = {0b000: (1, True), 0b001: (2, True), 0b010: (4, False), 0b100: (1, False), 0b101: (2, False)}
+STORE_SIZES = {0b000: 1, 0b001: 2, 0b010: 4}
+
+
+class RV32IModel:
+    """Instruction-level RV32I reference model.
+
+    Mirrors riscv_core's memory layout: separate instruction and data
+    memories of mem_depth words each, addresses wrap at the memory size.
+    Misaligned loads and stores are aligned down to their size, as the
+    core's data RAM does (test_program's sw to byte 19 writes word 4).
+    ecall/ebreak halt the model. CSR instructions read the counters, instret
+    is the number of instructions retired so far, the timing dependent ones
+    come from csr_hook(csr) (0 without one). CSR writes are ignored like in
+    the core.
+    """
+
+    def __init__(self, program, data=None, mem_depth=1024, csr_hook=None):
+        self.mem_depth = mem_depth
+        self.imem = list(program)[:mem_depth]
+        self.imem += [0] * (mem_depth - len(self.imem))
+        self.dmem = bytearray(mem_depth * 4)
+        for i, word in enumerate(data or []):
+            self.dmem[4 * i:4 * i + 4] = (word & MASK32).to_bytes(4, "little")
+        self.regs = [0] * 32
+        self.pc = 0
+        self.halted = False
+        self.retired = 0
+        self.csr_hook = csr_hook
+
+    def read_csr(self, csr):
+        if csr in (csr_e.CSR_MINSTRET, csr_e.CSR_INSTRET):
+            return self.retired & MASK32
+        if csr in (csr_e.CSR_MINSTRETH, csr_e.CSR_INSTRETH):
+            return self.retired >> 32
+        return self.csr_hook(csr) if self.csr_hook else 0
+
+    def fetch(self, pc):
+        return self.imem[(pc >> 2) % self.mem_depth]
+
+    def load(self, addr, size, signed):
+        # Like the data RAM, which ignores the address bits below the access size
+        addr &= ~(size - 1)
+        value = 0
+        for i in range(size):
+            value |= self.dmem[(addr + i) % len(self.dmem)] << (8 * i)
+        return sext(value, 8 * size) & MASK32 if signed else value
+
+    def store(self, addr, value, size):
+        addr &= ~(size - 1)
+        for i in range(size):
+            self.dmem[(addr + i) % len(self.dmem)] = (value >> (8 * i)) & 0xFF
+
+    def step(self):
+        """Execute one instruction and return its Retired record"""
+        pc = self.pc
+        ins = self.fetch(pc)
+        opcode = ins & 0x7F
+        rd = (ins >> 7) & 0x1F
+        funct3 = (ins >> 12) & 0x7
+        a = self.regs[(ins >> 15) & 0x1F]
+        b = self.regs[(ins >> 20) & 0x1F]
+        alt = bool(ins >> 30 & 1)
+
+        next_pc = (pc + 4) & MASK32
+        result = None
+        mem_addr = mem_data = None
+        halt = False
+
+        if opcode == opcode_e.OP_LUI:
+            result = imm_u(ins)
+        elif opcode == opcode_e.OP_AUIPC:
+            result = pc + imm_u(ins)
+        elif opcode == opcode_e.OP_JAL:
+            result = pc + 4
+            next_pc = pc + imm_j(ins)
+        elif opcode == opcode_e.OP_JALR:
+            result = pc + 4
+            next_pc = (a + imm_i(ins)) & ~1
+        elif opcode == opcode_e.OP_BRANCH and funct3 in BRANCH_CONDITIONS:
+            if BRANCH_CONDITIONS[funct3](a, b):
+                next_pc = pc + imm_b(ins)
+        elif opcode == opcode_e.OP_LOAD and funct3 in LOAD_TYPES:
+            mem_addr = (a + imm_i(ins)) & MASK32
+            result = mem_data = self.load(mem_addr, *LOAD_TYPES[funct3])
+        elif opcode == opcode_e.OP_STORE and funct3 in STORE_SIZES:
+            mem_addr = (a + imm_s(ins)) & MASK32
+            mem_data = b & ((1 << (8 * STORE_SIZES[funct3])) - 1)
+            self.store(mem_addr, b, STORE_SIZES[funct3])
+        elif opcode == opcode_e.OP_OP_IMM:
+            # Only the shift-right immediates use funct7
+            result = alu(funct3, alt and funct3 == 0b101, a, imm_i(ins) & MASK32)
+        elif opcode == opcode_e.OP_OP:
+            result = alu(funct3, alt, a, b)
+        elif opcode == opcode_e.OP_MISC_MEM:
+            pass  # fence: nothing to order in this model
+        elif is_halt(ins):
+            halt = True
+            next_pc = pc
+        elif opcode == opcode_e.OP_SYSTEM and funct3 != 0b100:
+            result = self.read_csr(ins >> 20)
+        else:
+            raise IllegalInstruction(f"illegal instruction {ins:08x} at pc {pc:#010x}")
+
+        if result is not None and rd != 0:
+            result &= MASK32
+            self.regs[rd] = result
+        else:
+            rd = result = None
+
+        self.pc = next_pc & MASK32
+        self.halted = halt
+        self.retired += 1
+        return Retired(pc, ins, rd, result, mem_addr, mem_data, self.pc, halt)
+
+    def run(self, max_steps=1000000):
+        """Step until ecall/ebreak, returns the number of instructions executed"""
+        start = self.retired
+        while not self.halted:
+            if self.retired - start >= max_steps:
+                raise RuntimeError(f"model did not halt within {max_steps} instructions")
+            self.step()
+        return self.retired - start
+
+
+def load_hex(path):
+    """Read a $readmemh style file (// comments, @address directives) into a word list"""
+    words = []
+    address = 0
+    with open(path) as f:
+        for line in f:
+            for token in line.split("//")[0].split():
+                if token.startswith("@"):
+                    address = int(token[1:], 16)
+                    continue
+                words += [0] * (address + 1 - len(words))
+                words[address] = int(token, 16)
+                address += 1
+    return words
+
+
+OP_NAMES = {0b000: "add", 0b001: "sll", 0b010: "slt", 0b011: "sltu",
+            0b100: "xor", 0b101: "srl", 0b110: "or", 0b111: "and"}
+BRANCH_NAMES = {0b000: "beq", 0b001: "bne", 0b100: "blt", 0b101: "bge", 0b110: "bltu", 0b111: "bgeu"}
+LOAD_NAMES = {0b000: "lb", 0b001: "lh", 0b010: "lw", 0b100: "lbu", 0b101: "lhu"}
+STORE_NAMES = {0b000: "sb", 0b001: "sh", 0b010: "sw"}
+CSR_NAMES = {0b001: "csrrw", 0b010: "csrrs", 0b011: "csrrc", 0b101: "csrrwi", 0b110: "csrrsi", 0b111: "csrrci"}
+
+
+def csr_name(csr):
+    try:
+        return csr_e(csr).name[len("CSR_"):].lower()
+    except ValueError:
+        return f"{csr:#x}"
+
+
+def disassemble(ins):
+    opcode = ins & 0x7F
+    rd = (ins >> 7) & 0x1F
+    funct3 = (ins >> 12) & 0x7
+    rs1 = (ins >> 15) & 0x1F
+    rs2 = (ins >> 20) & 0x1F
+    alt = ins >> 30 & 1
+
+    if opcode == opcode_e.OP_LUI:
+        return f"lui x{rd}, {imm_u(ins) >> 12:#x}"
+    if opcode == opcode_e.OP_AUIPC:
+        return f"auipc x{rd}, {imm_u(ins) >> 12:#x}"
+    if opcode == opcode_e.OP_JAL:
+        return f"jal x{rd}, {imm_j(ins)}"
+    if opcode == opcode_e.OP_JALR:
+        return f"jalr x{rd}, {imm_i(ins)}(x{rs1})"
+    if opcode == opcode_e.OP_BRANCH and funct3 in BRANCH_NAMES:
+        return f"{BRANCH_NAMES[funct3]} x{rs1}, x{rs2}, {imm_b(ins)}"
+    if opcode == opcode_e.OP_LOAD and funct3 in LOAD_NAMES:
+        return f"{LOAD_NAMES[funct3]} x{rd}, {imm_i(ins)}(x{rs1})"
+    if opcode == opcode_e.OP_STORE and funct3 in STORE_NAMES:
+        return f"{STORE_NAMES[funct3]} x{rs2}, {imm_s(ins)}(x{rs1})"
+    if opcode == opcode_e.OP_OP_IMM:
+        name = "sra" if funct3 == 0b101 and alt else OP_NAMES[funct3]
+        if funct3 in (0b001, 0b101):
+            return f"{name}i x{rd}, x{rs1}, {rs2}"
+        return f"{name}i x{rd}, x{rs1}, {imm_i(ins)}"
+    if opcode == opcode_e.OP_OP:
+        name = {0b000: "sub", 0b101: "sra"}.get(funct3) if alt else None
+        return f"{name or OP_NAMES[funct3]} x{rd}, x{rs1}, x{rs2}"
+    if opcode == opcode_e.OP_MISC_MEM:
+        return "fence"
+    if is_halt(ins):
+        return "ebreak" if ins >> 20 == 1 else "ecall"
+    if opcode == opcode_e.OP_SYSTEM and funct3 in CSR_NAMES:
+        source = f"x{rs1}" if funct3 < 0b100 else str(rs1)
+        return f"{CSR_NAMES[funct3]} x{rd}, {csr_name(ins >> 20)}, {source}"
+    return f".word {ins:#010x}"
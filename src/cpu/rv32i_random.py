@@ -0,0 +1,181 @@
+"""Constrained-random RV32I programs.
+
+generate(seed) returns assembly source for a legal program that always
+reaches its ecall: the same seed always gives the same program, so a
+failing seed is all it takes to replay a failure.
+
+    source = generate(1234, length=300)
+    program = assemble(source)
+
+The program is a run of blocks, either straight-line code or a counted
+loop. Instructions are drawn by weight (WEIGHTS), their sources are often
+the registers written just before them to build dependency chains, loads
+and stores stay inside a data buffer, and branches and jumps only go
+forward within their block. The only backward branch closes a loop, on a
+counter nothing else writes, so every program terminates.
+"""
+import random
+import re
+
+from rv32i_asm import ABI_NAMES
+
+# gp points at the data buffer, tp counts loop iterations
+BASE, COUNTER = "gp", "tp"
+POOL = [name for name in ABI_NAMES if name not in ("zero", BASE, COUNTER)]
+BUFFER_WORDS = 64
+
+WEIGHTS = {
+    "alu": 20,      # register-register
+    "alu_imm": 16,
+    "shift_imm": 6,
+    "upper": 4,     # lui/auipc
+    "load": 14,
+    "store": 10,
+    "branch": 10,   # forward, conditional
+    "jal": 3,       # forward
+    "jalr": 2,      # forward, through a register
+    "csr": 1,       # counter reads, lockstep takes the value from the core
+}
+
+ALU = ["add", "sub", "sll", "slt", "sltu", "xor", "srl", "sra", "or", "and"]
+ALU_IMM = ["addi", "slti", "sltiu", "xori", "ori", "andi"]
+SHIFT_IMM = ["slli", "srli", "srai"]
+BRANCHES = ["beq", "bne", "blt", "bge", "bltu", "bgeu"]
+# mnemonic -> access size in bytes
+LOADS = {"lb": 1, "lbu": 1, "lh": 2, "lhu": 2, "lw": 4}
+STORES = {"sb": 1, "sh": 2, "sw": 4}
+CSR_READS = ["rdcycle {rd}", "rdinstret {rd}", "csrr {rd}, mhpmcounter3", "csrr {rd}, mhpmcounter5"]
+# Ways to write "loop again while tp > 0"
+LOOP_BRANCHES = ["bnez tp, {label}", "blt zero, tp, {label}", "bltu zero, tp, {label}"]
+# Interesting immediates besides uniformly random ones
+IMM_CORNERS = [0, 1, -1, 2047, -2048]
+
+
+class Generator:
+    def __init__(self, seed, weights=None, dependency=0.5, loop_chance=0.3, max_iterations=8,
+                 max_skip=6):
+        self.rng = random.Random(seed)
+        self.weights = dict(WEIGHTS, **(weights or {}))
+        self.dependency = dependency
+        self.loop_chance = loop_chance
+        self.max_iterations = max_iterations
+        self.max_skip = max_skip
+        self.recent = []  # registers written lately, newest last
+        self.labels = 0
+
+    def label(self, prefix="L"):
+        self.labels += 1
+        return f"{prefix}{self.labels}"
+
+    def dest(self):
+        rd = self.rng.choice(POOL)
+        self.recent = (self.recent + [rd])[-4:]
+        return rd
+
+    def source(self):
+        """A recently written register (a dependency chain) or any register"""
+        if self.recent and self.rng.random() < self.dependency:
+            return self.rng.choice(self.recent)
+        return self.rng.choice(POOL + ["zero"])
+
+    def imm(self, bits=12):
+        if self.rng.random() < 0.2:
+            return self.rng.choice(IMM_CORNERS)
+        return self.rng.randrange(-(1 << (bits - 1)), 1 << (bits - 1))
+
+    def instruction(self, kind):
+        """One entry of a block: (lines, forward target offset or None)"""
+        rng = self.rng
+        if kind == "alu":
+            rs1, rs2 = self.source(), self.source()
+            return [f"{rng.choice(ALU)} {self.dest()}, {rs1}, {rs2}"], None
+        if kind == "alu_imm":
+            rs1 = self.source()
+            return [f"{rng.choice(ALU_IMM)} {self.dest()}, {rs1}, {self.imm()}"], None
+        if kind == "shift_imm":
+            rs1 = self.source()
+            return [f"{rng.choice(SHIFT_IMM)} {self.dest()}, {rs1}, {rng.randrange(32)}"], None
+        if kind == "upper":
+            return [f"{rng.choice(['lui', 'auipc'])} {self.dest()}, {rng.randrange(1 << 20)}"], None
+        if kind == "load":
+            mnemonic = rng.choice(list(LOADS))
+            offset = LOADS[mnemonic] * rng.randrange(BUFFER_WORDS * 4 // LOADS[mnemonic])
+            return [f"{mnemonic} {self.dest()}, {offset}({BASE})"], None
+        if kind == "store":
+            mnemonic = rng.choice(list(STORES))
+            offset = STORES[mnemonic] * rng.randrange(BUFFER_WORDS * 4 // STORES[mnemonic])
+            return [f"{mnemonic} {self.source()}, {offset}({BASE})"], None
+        if kind == "branch":
+            rs1, rs2 = self.source(), self.source()
+            return [f"{rng.choice(BRANCHES)} {rs1}, {rs2}, {{target}}"], rng.randint(1, self.max_skip)
+        if kind == "jal":
+            return [f"jal {self.dest()}, {{target}}"], rng.randint(1, self.max_skip)
+        if kind == "jalr":
+            # Not dest(): the address register shouldn't feed dependency chains
+            address = rng.choice(POOL)
+            return [f"la {address}, {{target}}", f"jalr {self.dest()}, 0({address})"], \
+                rng.randint(1, self.max_skip)
+        if kind == "csr":
+            return [rng.choice(CSR_READS).format(rd=self.dest())], None
+        raise ValueError(f"unknown instruction kind {kind!r}")
+
+    def block(self, size):
+        """Lines of `size` random entries, forward targets inside the block"""
+        kinds = [kind for kind, weight in self.weights.items() if weight > 0]
+        weights = [self.weights[kind] for kind in kinds]
+        entries = [self.instruction(kind) for kind in self.rng.choices(kinds, weights, k=size)]
+        # Targets are entry indices, index size is the end of the block
+        labels = {}
+        resolved = []
+        for index, (entry, skip) in enumerate(entries):
+            if skip is not None:
+                label = labels.setdefault(min(index + skip, size), self.label())
+                entry = [line.replace("{target}", label) for line in entry]
+            resolved.append(entry)
+        lines = []
+        for index, entry in enumerate(resolved + [[]]):
+            if index in labels:
+                lines.append(f"{labels[index]}:")
+            lines.extend(entry)
+        return lines
+
+    def loop(self, size):
+        label = self.label("loop")
+        lines = [f"li {COUNTER}, {self.rng.randint(1, self.max_iterations)}", f"{label}:"]
+        lines += self.block(size)
+        lines += [f"addi {COUNTER}, {COUNTER}, -1", self.rng.choice(LOOP_BRANCHES).format(label=label)]
+        return lines
+
+    def program(self, length):
+        rng = self.rng
+        lines = [".data", "buf:"]
+        for _ in range(0, BUFFER_WORDS, 8):
+            lines.append(".word " + ", ".join(f"{rng.getrandbits(32):#010x}" for _ in range(8)))
+        lines += [".text", f"la {BASE}, buf"]
+        lines += [f"li {name}, {rng.getrandbits(32):#010x}" for name in POOL]
+        remaining = length
+        while remaining > 0:
+            size = min(remaining, rng.randint(3, 12))
+            lines += self.loop(size) if rng.random() < self.loop_chance else self.block(size)
+            remaining -= size
+        lines += ["halt:", "ecall"]
+        # Labels and sections flush left, easier to read when replaying
+        return "\n".join(line if line.endswith(":") or line in (".data", ".text") else f"        {line}"
+                          for line in lines) + "\n"
+
+
+def generate(seed, length=200, **options):
+    """Assembly source of a random program with about `length` instructions after its setup"""
+    return Generator(seed, **options).program(length)
+
+
+def parse_seeds(text):
+    """Seeds from "1,5,10-19" (ranges inclusive)"""
+    seeds = []
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        match = re.fullmatch(r"(\d+)-(\d+)", part)
+        if match:
+            seeds.extend(range(int(match.group(1)), int(match.group(2)) + 1))
+        else:
+            seeds.append(int(part))
+    return seeds
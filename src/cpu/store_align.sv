@@ -0,0 +1,30 @@
+`timescale 1ns/1ps
+
+// Moves store data and byte mask into the lanes the address selects in the
+// word wide data RAM. Misaligned accesses stay inside their naturally
+// aligned lane group: a word store ignores the low address bits and a
+// halfword store only looks at bit 1.
+module store_align #(
+    parameter width_p = 32
+) (
+    input  logic [3:0]          mask_i,     // From control_unit, lane 0 based
+    input  logic [1:0]          offset_i,   // Low bits of the store address
+    input  logic [width_p-1:0]  data_i,
+    output logic [3:0]          mask_o,
+    output logic [width_p-1:0]  data_o
+);
+
+    logic [1:0] lane;
+
+    always_comb begin
+        case (mask_i)
+            4'b1111: lane = 2'b00;                  // SW
+            4'b0011: lane = {offset_i[1], 1'b0};    // SH
+            default: lane = offset_i;               // SB
+        endcase
+    end
+
+    assign mask_o = mask_i << lane;
+    assign data_o = data_i << {lane, 3'b000};
+
+endmodule
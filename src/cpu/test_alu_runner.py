@@ -3,9 +3,18 @@ from cocotb.runner import get_runner
 from pathlib import Path
 import pytest
 import shutil
+import sys
 
-def run_tests():
-    sim = os.getenv("SIM", "icarus")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_cache import cached_build
+from sim_stats import timed_test
+
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}]
+
+def run_tests(sim=None, build_dir="alu_sim_build", parameters=None, results_xml=None):
+    sim = sim or os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent
 
     # Specify your design sources
@@ -15,22 +24,26 @@ def run_tests():
     runner = get_runner(sim)
     
     if sim == "icarus":
-        runner.build(
+        cached_build(
+            runner, sim, build_dir,
             verilog_sources=sources,
             hdl_toplevel="alu",
+            parameters=parameters or {},
             build_args=[f"-I{proj_path}", "-g2012"],
-            build_dir="alu_sim_build"
         )
     else:  # verilator
-        runner.build(
+        cached_build(
+            runner, sim, build_dir,
             verilog_sources=sources,
             hdl_toplevel="alu",
+            parameters=parameters or {},
             build_args=[f"+incdir+{proj_path}", "--relative-includes"],
-            build_dir="alu_sim_build"
         )
 
     # Run the tests
-    runner.test(
+    return timed_test(
+        runner, sim,
+        results_xml=results_xml,
         hdl_toplevel="alu",
         test_module="alu_tb",
     )
@@ -39,7 +52,6 @@ def run_tests():
 if __name__ == "__main__":
     run_tests()
 
-@pytest.mark.parametrize("simulator", ["icarus", "verilator"])
+@pytest.mark.parametrize("simulator", SIMULATORS)
 def test_alu_runner(simulator):
-    os.environ["SIM"] = simulator
-    run_tests()
+    run_tests(simulator)
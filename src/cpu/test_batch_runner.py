@@ -0,0 +1,89 @@
+"""Batch runner: many programs on riscv_core_batch in one simulator process.
+
+    python test_batch_runner.py --sim verilator --cores 16 --seeds 0-255
+    python test_batch_runner.py --sim verilator ../memory/sum_program.s ../bench/*.s
+
+Each program runs on the next free core of the batch, checked in lockstep
+with the RV32I model unless --no-lockstep, so the build, elaboration and
+cocotb start are paid once for the whole list instead of once per
+program. Per-program results (core, cycles, instret, error) go to
+batch_results.json.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_cache import RUN_ERRORS, add_profile_argument, use_profile  # noqa: E402
+from test_riscv_core_runner import run_tests as run_core_tests  # noqa: E402
+
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{"CORES": 8}]
+
+def run_tests(sim=None, build_dir="batch_sim_build", parameters=None, results_xml=None,
+              programs=(), seeds=None, length=200, lockstep=True, results_json=None):
+    """Run `programs` (files) and the random programs of `seeds` ("0-99,123") in one simulation"""
+    # The simulator runs in its own directory, so hand it absolute paths
+    env = {"BATCH_PROGRAMS": os.pathsep.join(str(Path(program).resolve()) for program in programs),
+           "BATCH_SEEDS": seeds if seeds is not None else ("" if programs else "0-15"),
+           "BATCH_LENGTH": str(length), "BATCH_LOCKSTEP": "1" if lockstep else "0",
+           "BATCH_JSON": str(Path(results_json).resolve()) if results_json else ""}
+    return run_core_tests(sim, build_dir, parameters or PARAMETER_SETS[0], results_xml,
+                          testcase="test_batch_programs", toplevel="riscv_core_batch",
+                          test_module="batch_tb", extra_env=env)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many programs in one simulation of riscv_core_batch")
+    parser.add_argument("programs", nargs="*", help="assembly, ELF or .hex programs")
+    parser.add_argument("--sim", default=os.getenv("SIM", "icarus"))
+    parser.add_argument("--cores", type=int, default=8, help="cores in the batch")
+    parser.add_argument("--seeds", default=None,
+                        help='random program seeds, e.g. "0-255" (default 0-15 without programs)')
+    parser.add_argument("--length", type=int, default=200, help="instructions per random program")
+    parser.add_argument("--no-lockstep", action="store_true", help="only check that every program halts")
+    add_profile_argument(parser)
+    parser.add_argument("--out", default="batch_sim_build", help="build and output directory")
+    args = parser.parse_args(argv)
+
+    out_dir = Path(args.out).resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    results_json = out_dir / "batch_results.json"
+    if results_json.exists():
+        results_json.unlink()
+    use_profile(args.profile)
+
+    start = time.monotonic()
+    try:
+        run_tests(args.sim, out_dir, {"CORES": args.cores}, results_xml=str(out_dir / "results.xml"),
+                  programs=args.programs, seeds=args.seeds, length=args.length,
+                  lockstep=not args.no_lockstep, results_json=results_json)
+    except RUN_ERRORS:
+        pass  # Failing programs are in the results
+    wall_time = time.monotonic() - start
+    if not results_json.exists():
+        print(f"The simulation produced no results, see {out_dir}")
+        return 1
+
+    results = json.loads(results_json.read_text())["programs"]
+    print(f"{'program':24} {'core':>4} {'cycles':>8} {'instret':>8}")
+    for result in results:
+        status = "" if result["passed"] else "  FAIL"
+        print(f"{result['name']:24} {result['core']:4} {result['cycles']:8} {result['instret']:8}{status}")
+    failed = [result for result in results if not result["passed"]]
+    print(f"{len(results) - len(failed)}/{len(results)} programs passed on {args.cores} cores in "
+          f"{wall_time:.1f}s ({len(results) / wall_time:.1f} programs/s)")
+    print(f"Results: {results_json}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+@pytest.mark.parametrize("simulator", SIMULATORS)
+def test_batch_runner(simulator):
+    run_tests(simulator)
@@ -0,0 +1,141 @@
+"""Instruction cache runner: riscv_core behind its instruction cache, and cache sizing sweeps.
+
+    python test_icache_runner.py --sim verilator
+    python test_icache_runner.py --sim verilator --sets 16,64 --ways 1,2 --line 4,8 --latency 8,32 -b crc32
+
+main() runs the benchmarks (src/bench) on riscv_core built with every
+combination of the cache sizes given, plus once without a cache, each
+configuration in its own worker and build directory. It prints CPI and
+hit rate per benchmark and configuration and writes them all to
+icache_sweep.json. The regression jobs run the core tests that hold
+whatever the cache does to the timing.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bench"))
+from build_cache import RUN_ERRORS, add_profile_argument, use_profile  # noqa: E402
+from regress import redirect_output  # noqa: E402
+from test_bench_runner import run_tests as run_bench_tests  # noqa: E402
+from test_riscv_core_runner import run_tests as run_core_tests  # noqa: E402
+
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [
+    {"ICACHE_SETS": 16, "ICACHE_WAYS": 1, "ICACHE_LINE_WORDS": 4, "IMEM_LATENCY": 8},
+    {"ICACHE_SETS": 4, "ICACHE_WAYS": 2, "ICACHE_LINE_WORDS": 8, "IMEM_LATENCY": 0},
+]
+# Tests that don't count cycles, or count them with the refills in
+TESTCASES = ["test_extended_program", "test_lockstep", "test_run_until_halt", "test_checkpoint",
+             "test_icache"]
+
+def run_tests(sim=None, build_dir="icache_sim_build", parameters=None, results_xml=None):
+    """Run the cache-proof core tests on riscv_core with the cache in `parameters`"""
+    return run_core_tests(sim, build_dir, parameters or PARAMETER_SETS[0], results_xml, testcase=TESTCASES)
+
+def config_name(parameters):
+    """"16x2x4 lat 8" for 16 sets, 2 ways, 4 word lines and 8 cycles of latency"""
+    if not parameters.get("ICACHE_SETS"):
+        return "no cache"
+    return (f"{parameters['ICACHE_SETS']}x{parameters['ICACHE_WAYS']}x{parameters['ICACHE_LINE_WORDS']} "
+            f"lat {parameters['IMEM_LATENCY']}")
+
+def cache_bytes(parameters):
+    return 4 * parameters.get("ICACHE_SETS", 0) * parameters.get("ICACHE_WAYS", 1) \
+        * parameters.get("ICACHE_LINE_WORDS", 1)
+
+def run_config(parameters, sim, benchmarks, lockstep, out_dir):
+    """Run the benchmarks on one cache configuration in this worker, return their results"""
+    config_dir = out_dir / config_name(parameters).replace(" ", "_")
+    config_dir.mkdir(parents=True, exist_ok=True)
+    results_json = config_dir / "bench_results.json"
+    if results_json.exists():
+        results_json.unlink()
+    with redirect_output(config_dir / "bench.log"):
+        try:
+            run_bench_tests(sim, config_dir, parameters, results_xml=str(config_dir / "results.xml"),
+                            benchmarks=benchmarks, results_json=results_json, lockstep=lockstep)
+        except RUN_ERRORS:
+            pass  # Failing benchmarks still write their results
+    if not results_json.exists():
+        return None
+    return json.loads(results_json.read_text())["benchmarks"]
+
+def parse_list(text):
+    return [int(value, 0) for value in text.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep instruction cache sizes over the benchmarks")
+    parser.add_argument("--sim", default=os.getenv("SIM", "icarus"))
+    parser.add_argument("--sets", type=parse_list, default=[16, 64], help="sets, e.g. 16,64")
+    parser.add_argument("--ways", type=parse_list, default=[1, 2], help="ways per set")
+    parser.add_argument("--line", type=parse_list, default=[4, 8], help="words per line")
+    parser.add_argument("--latency", type=parse_list, default=[8],
+                        help="cycles before the first word of a refill")
+    parser.add_argument("-b", "--bench", action="append", help="only run this benchmark (repeatable)")
+    parser.add_argument("--no-lockstep", action="store_true",
+                        help="don't check every instruction against the model, just the results")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    add_profile_argument(parser)
+    parser.add_argument("--out", default="icache_sweep_sim_build", help="output directory")
+    args = parser.parse_args(argv)
+
+    out_dir = Path(args.out).resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    configs = [{"ICACHE_SETS": 0}] + [
+        {"ICACHE_SETS": sets, "ICACHE_WAYS": ways, "ICACHE_LINE_WORDS": line, "IMEM_LATENCY": latency}
+        for sets, ways, line, latency in itertools.product(args.sets, args.ways, args.line, args.latency)]
+    use_profile(args.profile, args.jobs)
+
+    start = time.monotonic()
+    results = {}
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(run_config, config, args.sim, args.bench, not args.no_lockstep, out_dir): i
+                   for i, config in enumerate(configs)}
+        for future in as_completed(futures):
+            config = configs[futures[future]]
+            results[futures[future]] = future.result()
+            print(f"{'FAIL' if results[futures[future]] is None else 'done'} {config_name(config)}")
+
+    sweep = []
+    for i, config in enumerate(configs):
+        sweep.append({"name": config_name(config), "parameters": config, "bytes": cache_bytes(config),
+                      "benchmarks": results[i]})
+    (out_dir / "icache_sweep.json").write_text(json.dumps({"sim": args.sim, "configs": sweep}, indent=2))
+
+    names = sorted({entry["name"] for config in sweep for entry in config["benchmarks"] or []})
+    print(f"{'cache':18} {'bytes':>6} " + " ".join(f"{name:>16}" for name in names))
+    for config in sweep:
+        cells = {entry["name"]: entry for entry in config["benchmarks"] or []}
+        line = f"{config['name']:18} {config['bytes']:6} "
+        for name in names:
+            entry = cells.get(name)
+            if entry is None or not entry["passed"]:
+                line += f"{'FAIL':>16} "
+                continue
+            icache = entry["icache"]
+            hit_rate = f"{100 * icache['hits'] / (icache['hits'] + icache['misses']):5.1f}%" if icache else ""
+            line += f"{entry['cpi']:9.3f} {hit_rate:>6} "
+        print(line)
+    print(f"{len(configs)} configurations in {time.monotonic() - start:.1f}s, CPI and hit rate per benchmark")
+    print(f"Results: {out_dir / 'icache_sweep.json'}")
+    failed = any(config["benchmarks"] is None or not all(entry["passed"] for entry in config["benchmarks"])
+                 for config in sweep)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+@pytest.mark.parametrize("simulator", SIMULATORS)
+@pytest.mark.parametrize("parameters", PARAMETER_SETS, ids=config_name)
+def test_icache_runner(simulator, parameters):
+    run_tests(simulator, parameters=parameters)
@@ -2,9 +2,18 @@ import os
 from cocotb.runner import get_runner
 from pathlib import Path
 import pytest
+import sys
 
-def run_tests():
-    sim = os.getenv("SIM", "icarus")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_cache import cached_build
+from sim_stats import timed_test
+
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}]
+
+def run_tests(sim=None, build_dir="id_sim_build", parameters=None, results_xml=None):
+    sim = sim or os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
 
     # Specify your design sources
@@ -15,14 +24,17 @@ def run_tests():
 
     # Get the runner for the specified simulator
     runner = get_runner(sim)
-    runner.build(
+    cached_build(
+        runner, sim, build_dir,
         verilog_sources=sources,
         hdl_toplevel="instruction_decoder",
-        build_dir="id_sim_build"
+        parameters=parameters or {},
     )
 
     # Run the tests
-    runner.test(
+    return timed_test(
+        runner, sim,
+        results_xml=results_xml,
         hdl_toplevel="instruction_decoder",
         test_module="instruction_decoder_tb",
     )
@@ -30,7 +42,6 @@ def run_tests():
 if __name__ == "__main__":
     run_tests()
 
-@pytest.mark.parametrize("simulator", ["icarus", "verilator"])
+@pytest.mark.parametrize("simulator", SIMULATORS)
 def test_instruction_decoder_runner(simulator):
-    os.environ["SIM"] = simulator
-    run_tests()
+    run_tests(simulator)
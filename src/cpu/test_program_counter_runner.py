@@ -3,9 +3,19 @@ from cocotb.runner import get_runner
 from pathlib import Path
 import pytest
 import shutil
+import sys
 
-def run_tests():
-    sim = os.getenv("SIM", "icarus")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_cache import cached_build
+from sim_stats import timed_test
+from tb_utils import CLOCK_PERIOD_NS
+
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}]
+
+def run_tests(sim=None, build_dir="program_counter_sim_build", parameters=None, results_xml=None):
+    sim = sim or os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent
 
     # Specify your design sources
@@ -15,22 +25,27 @@ def run_tests():
     runner = get_runner(sim)
     
     if sim == "icarus":
-        runner.build(
+        cached_build(
+            runner, sim, build_dir,
             verilog_sources=sources,
             hdl_toplevel="program_counter",
+            parameters=parameters or {},
             build_args=[f"-I{proj_path}", "-g2012"],
-            build_dir="program_counter_sim_build"
         )
     else:  # verilator
-        runner.build(
+        cached_build(
+            runner, sim, build_dir,
             verilog_sources=sources,
             hdl_toplevel="program_counter",
+            parameters=parameters or {},
             build_args=[f"+incdir+{proj_path}", "--relative-includes"],
-            build_dir="program_counter_sim_build"
         )
 
     # Run the tests
-    runner.test(
+    return timed_test(
+        runner, sim,
+        clock_period_ns=CLOCK_PERIOD_NS,
+        results_xml=results_xml,
         hdl_toplevel="program_counter",
         test_module="program_counter_tb",
     )
@@ -39,7 +54,6 @@ def run_tests():
 if __name__ == "__main__":
     run_tests()
 
-@pytest.mark.parametrize("simulator", ["icarus", "verilator"])
+@pytest.mark.parametrize("simulator", SIMULATORS)
 def test_program_counter_runner(simulator):
-    os.environ["SIM"] = simulator
-    run_tests()
+    run_tests(simulator)
@@ -0,0 +1,131 @@
+"""Random program runner: constrained-random RV32I programs on a core in lockstep.
+
+    python test_random_runner.py --sim verilator --seeds 0-9999 -j 16
+    python test_random_runner.py --sim verilator --seeds 1234          # replay one seed
+
+Seeds are split into shards of --shard-size, each shard is one simulation
+that runs its programs back to back. Shards go to -j worker processes,
+each of which builds the core once in its own build directory. Failing
+seeds end up in random_results.json with the command that replays them,
+and their assembly next to it as seed_<n>.s.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_cache import RUN_ERRORS, add_profile_argument, use_profile  # noqa: E402
+from regress import redirect_output  # noqa: E402
+from rv32i_random import generate, parse_seeds  # noqa: E402
+from test_riscv_core_runner import run_tests as run_core_tests  # noqa: E402
+
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}]
+
+def run_tests(sim=None, build_dir="random_sim_build", parameters=None, results_xml=None,
+              toplevel="riscv_core", seeds="0-19", length=200, results_json=None):
+    """Run the random programs of `seeds` ("0-99,123") in one simulation"""
+    env = {"RANDOM_SEEDS": seeds, "RANDOM_LENGTH": str(length),
+           "RANDOM_JSON": str(Path(results_json).resolve()) if results_json else ""}
+    return run_core_tests(sim, build_dir, parameters, results_xml, testcase="test_random_programs",
+                          toplevel=toplevel, test_module="random_tb", extra_env=env)
+
+def seed_ranges(seeds):
+    """"0-3,7" for [0, 1, 2, 3, 7]"""
+    ranges = []
+    for seed in sorted(seeds):
+        if ranges and ranges[-1][1] == seed - 1:
+            ranges[-1][1] = seed
+        else:
+            ranges.append([seed, seed])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def run_shard(shard, sim, toplevel, length, out_dir):
+    """Run one shard in this worker process, return {seed: error} for its failing seeds"""
+    shard_dir = out_dir / f"shard-{shard[0]}"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    results_json = shard_dir / "random_results.json"
+    if results_json.exists():
+        results_json.unlink()
+    # One build per worker, reused by every shard it runs
+    build_dir = out_dir / f"build-{os.getpid()}"
+    error = None
+    with redirect_output(shard_dir / "shard.log"):
+        try:
+            run_tests(sim, build_dir, results_xml=str(shard_dir / "results.xml"), toplevel=toplevel,
+                      seeds=seed_ranges(shard), length=length, results_json=results_json)
+        except RUN_ERRORS as e:
+            error = f"{type(e).__name__}: {e}"
+    if not results_json.exists():
+        # The simulation never got to the end, none of its seeds count as passed
+        reason = f"{error or 'no results produced'}, see {shard_dir / 'shard.log'}"
+        return {seed: reason for seed in shard}
+    return {int(seed): message for seed, message in json.loads(results_json.read_text())["failures"].items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run constrained-random programs on a core")
+    parser.add_argument("--sim", default=os.getenv("SIM", "icarus"))
+    parser.add_argument("--core", default="riscv_core", choices=["riscv_core", "riscv_core_pipelined"])
+    parser.add_argument("--seeds", default="0-99", help='seeds to run, e.g. "0-9999" or "5,17,100-199"')
+    parser.add_argument("--length", type=int, default=200, help="instructions per program")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--shard-size", type=int, default=50, help="seeds per simulation")
+    add_profile_argument(parser)
+    parser.add_argument("--out", default=None, help="output directory (default: <core>_random_sim_build)")
+    args = parser.parse_args(argv)
+
+    out_dir = Path(args.out or f"{args.core}_random_sim_build").resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    seeds = parse_seeds(args.seeds)
+    use_profile(args.profile, args.jobs)
+    shards = [seeds[i:i + args.shard_size] for i in range(0, len(seeds), args.shard_size)]
+
+    start = time.monotonic()
+    failures = {}
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(run_shard, shard, args.sim, args.core, args.length, out_dir): shard
+                   for shard in shards}
+        for future in as_completed(futures):
+            shard, failed = futures[future], future.result()
+            failures.update(failed)
+            print(f"{'FAIL' if failed else 'PASS'} seeds {seed_ranges(shard):20} "
+                  f"{len(shard) - len(failed):5}/{len(shard)} passed")
+    wall_time = time.monotonic() - start
+
+    replay = (f"python {Path(__file__).name} --sim {args.sim} --core {args.core} --length {args.length} "
+              f"--profile {args.profile} --seeds {seed_ranges(failures)}")
+    for seed in failures:
+        (out_dir / f"seed_{seed}.s").write_text(generate(seed, args.length))
+    summary = {
+        "sim": args.sim,
+        "core": args.core,
+        "profile": args.profile,
+        "length": args.length,
+        "seeds": len(seeds),
+        "wall_time": wall_time,
+        "failures": {str(seed): failures[seed] for seed in sorted(failures)},
+        "replay": replay if failures else None,
+    }
+    (out_dir / "random_results.json").write_text(json.dumps(summary, indent=2))
+
+    print(f"{len(seeds) - len(failures)}/{len(seeds)} programs passed in {wall_time:.1f}s "
+          f"({args.jobs} workers, {len(seeds) / wall_time:.1f} programs/s)")
+    if failures:
+        print(f"Failing seeds: {seed_ranges(failures)}")
+        print(f"Replay: {replay}")
+    print(f"Results: {out_dir / 'random_results.json'}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+@pytest.mark.parametrize("simulator", SIMULATORS)
+def test_random_runner(simulator):
+    run_tests(simulator)
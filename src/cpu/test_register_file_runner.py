@@ -3,6 +3,12 @@ from cocotb.runner import get_runner
 from pathlib import Path
 import pytest
 import shutil
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_cache import cached_build
+from sim_stats import timed_test
+from tb_utils import CLOCK_PERIOD_NS
 
 # def run_tests():
 #     sim = os.getenv("SIM", "icarus")
@@ -27,8 +33,12 @@ import shutil
 # )
 
 
-def run_tests():
-    sim = os.getenv("SIM", "icarus")
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}]
+
+def run_tests(sim=None, build_dir="rf_sim_build", parameters=None, results_xml=None):
+    sim = sim or os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent
 
 
@@ -37,14 +47,18 @@ def run_tests():
 
     # Get the runner for the specified simulator
     runner = get_runner(sim)
-    runner.build(
+    cached_build(
+        runner, sim, build_dir,
         verilog_sources=sources,
         hdl_toplevel="register_file",  # Name of your top-level HDL module
-        build_dir="rf_sim_build"
+        parameters=parameters or {},
     )
 
     # Run the tests
-    runner.test(
+    return timed_test(
+    runner, sim,
+    clock_period_ns=CLOCK_PERIOD_NS,
+    results_xml=results_xml,
     hdl_toplevel="register_file",
     test_module="register_file_tb",
 )
@@ -53,7 +67,6 @@ def run_tests():
 if __name__ == "__main__":
     run_tests()
 
-@pytest.mark.parametrize("simulator", ["icarus", "verilator"])
+@pytest.mark.parametrize("simulator", SIMULATORS)
 def test_register_file_runner(simulator):
-    os.environ["SIM"] = simulator
-    run_tests()
+    run_tests(simulator)
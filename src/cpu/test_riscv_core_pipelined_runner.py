@@ -0,0 +1,34 @@
+from pathlib import Path
+import pytest
+
+from riscv_pkg import predictor_e
+from test_riscv_core_runner import run_tests as run_core_tests
+
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}] + [{"BRANCH_PREDICTOR": int(predictor)} for predictor in predictor_e
+                         if predictor != predictor_e.BP_NONE]
+
+def run_tests(sim=None, build_dir="riscv_core_pipelined_sim_build", parameters=None, results_xml=None,
+              program=None, data=None, testcase=None):
+    # Same testbench and sources as riscv_core, only the top changes
+    return run_core_tests(sim, build_dir, parameters, results_xml, program=program, data=data,
+                          testcase=testcase, toplevel="riscv_core_pipelined")
+
+if __name__ == "__main__":
+    run_tests()
+
+@pytest.mark.parametrize("simulator", SIMULATORS)
+def test_riscv_core_pipelined_runner(simulator):
+    run_tests(simulator)
+
+@pytest.mark.parametrize("simulator", SIMULATORS)
+def test_riscv_core_pipelined_program_plusarg(simulator):
+    program = Path(__file__).resolve().parent.parent / "memory" / "sum_program.s"
+    run_tests(simulator, program=program, testcase="test_lockstep")
+
+@pytest.mark.parametrize("simulator", SIMULATORS)
+@pytest.mark.parametrize("parameters", PARAMETER_SETS[1:],
+                         ids=lambda parameters: predictor_e(parameters["BRANCH_PREDICTOR"]).name)
+def test_riscv_core_pipelined_predictor(simulator, parameters):
+    run_tests(simulator, parameters=parameters, testcase="test_branch_predictor")
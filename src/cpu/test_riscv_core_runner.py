@@ -1,20 +1,35 @@
+import json
 import os
 from cocotb.runner import get_runner
 from pathlib import Path
 import pytest
+import sys
 
-def run_tests():
-    sim = os.getenv("SIM", "icarus")
-    proj_path = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_cache import cached_build
+from sim_stats import timed_test
+from tb_utils import CLOCK_PERIOD_NS
+from rv32i_asm import load_image, write_hex
+from waves import simulator_waves
 
-    # Specify your design sources
-    sources = [
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}]
+
+def core_sources(toplevel="riscv_core"):
+    """Design sources for riscv_core, riscv_core_pipelined or riscv_core_batch"""
+    proj_path = Path(__file__).resolve().parent.parent.parent
+    # The batch wrapper is made of riscv_cores
+    tops = ["riscv_core", toplevel] if toplevel == "riscv_core_batch" else [toplevel]
+    return [
         proj_path / "src" / "cpu" / "alu_pkg.sv",
         proj_path / "src" / "cpu" / "riscv_pkg.sv",
         proj_path / "components" / "ram_1r1w_sync.sv",
+        proj_path / "components" / "ram_1r1w_sync_be.sv",
         proj_path / "src" / "cpu" / "alu.sv",
         proj_path / "src" / "cpu" / "register_file.sv",
         proj_path / "src" / "memory" / "instruction_memory.sv",
+        proj_path / "src" / "memory" / "instruction_cache.sv",
         proj_path / "src" / "memory" / "data_memory.sv",
         proj_path / "src" / "cpu" / "instruction_decoder.sv",
         proj_path / "src" / "cpu" / "control_unit.sv",
@@ -23,8 +38,21 @@ def run_tests():
         proj_path / "src" / "cpu" / "immediate_generator.sv",
         proj_path / "src" / "cpu" / "program_counter.sv",
         proj_path / "src" / "cpu" / "branch_target_generator.sv",
-        proj_path / "src" / "cpu" / "riscv_core.sv",
-    ]
+        proj_path / "src" / "cpu" / "load_extend.sv",
+        proj_path / "src" / "cpu" / "store_align.sv",
+        proj_path / "src" / "cpu" / "perf_counters.sv",
+        proj_path / "src" / "cpu" / "branch_predictor.sv",
+    ] + [proj_path / "src" / "cpu" / f"{top}.sv" for top in tops]
+
+def run_tests(sim=None, build_dir="riscv_core_sim_build", parameters=None, results_xml=None,
+              program=None, data=None, testcase=None, toplevel="riscv_core", test_module="riscv_core_tb",
+              extra_env=None):
+    """Build the core and run its tests, extra_env is added to the simulator's environment"""
+    sim = sim or os.getenv("SIM", "icarus")
+    proj_path = Path(__file__).resolve().parent.parent.parent
+
+    # Specify your design sources
+    sources = core_sources(toplevel)
 
     # Get the runner for the specified simulator
     runner = get_runner(sim)
@@ -40,26 +68,58 @@ def run_tests():
         "MEM_DEPTH": 1024,
         "INIT_FILE": f'"{proj_path}/src/memory/test_program.hex"'
     }
+    common_parameters.update(parameters or {})
     
-    runner.build(
+    # Tracing costs every run, only WAVES turns it on
+    waves, trace_args = simulator_waves(sim, toplevel)
+    cached_build(
+        runner, sim, build_dir,
         verilog_sources=sources,
-        hdl_toplevel="riscv_core",
-        build_args=common_args + ["-g2012"] if sim == "icarus" else common_args,
+        hdl_toplevel=toplevel,
+        build_args=(common_args + ["-g2012"] if sim == "icarus" else common_args) + trace_args,
         parameters=common_parameters,
-        build_dir="riscv_core_sim_build",
-        waves=True
+        waves=waves
     )
 
-    runner.test(
-        hdl_toplevel="riscv_core",
-        test_module="riscv_core_tb",
-        waves=True
+    # Assembly and ELF programs are turned into $readmemh images first
+    if program is not None and Path(program).suffix != ".hex":
+        image, name = load_image(program), Path(program).stem
+        # The simulator runs in its own directory, so hand it absolute paths
+        image_dir = Path(build_dir).resolve()
+        program = write_hex(image.text, image_dir / f"{name}_text.hex")
+        if data is None:
+            data = write_hex(image.data, image_dir / f"{name}_data.hex")
+
+    # +PROGRAM/+DATA swap the memory images at run time, no rebuild needed
+    plusargs = []
+    if program is not None:
+        plusargs.append(f"+PROGRAM={program}")
+    if data is not None:
+        plusargs.append(f"+DATA={data}")
+
+    # Tests that depend on how the core was built look it up here
+    extra_env = {"CORE_PARAMETERS": json.dumps(common_parameters), **(extra_env or {})}
+
+    return timed_test(
+        runner, sim,
+        clock_period_ns=CLOCK_PERIOD_NS,
+        results_xml=results_xml,
+        hdl_toplevel=toplevel,
+        test_module=test_module,
+        testcase=testcase,
+        plusargs=plusargs,
+        extra_env=extra_env,
+        waves=waves
     )
 
 if __name__ == "__main__":
     run_tests()
 
-@pytest.mark.parametrize("simulator", ["icarus", "verilator"])
+@pytest.mark.parametrize("simulator", SIMULATORS)
 def test_riscv_core_runner(simulator):
-    os.environ["SIM"] = simulator
-    run_tests()
+    run_tests(simulator)
+
+@pytest.mark.parametrize("simulator", SIMULATORS)
+def test_riscv_core_program_plusarg(simulator):
+    program = Path(__file__).resolve().parent.parent / "memory" / "sum_program.s"
+    run_tests(simulator, program=program, testcase="test_lockstep")
@@ -0,0 +1,132 @@
+"""Functional coverage as compact bitmaps, mergeable across runs.
+
+A Coverage holds named coverpoints, each a list of bin names and a bitmap
+(a Python int) of the bins that were hit. save() writes the bin names once
+as a small JSON header followed by the packed bits, so a run's file is a
+few hundred bytes. Merging ORs the bitmaps, files with the same header skip
+parsing it again, which keeps merging hundreds of runs well under a second.
+
+    python func_coverage.py regress_out/*/coverage/*.cov -o merged.cov
+    python func_coverage.py merged.cov --holes    # only the bins never hit
+"""
+import argparse
+import json
+import struct
+import sys
+from pathlib import Path
+
+MAGIC = b"RVCOV001"
+HEADER = struct.Struct("<8sI")  # magic, length of the JSON bin names that follow
+
+
+class Coverage:
+    def __init__(self, points):
+        """points maps coverpoint name -> list of bin names"""
+        self.points = {name: list(bins) for name, bins in points.items()}
+        self.bits = dict.fromkeys(self.points, 0)
+
+    def hit(self, point, index):
+        self.bits[point] |= 1 << index
+
+    def merge(self, other):
+        if other.points != self.points:
+            raise ValueError("can't merge coverage with different coverpoints or bins")
+        for name, bits in other.bits.items():
+            self.bits[name] |= bits
+        return self
+
+    def covered(self, point):
+        """Names of the bins of `point` that were hit"""
+        bits = self.bits[point]
+        return [name for i, name in enumerate(self.points[point]) if bits >> i & 1]
+
+    def holes(self, point):
+        """Names of the bins of `point` never hit"""
+        bits = self.bits[point]
+        return [name for i, name in enumerate(self.points[point]) if not bits >> i & 1]
+
+    def counts(self):
+        """(bins hit, bins) over all coverpoints"""
+        hit = sum(bin(bits).count("1") for bits in self.bits.values())
+        return hit, sum(len(bins) for bins in self.points.values())
+
+    def header(self):
+        return json.dumps(self.points, separators=(",", ":")).encode()
+
+    def save(self, path):
+        header = self.header()
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(header)))
+            f.write(header)
+            for name, bins in self.points.items():
+                f.write(self.bits[name].to_bytes((len(bins) + 7) // 8, "little"))
+
+    @classmethod
+    def load(cls, path):
+        return merge_files([path])
+
+    def report(self, holes_only=False):
+        hit, total = self.counts()
+        lines = [f"Functional coverage: {hit}/{total} bins ({100 * hit / total if total else 0:.1f}%)"]
+        for name, bins in self.points.items():
+            holes = self.holes(name)
+            if holes_only and not holes:
+                continue
+            covered = len(bins) - len(holes)
+            lines.append(f"  {name:14} {covered:4}/{len(bins):<4} {100 * covered / len(bins):5.1f}%")
+            if holes:
+                lines.append(f"    holes: {', '.join(holes)}")
+        return "\n".join(lines)
+
+
+def read_file(path):
+    """(header bytes, bitmap bytes) of a coverage file"""
+    data = Path(path).read_bytes()
+    magic, length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a coverage file (or was written by another version)")
+    start = HEADER.size + length
+    return data[HEADER.size:start], data[start:]
+
+
+def merge_files(paths):
+    """One Coverage with every bin hit in any of the files"""
+    coverage = None
+    layouts = {}  # header bytes -> the file's (name, bytes) in its own order
+    for path in paths:
+        file_header, bitmaps = read_file(path)
+        layout = layouts.get(file_header)
+        if layout is None:
+            points = json.loads(file_header)
+            if coverage is None:
+                coverage = Coverage(points)
+            # Same coverpoints can still serialize differently, compare them properly
+            elif points != coverage.points:
+                raise ValueError(f"{path} has different coverpoints than {paths[0]}")
+            layout = layouts[file_header] = [(name, (len(bins) + 7) // 8) for name, bins in points.items()]
+        offset = 0
+        for name, size in layout:
+            coverage.bits[name] |= int.from_bytes(bitmaps[offset:offset + size], "little")
+            offset += size
+    if coverage is None:
+        raise ValueError("no coverage files to merge")
+    return coverage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge coverage files and report the holes")
+    parser.add_argument("files", nargs="+", help="coverage files (.cov)")
+    parser.add_argument("-o", "--out", help="write the merged coverage here")
+    parser.add_argument("--holes", action="store_true", help="only list coverpoints with holes")
+    args = parser.parse_args(argv)
+
+    coverage = merge_files(args.files)
+    if args.out:
+        coverage.save(args.out)
+    print(coverage.report(args.holes))
+    print(f"Merged {len(args.files)} files")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,33 @@
+import json
+import os
+import random
+
 import cocotb
 from cocotb.triggers import Timer, RisingEdge, FallingEdge
 from cocotb.clock import Clock
-from cocotb.binary import BinaryValue
 
-async def reset(dut):
-    dut.reset_i.value = 1
-    await RisingEdge(dut.clk_i)
-    await RisingEdge(dut.clk_i)
-    dut.reset_i.value = 0
-    await RisingEdge(dut.clk_i)
+from memory_bfm import DataMemoryBFM, MemoryScoreboard
+from tb_utils import CLOCK_PERIOD_NS, read_memory, reset, resolve_x
+from waves import record_waves
 
-def resolve_x(value):
-    if isinstance(value, BinaryValue):
-        return value.integer
-    return int(value)
+# Access sizes of each throughput mix
+MIXES = {"word": [4], "halfword": [2], "byte": [1], "mixed": [1, 2, 4]}
+# Scoreboard transactions submitted to the BFM at a time, checked after each batch
+SCOREBOARD_BATCH = 10000
 
 async def write_data(dut, addr, data, mask):
+    """Write and return the number of clock cycles it took"""
     dut.addr_i.value = addr
     dut.write_enable_i.value = 1
     dut.write_data_i.value = data
     dut.write_mask_i.value = mask
+    cycles = 1
     await RisingEdge(dut.clk_i)
     while dut.busy_o.value:
+        cycles += 1
         await RisingEdge(dut.clk_i)
     dut.write_enable_i.value = 0
+    return cycles
 
 async def read_data_from_memory(dut, addr):
     dut.addr_i.value = addr
@@ -37,12 +41,13 @@ async def read_data_from_memory(dut, addr):
     return data
 
 @cocotb.test()
+@record_waves
 async def test_full_word_write_read(dut):
     """Test writing and reading a full word"""
 
     
 
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
     await reset(dut)
@@ -50,7 +55,8 @@ async def test_full_word_write_read(dut):
     test_addr = 0x100
     test_data = 0xdeadbeef
 
-    await write_data(dut, test_addr, test_data, 0b1111)
+    cycles = await write_data(dut, test_addr, test_data, 0b1111)
+    assert cycles == 1, f"Full word write took {cycles} cycles, expected 1"
     read_data = await read_data_from_memory(dut, test_addr)
 
     assert read_data == test_data, f"Full word write/read failed. Expected {test_data:08x}, got {read_data:08x}"
@@ -59,12 +65,13 @@ async def test_full_word_write_read(dut):
         await RisingEdge(dut.clk_i)
 
 @cocotb.test()
+@record_waves
 async def test_byte_write_read(dut):
     """Test writing and reading individual bytes"""
 
     
 
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
     await reset(dut)
@@ -73,7 +80,8 @@ async def test_byte_write_read(dut):
     test_bytes = [0xAA, 0xBB, 0xCC, 0xDD]
 
     for i, byte in enumerate(test_bytes):
-        await write_data(dut, test_addr + i, byte << (8 * i), 1 << i)
+        cycles = await write_data(dut, test_addr + i, byte << (8 * i), 1 << i)
+        assert cycles == 1, f"Byte write {i} took {cycles} cycles, expected 1"
 
     read_data = await read_data_from_memory(dut, test_addr)
     expected_data = sum(byte << (8 * i) for i, byte in enumerate(test_bytes))
@@ -84,12 +92,13 @@ async def test_byte_write_read(dut):
         await RisingEdge(dut.clk_i)
 
 @cocotb.test()
+@record_waves
 async def test_halfword_write_read(dut):
     """Test writing and reading halfwords"""
 
     
 
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
     await reset(dut)
@@ -98,7 +107,8 @@ async def test_halfword_write_read(dut):
     test_halfwords = [0xABCD, 0xEF01]
 
     for i, halfword in enumerate(test_halfwords):
-        await write_data(dut, test_addr + i*2, halfword << (16 * i), 0b0011 << (2 * i))
+        cycles = await write_data(dut, test_addr + i*2, halfword << (16 * i), 0b0011 << (2 * i))
+        assert cycles == 1, f"Halfword write {i} took {cycles} cycles, expected 1"
 
     read_data = await read_data_from_memory(dut, test_addr)
     expected_data = sum(halfword << (16 * i) for i, halfword in enumerate(test_halfwords))
@@ -107,3 +117,131 @@ async def test_halfword_write_read(dut):
     cocotb.log.info("Simulation complete")
     for _ in range(10):
         await RisingEdge(dut.clk_i)
+
+@cocotb.test()
+@record_waves
+async def test_bfm_back_to_back(dut):
+    """Writes of every size and the reads after them go back to back through the BFM"""
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    await reset(dut)
+    bfm = DataMemoryBFM(dut)
+    bfm.start()
+
+    bfm.write(0x400, 0x11223344)
+    bfm.write(0x404, 0xAABB, size=2)
+    bfm.write(0x406, 0xCC, size=1)
+    bfm.write(0x407, 0xDD, size=1)
+    bfm.read(0x400)
+    bfm.read(0x404)
+    bfm.read(0x406, size=2)
+    bfm.read(0x401, size=1)
+    await bfm.drain()
+
+    reads = [response.data for response in bfm.responses if response.request.kind == "read"]
+    assert reads == [0x11223344, 0xDDCCAABB, 0xDDCC, 0x33], [f"{data:08x}" for data in reads]
+    accepted = [response.accepted for response in bfm.responses]
+    assert accepted == list(range(accepted[0], accepted[0] + 8)), f"gaps between requests: {accepted}"
+
+@cocotb.test()
+@record_waves
+async def test_bfm_throughput(dut):
+    """Transactions per cycle for random read/write traffic of each access size mix.
+
+    MEM_TRANSACTIONS sets the transactions per mix (default 1000),
+    MEM_THROUGHPUT_JSON where the results go.
+    """
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    await reset(dut)
+    bfm = DataMemoryBFM(dut)
+    bfm.start()
+
+    count = int(os.getenv("MEM_TRANSACTIONS", "1000"))
+    depth_bytes = 4 * len(dut.data_ram.mem)
+    rng = random.Random(0)
+    results = {}
+    for mix, sizes in MIXES.items():
+        start = len(bfm.responses)
+        for _ in range(count):
+            size = rng.choice(sizes)
+            addr = rng.randrange(0, depth_bytes, size)
+            if rng.random() < 0.5:
+                bfm.read(addr, size)
+            else:
+                bfm.write(addr, rng.getrandbits(8 * size), size)
+        await bfm.drain()
+        responses = bfm.responses[start:]
+        assert len(responses) == count
+        cycles = responses[-1].done - responses[0].accepted + 1
+        results[mix] = {"transactions": count, "cycles": cycles, "per_cycle": round(count / cycles, 4)}
+        dut._log.info(f"{mix:9} {count:7} transactions in {cycles:7} cycles, "
+                      f"{bfm.throughput(responses):.3f} per cycle")
+
+    if os.getenv("MEM_THROUGHPUT_JSON"):
+        with open(os.environ["MEM_THROUGHPUT_JSON"], "w") as f:
+            json.dump({"mixes": results}, f, indent=2)
+
+    # busy_o never rises, one request goes in every cycle and the last read's data follows
+    for mix, result in results.items():
+        assert result["cycles"] <= count + 1, f"{mix}: {result['cycles']} cycles for {count} transactions"
+
+@cocotb.test()
+@record_waves
+async def test_random_scoreboard(dut):
+    """Random reads, sized and arbitrarily masked writes over the whole memory, checked against a model.
+
+    MEM_SCOREBOARD_TRANSACTIONS sets how many (default 100000), MEM_SEED
+    the random seed (default 0). The memory is filled with random words
+    first so every read has a known answer, and the RAM compared word for
+    word with the model at the end.
+    """
+
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
+    cocotb.start_soon(clock.start())
+
+    await reset(dut)
+    bfm = DataMemoryBFM(dut)
+    bfm.start()
+
+    count = int(os.getenv("MEM_SCOREBOARD_TRANSACTIONS", "100000"))
+    rng = random.Random(int(os.getenv("MEM_SEED", "0")))
+    depth = len(dut.data_ram.mem)
+    scoreboard = MemoryScoreboard(4 * depth, rng.randbytes(4 * depth))
+    for addr, word in enumerate(scoreboard.words()):
+        bfm.write(4 * addr, word)
+    await bfm.drain()
+    bfm.responses.clear()
+
+    remaining = count
+    while remaining:
+        batch = min(remaining, SCOREBOARD_BATCH)
+        for _ in range(batch):
+            kind = rng.random()
+            if kind < 0.5:
+                size = rng.choice((1, 2, 4))
+                bfm.read(rng.randrange(0, 4 * depth, size), size)
+            elif kind < 0.8:
+                size = rng.choice((1, 2, 4))
+                bfm.write(rng.randrange(0, 4 * depth, size), rng.getrandbits(8 * size), size)
+            else:
+                bfm.write_masked(4 * rng.randrange(depth), rng.getrandbits(32), rng.randrange(16))
+        await bfm.drain()
+        scoreboard.check_all(bfm.responses)
+        bfm.responses.clear()
+        assert not scoreboard.errors, "\n".join(scoreboard.errors[:20])
+        remaining -= batch
+
+    await FallingEdge(dut.clk_i)
+    expected = scoreboard.words()
+    actual = read_memory(dut.data_ram.mem, x=None)
+    mismatches = [addr for addr, (got, want) in enumerate(zip(actual, expected)) if got != want]
+    assert not mismatches, "RAM differs from the model at words " + ", ".join(
+        f"{4 * addr:#x} ({'X' if actual[addr] is None else f'{actual[addr]:08x}'} vs {expected[addr]:08x})"
+        for addr in mismatches[:20])
+    dut._log.info(f"{scoreboard.reads} reads and {scoreboard.writes} writes matched the model, "
+                  f"{depth} words compared")
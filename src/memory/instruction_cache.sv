@@ -0,0 +1,208 @@
+`timescale 1ns/1ps
+
+// Instruction cache between the core's fetch and a slower program memory.
+// sets_p sets of ways_p lines, line_words_p words each, all powers of two;
+// ways_p = 1 is direct mapped. sets_p = 0 leaves the cache out and fetches
+// go straight to the memory as before.
+//
+// The fetch side reads like instruction_memory: pc_i is looked up on the
+// clock edge unless stall_i, its instruction comes out of instruction_o the
+// cycle after. On a miss instruction_o is a nop and busy_o holds the core
+// while the line comes in: mem_latency_p cycles waiting on the memory
+// (standing in for the command and address phase of an SPI flash read),
+// then one word per cycle from the synchronous backing RAM. instruction_o
+// gets the missed word on the edge the last word of the line arrives.
+// A refill takes the line into the first invalid way of its set, or
+// round robin once they are all valid.
+//
+// hits, misses and refill_cycles count lookups and busy cycles for the
+// testbenches. Reset clears them and invalidates every line.
+module instruction_cache #(
+    parameter width_p = 32,
+    parameter sets_p = 0,
+    parameter ways_p = 1,
+    parameter line_words_p = 4,
+    parameter mem_latency_p = 0
+) (
+    input  logic                clk_i,
+    input  logic                rst_i,
+
+    // Fetch side
+    input  logic [width_p-1:0]  pc_i,
+    input  logic                stall_i,
+    output logic [width_p-1:0]  instruction_o,
+    output logic                busy_o,         // Refilling, instruction_o isn't the fetched one
+
+    // Backing memory, an instruction_memory
+    output logic [width_p-1:0]  mem_addr_o,
+    output logic                mem_stall_o,
+    input  logic [width_p-1:0]  mem_data_i
+);
+
+    logic [31:0] hits;
+    logic [31:0] misses;
+    logic [31:0] refill_cycles;
+
+    generate
+    if (sets_p == 0) begin : gen_bypass
+        assign mem_addr_o = pc_i;
+        assign mem_stall_o = stall_i;
+        assign instruction_o = mem_data_i;
+        assign busy_o = 1'b0;
+        assign hits = '0;
+        assign misses = '0;
+        assign refill_cycles = '0;
+    end else begin : gen_cache
+        localparam OFFSET_BITS = $clog2(line_words_p);
+        localparam SET_BITS = $clog2(sets_p);
+        localparam TAG_W = width_p - 2 - OFFSET_BITS - SET_BITS;
+        // Single-entry dimensions still take a one bit index
+        localparam OFFSET_W = OFFSET_BITS > 0 ? OFFSET_BITS : 1;
+        localparam SET_W = SET_BITS > 0 ? SET_BITS : 1;
+        localparam WAY_W = ways_p > 1 ? $clog2(ways_p) : 1;
+        localparam logic [OFFSET_W-1:0] LAST_OFFSET = line_words_p - 1;
+        localparam logic [width_p-1:0] LINE_MASK = 4 * line_words_p - 1;
+        localparam logic [width_p-1:0] NOP = 'h13;     // addi x0, x0, 0
+
+        localparam logic [1:0] IDLE = 2'd0;
+        localparam logic [1:0] WAIT = 2'd1;    // Memory latency before the first word
+        localparam logic [1:0] FILL = 2'd2;    // Streaming the line in
+
+        logic [width_p-1:0] data_q [sets_p][ways_p][line_words_p];
+        logic [TAG_W-1:0] tag_q [sets_p][ways_p];
+        logic valid_q [sets_p][ways_p];
+        logic [WAY_W-1:0] victim_q [sets_p];
+
+        // Lookup of the fetch address
+        logic [SET_W-1:0] set;
+        logic [OFFSET_W-1:0] offset;
+        logic [TAG_W-1:0] tag;
+        logic hit;
+        logic [width_p-1:0] hit_data;
+        logic free;
+        logic [WAY_W-1:0] free_way;
+
+        assign set = SET_BITS > 0 ? pc_i[2 + OFFSET_BITS +: SET_W] : '0;
+        assign offset = OFFSET_BITS > 0 ? pc_i[2 +: OFFSET_W] : '0;
+        assign tag = pc_i[width_p-1 -: TAG_W];
+
+        always_comb begin
+            hit = 1'b0;
+            hit_data = NOP;
+            free = 1'b0;
+            free_way = '0;
+            // Downwards, so the lowest invalid way is the one left in free_way
+            for (int w = ways_p - 1; w >= 0; w--) begin
+                if (!valid_q[set][w]) begin
+                    free = 1'b1;
+                    free_way = w[WAY_W-1:0];
+                end else if (tag_q[set][w] == tag) begin
+                    hit = 1'b1;
+                    hit_data = data_q[set][w][offset];
+                end
+            end
+        end
+
+        // The refill in progress
+        logic [1:0] state;
+        logic [31:0] wait_count;
+        logic [SET_W-1:0] miss_set;
+        logic [OFFSET_W-1:0] miss_offset;
+        logic [TAG_W-1:0] miss_tag;
+        logic [WAY_W-1:0] miss_way;
+        logic [width_p-1:0] fill_addr;      // Next word to read from the memory
+        logic [width_p-1:0] recv_addr;      // Word arriving from the memory
+        logic issuing;
+        logic issued_all;
+        logic receiving;
+        logic [OFFSET_W-1:0] fill_offset;
+        logic [OFFSET_W-1:0] recv_offset;
+
+        assign fill_offset = OFFSET_BITS > 0 ? fill_addr[2 +: OFFSET_W] : '0;
+        assign recv_offset = OFFSET_BITS > 0 ? recv_addr[2 +: OFFSET_W] : '0;
+        assign issuing = (state == FILL) && !issued_all;
+
+        assign mem_addr_o = fill_addr;
+        assign mem_stall_o = !issuing;
+        assign busy_o = state != IDLE;
+
+        always_ff @(posedge clk_i) begin
+            if (rst_i) begin
+                state <= IDLE;
+                instruction_o <= '0;
+                wait_count <= '0;
+                miss_set <= '0;
+                miss_offset <= '0;
+                miss_tag <= '0;
+                miss_way <= '0;
+                fill_addr <= '0;
+                recv_addr <= '0;
+                issued_all <= 1'b0;
+                receiving <= 1'b0;
+                hits <= '0;
+                misses <= '0;
+                refill_cycles <= '0;
+                for (int s = 0; s < sets_p; s++) begin
+                    victim_q[s] <= '0;
+                    for (int w = 0; w < ways_p; w++) begin
+                        valid_q[s][w] <= 1'b0;
+                    end
+                end
+            end else begin
+                if (state != IDLE) refill_cycles <= refill_cycles + 1;
+
+                case (state)
+                    IDLE: begin
+                        if (!stall_i) begin
+                            if (hit) begin
+                                hits <= hits + 1;
+                                instruction_o <= hit_data;
+                            end else begin
+                                misses <= misses + 1;
+                                instruction_o <= NOP;
+                                state <= mem_latency_p > 0 ? WAIT : FILL;
+                                wait_count <= mem_latency_p;
+                                miss_set <= set;
+                                miss_offset <= offset;
+                                miss_tag <= tag;
+                                miss_way <= free ? free_way : victim_q[set];
+                                fill_addr <= pc_i & ~LINE_MASK;
+                                recv_addr <= pc_i & ~LINE_MASK;
+                                issued_all <= 1'b0;
+                                receiving <= 1'b0;
+                            end
+                        end
+                    end
+                    WAIT: begin
+                        wait_count <= wait_count - 1;
+                        if (wait_count == 1) state <= FILL;
+                    end
+                    default: begin
+                        // The RAM reads fill_addr on this edge, its word arrives next cycle
+                        if (issuing) begin
+                            fill_addr <= fill_addr + 4;
+                            issued_all <= fill_offset == LAST_OFFSET;
+                        end
+                        receiving <= issuing;
+                        if (receiving) begin
+                            data_q[miss_set][miss_way][recv_offset] <= mem_data_i;
+                            recv_addr <= recv_addr + 4;
+                            if (recv_offset == LAST_OFFSET) begin
+                                tag_q[miss_set][miss_way] <= miss_tag;
+                                valid_q[miss_set][miss_way] <= 1'b1;
+                                if (ways_p > 1 && miss_way == victim_q[miss_set]) begin
+                                    victim_q[miss_set] <= victim_q[miss_set] + 1'b1;
+                                end
+                                instruction_o <= recv_offset == miss_offset ? mem_data_i
+                                                 : data_q[miss_set][miss_way][miss_offset];
+                                state <= IDLE;
+                            end
+                        end
+                    end
+                endcase
+            end
+        end
+    end
+    endgenerate
+
+endmodule
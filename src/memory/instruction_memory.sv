@@ -35,11 +35,19 @@ module instruction_memory
     .rd_data_o(instruction_o)
   );
 
-  // Initialize memory if init_file_p is provided
+  // Initialize memory if init_file_p is provided. +PROGRAM=<hex file> on the
+  // simulator command line overrides it, so a new program needs no rebuild.
+  // Simulation only, synthesis has no plusargs.
+`ifndef SYNTHESIS
+  string program_file;
   initial begin
-    if (init_file_p != "") begin
-      $readmemh(init_file_p, instruction_ram.mem);
-      $display("Initialized instruction memory from file: %s", init_file_p);
+    program_file = init_file_p;
+    if ($value$plusargs("PROGRAM=%s", program_file)) begin
+      $display("Program file from +PROGRAM: %s", program_file);
+    end
+    if (program_file != "") begin
+      $readmemh(program_file, instruction_ram.mem);
+      $display("Initialized instruction memory from file: %s", program_file);
       
       // Print out the first few memory locations
       for (int i = 0; i < 12; i++) begin
@@ -47,5 +55,6 @@ module instruction_memory
       end
     end
   end
+`endif
 
 endmodule
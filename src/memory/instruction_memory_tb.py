@@ -1,25 +1,16 @@
 import cocotb
 from cocotb.triggers import Timer, RisingEdge, FallingEdge
 from cocotb.clock import Clock
-from cocotb.binary import BinaryValue
 
-async def reset(dut):
-    dut.reset_i.value = 1
-    await RisingEdge(dut.clk_i)
-    await RisingEdge(dut.clk_i)
-    dut.reset_i.value = 0
-    await RisingEdge(dut.clk_i)
-
-def resolve_x(value):
-    if isinstance(value, BinaryValue):
-        return value.integer
-    return int(value)
+from tb_utils import CLOCK_PERIOD_NS, reset, resolve_x
+from waves import record_waves
 
 @cocotb.test()
+@record_waves
 async def test_preloaded_instructions(dut):
     """Test reading preloaded instructions from memory"""
 
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
     dut.load_addr_i.value = 0
@@ -55,10 +46,11 @@ async def test_preloaded_instructions(dut):
 
 
 @cocotb.test()
+@record_waves
 async def test_write_and_read(dut):
     """Test writing to memory and reading it back"""
 
-    clock = Clock(dut.clk_i, 10, units="ns")
+    clock = Clock(dut.clk_i, CLOCK_PERIOD_NS, units="ns")
     cocotb.start_soon(clock.start())
 
     dut.load_addr_i.value = 0
@@ -0,0 +1,192 @@
+"""Bus-functional model of data_memory: a request queue driven every cycle the memory accepts one.
+
+    bfm = DataMemoryBFM(dut)
+    bfm.start()                                  # after reset
+    bfm.write(0x100, 0xdeadbeef)
+    bfm.read(0x102, size=2)
+    await bfm.drain()
+    [response.data for response in bfm.responses]   # [None, 0xdead]
+
+    scoreboard = MemoryScoreboard(4 * depth)     # or check each response as it comes
+    scoreboard.check_all(bfm.responses)
+
+The driver puts the next queued request on the bus right after each rising
+edge, and keeps it there until an edge with busy_o low takes it. Sub-word
+requests go on their byte lanes the way the core's store_align puts them.
+The monitor samples the bus on the falling edges. It records every
+request the memory is about to accept, and for reads the data that comes
+out the cycle after. So the responses are in the order the memory
+accepted the requests, each with the cycles it was accepted and answered.
+
+MemoryScoreboard replays those responses in order on a bytearray model of
+the memory and checks every read against it.
+"""
+import struct
+from collections import deque, namedtuple
+
+import cocotb
+from cocotb.triggers import Event, FallingEdge, RisingEdge
+
+from tb_utils import read_int
+
+# kind is "read" or "write", size 1, 2 or 4 bytes at a size-aligned addr,
+# data the value written (None for reads). A write with a mask is a word
+# write of only the byte lanes set in it.
+Request = namedtuple("Request", "kind addr size data mask", defaults=(None,))
+# data is what a read returned, zero extended from its size (None for
+# writes, or for reads of X). accepted/done are monitor cycle numbers.
+Response = namedtuple("Response", "request data accepted done")
+
+SIZE_MASKS = {1: 0b0001, 2: 0b0011, 4: 0b1111}
+
+
+class DataMemoryBFM:
+    def __init__(self, dut):
+        self.clk = dut.clk_i
+        self.addr = dut.addr_i
+        self.read_enable = dut.read_enable_i
+        self.write_enable = dut.write_enable_i
+        self.write_data = dut.write_data_i
+        self.write_mask = dut.write_mask_i
+        self.read_data = dut.read_data_o
+        self.busy = dut.busy_o
+        self.queue = deque()
+        self.on_bus = None      # Request the driver is presenting this cycle
+        self.responses = []
+        self.cycle = 0          # Falling edges the monitor has seen
+        self.outstanding = 0    # Submitted and not answered yet
+        self.idle = Event()
+        self.idle.set()
+
+    def start(self):
+        """Start the driver and monitor, call once the memory is out of reset"""
+        self.idle_bus()
+        cocotb.start_soon(self.drive())
+        cocotb.start_soon(self.monitor())
+
+    def submit(self, request):
+        if request.size not in SIZE_MASKS or request.addr % request.size:
+            raise ValueError(f"bad size or unaligned address: {request}")
+        self.queue.append(request)
+        self.outstanding += 1
+        self.idle.clear()
+
+    def read(self, addr, size=4):
+        self.submit(Request("read", addr, size, None))
+
+    def write(self, addr, data, size=4):
+        self.submit(Request("write", addr, size, data & ((1 << 8 * size) - 1)))
+
+    def write_masked(self, addr, data, mask):
+        """Write the bytes of the word at addr whose lanes are set in mask"""
+        self.submit(Request("write", addr, 4, data & 0xFFFFFFFF, mask))
+
+    async def drain(self):
+        """Wait until everything submitted so far has its response"""
+        await self.idle.wait()
+
+    def throughput(self, responses=None):
+        """Transactions per cycle, from the first acceptance to the last response"""
+        responses = self.responses if responses is None else responses
+        if not responses:
+            return 0.0
+        cycles = max(r.done for r in responses) - min(r.accepted for r in responses) + 1
+        return len(responses) / cycles
+
+    def idle_bus(self):
+        self.read_enable.value = 0
+        self.write_enable.value = 0
+
+    def put(self, request):
+        offset = request.addr & 3
+        self.addr.value = request.addr
+        self.read_enable.value = request.kind == "read"
+        self.write_enable.value = request.kind == "write"
+        if request.kind == "write":
+            self.write_data.value = (request.data << 8 * offset) & 0xFFFFFFFF
+            self.write_mask.value = SIZE_MASKS[request.size] << offset if request.mask is None else request.mask
+
+    async def drive(self):
+        falling, rising = FallingEdge(self.clk), RisingEdge(self.clk)
+        while True:
+            self.on_bus = self.queue.popleft() if self.queue else None
+            if self.on_bus is None:
+                self.idle_bus()
+            else:
+                self.put(self.on_bus)
+            await falling
+            accepted = not self.busy.value
+            await rising
+            if self.on_bus is not None and not accepted:
+                self.queue.appendleft(self.on_bus)
+
+    async def monitor(self):
+        falling = FallingEdge(self.clk)
+        pending = None          # (request, cycle) of the read accepted on the last edge
+        while True:
+            await falling
+            self.cycle += 1
+            if pending is not None:
+                request, accepted = pending
+                word = read_int(self.read_data)
+                data = None if word is None else word >> 8 * (request.addr & 3) & ((1 << 8 * request.size) - 1)
+                self.respond(Response(request, data, accepted, self.cycle))
+                pending = None
+            request = self.on_bus
+            if request is None or self.busy.value:
+                continue
+            if request.kind == "read":
+                pending = request, self.cycle
+            else:
+                self.respond(Response(request, None, self.cycle, self.cycle))
+
+    def respond(self, response):
+        self.responses.append(response)
+        self.outstanding -= 1
+        if self.outstanding == 0:
+            self.idle.set()
+
+
+class MemoryScoreboard:
+    """A bytearray model of the memory, checking read responses against it.
+
+    Responses have to come in the order the memory accepted them, as the
+    BFM records them, so each read sees the writes before it.
+    """
+
+    def __init__(self, size, contents=None):
+        self.memory = bytearray(contents if contents is not None else size)
+        self.view = memoryview(self.memory)
+        self.reads = 0
+        self.writes = 0
+        self.errors = []
+
+    def check(self, response):
+        request = response.request
+        lo, hi = request.addr, request.addr + request.size
+        if request.kind == "write":
+            self.writes += 1
+            data = request.data.to_bytes(request.size, "little")
+            if request.mask is None:
+                self.view[lo:hi] = data
+            else:
+                for lane in range(4):
+                    if request.mask >> lane & 1:
+                        self.memory[lo + lane] = data[lane]
+            return True
+        self.reads += 1
+        expected = int.from_bytes(self.view[lo:hi], "little")
+        if response.data != expected:
+            got = "X" if response.data is None else f"{response.data:0{2 * request.size}x}"
+            self.errors.append(f"cycle {response.accepted}: {request.size} byte read of {request.addr:#x} "
+                               f"returned {got}, expected {expected:0{2 * request.size}x}")
+            return False
+        return True
+
+    def check_all(self, responses):
+        """Check responses in order, returns whether they all matched"""
+        return all([self.check(response) for response in responses])
+
+    def words(self):
+        """The model's contents as little-endian words, to compare against a RAM snapshot"""
+        return list(struct.unpack(f"<{len(self.memory) // 4}I", self.memory))
@@ -0,0 +1,9 @@
+# sum_program.s
+        addi x1, x0, 10         # Set x1 = 10 (loop counter)
+        addi x2, x0, 0          # Set x2 = 0 (sum)
+loop:   add  x2, x2, x1         # x2 += x1
+        addi x1, x1, -1         # x1 -= 1
+        bnez x1, loop           # Back to loop until x1 == 0
+        sw   x2, 0(x0)          # Store the sum (55) to memory[0]
+        lw   x3, 0(x0)          # Load it back into x3
+halt:   ecall                   # Program termination
@@ -1,16 +1,34 @@
+"""data_memory tests, and the BFM throughput benchmark:
+
+    python test_data_memory_runner.py --sim verilator --throughput --transactions 100000
+"""
+import argparse
+import json
 import os
 from cocotb.runner import get_runner
 from pathlib import Path
 import pytest
 import shutil
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_cache import cached_build
+from sim_stats import timed_test
+from tb_utils import CLOCK_PERIOD_NS
+from waves import simulator_waves
 
-def run_tests():
-    sim = os.getenv("SIM", "icarus")
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}]
+
+def run_tests(sim=None, build_dir="dm_sim_build", parameters=None, results_xml=None, testcase=None,
+              extra_env=None):
+    sim = sim or os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent.parent  # Go up to toy_processor root
 
     # Specify your design sources
     sources = [
-        proj_path / "components" / "ram_1r1w_sync.sv",
+        proj_path / "components" / "ram_1r1w_sync_be.sv",
         proj_path / "src" / "memory" / "data_memory.sv"
     ]
     
@@ -27,9 +45,14 @@ def run_tests():
         "depth_p": 1024,
         "init_file": '""'  # No init file for data memory
     }
+    common_parameters.update(parameters or {})
     
+    # Full-design tracing costs every run, only WAVES=full turns it on
+    waves, trace_args = simulator_waves(sim)
+
     if sim == "icarus":
-        runner.build(
+        cached_build(
+            runner, sim, build_dir,
             verilog_sources=sources,
             hdl_toplevel="data_memory",
             build_args=common_args + [
@@ -38,41 +61,72 @@ def run_tests():
                 f"-I{proj_path}/src/memory",
             ],
             parameters=common_parameters,
-            build_dir="dm_sim_build",
-            waves=True
+            waves=waves
         )
-        runner.test(
+        return timed_test(
+            runner, sim,
+            clock_period_ns=CLOCK_PERIOD_NS,
+            results_xml=results_xml,
             hdl_toplevel="data_memory",
             test_module="data_memory_tb",
-            waves=True,
+            testcase=testcase,
+            extra_env=extra_env,
+            waves=waves,
         )
     else:  # verilator
-        runner.build(
+        cached_build(
+            runner, sim, build_dir,
             verilog_sources=sources,
             hdl_toplevel="data_memory",
             build_args=common_args + [
                 f"+incdir+{proj_path}/components",
                 f"+incdir+{proj_path}/src/memory",
                 "--relative-includes",
-                "--trace",
-                "--trace-structs"
-            ],
+            ] + trace_args,
             parameters=common_parameters,
-            build_dir="dm_sim_build",
-            waves=True
+            waves=waves
         )
-        runner.test(
+        return timed_test(
+            runner, sim,
+            clock_period_ns=CLOCK_PERIOD_NS,
+            results_xml=results_xml,
             hdl_toplevel="data_memory",
             test_module="data_memory_tb",
-            waves=True
+            testcase=testcase,
+            extra_env=extra_env,
+            waves=waves
         )
 
     
 
+def run_throughput(sim=None, build_dir="dm_sim_build", transactions=1000, results_json=None):
+    """Run test_bfm_throughput, return its results (transactions per cycle per access mix)"""
+    results_json = Path(results_json or Path(build_dir) / "throughput.json").resolve()
+    results_json.parent.mkdir(parents=True, exist_ok=True)
+    env = {"MEM_TRANSACTIONS": str(transactions), "MEM_THROUGHPUT_JSON": str(results_json)}
+    run_tests(sim, build_dir, testcase="test_bfm_throughput", extra_env=env)
+    return json.loads(results_json.read_text())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the data_memory tests or its throughput benchmark")
+    parser.add_argument("--sim", default=os.getenv("SIM", "icarus"))
+    parser.add_argument("--throughput", action="store_true", help="only run the BFM throughput benchmark")
+    parser.add_argument("--transactions", type=int, default=1000, help="transactions per access mix")
+    parser.add_argument("--out", help="throughput results JSON (default: throughput.json in the build directory)")
+    args = parser.parse_args(argv)
+
+    if not args.throughput:
+        run_tests(args.sim)
+        return 0
+    results = run_throughput(args.sim, transactions=args.transactions, results_json=args.out)
+    for mix, result in results["mixes"].items():
+        print(f"{mix:9} {result['transactions']:8} transactions {result['cycles']:8} cycles "
+              f"{result['per_cycle']:6.3f} per cycle")
+    return 0
+
 if __name__ == "__main__":
-    run_tests()
+    sys.exit(main())
 
-@pytest.mark.parametrize("simulator", ["icarus", "verilator"])
+@pytest.mark.parametrize("simulator", SIMULATORS)
 def test_data_memory_runner(simulator):
-    os.environ["SIM"] = simulator
-    run_tests()
+    run_tests(simulator)
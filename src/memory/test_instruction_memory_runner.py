@@ -3,9 +3,20 @@ from cocotb.runner import get_runner
 from pathlib import Path
 import pytest
 import shutil
+import sys
 
-def run_tests():
-    sim = os.getenv("SIM", "icarus")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from build_cache import cached_build
+from sim_stats import timed_test
+from tb_utils import CLOCK_PERIOD_NS
+from waves import simulator_waves
+
+# Jobs the regression orchestrator (src/regress.py) schedules for this runner
+SIMULATORS = ["icarus", "verilator"]
+PARAMETER_SETS = [{}]
+
+def run_tests(sim=None, build_dir="im_sim_build", parameters=None, results_xml=None):
+    sim = sim or os.getenv("SIM", "icarus")
     proj_path = Path(__file__).resolve().parent.parent.parent  # Go up to toy_processor root
 
     # Specify your design sources
@@ -27,9 +38,14 @@ def run_tests():
         "depth_p": 1024,
         "init_file_p": f'"{proj_path}/src/memory/test_program.hex"'
     }
+    common_parameters.update(parameters or {})
     
+    # Full-design tracing costs every run, only WAVES=full turns it on
+    waves, trace_args = simulator_waves(sim)
+
     if sim == "icarus":
-        runner.build(
+        cached_build(
+            runner, sim, build_dir,
             verilog_sources=sources,
             hdl_toplevel="instruction_memory",
             build_args=common_args + [
@@ -38,39 +54,41 @@ def run_tests():
                 f"-I{proj_path}/src/memory",
             ],
             parameters=common_parameters,
-            build_dir="im_sim_build",  # Add this line
-            waves=True
+            waves=waves
         )
-        runner.test(  # Move this inside the if block
+        return timed_test(  # Move this inside the if block
+            runner, sim,
+            clock_period_ns=CLOCK_PERIOD_NS,
+            results_xml=results_xml,
             hdl_toplevel="instruction_memory",
             test_module="instruction_memory_tb",
-            waves=True
+            waves=waves
         )
     else:  # verilator
-        runner.build(
+        cached_build(
+            runner, sim, build_dir,
             verilog_sources=sources,
             hdl_toplevel="instruction_memory",
             build_args=common_args + [
                 f"+incdir+{proj_path}/components",
                 f"+incdir+{proj_path}/src/memory",
                 "--relative-includes",
-                "--trace",  # Add this line
-                "--trace-structs"  # Add this line
-            ],
+            ] + trace_args,
             parameters=common_parameters,
-            build_dir="im_sim_build",
-            waves=True
+            waves=waves
         )
-        runner.test(  # Move this inside the else block
+        return timed_test(  # Move this inside the else block
+            runner, sim,
+            clock_period_ns=CLOCK_PERIOD_NS,
+            results_xml=results_xml,
             hdl_toplevel="instruction_memory",
             test_module="instruction_memory_tb",
-            waves=True
+            waves=waves
         )
 
 if __name__ == "__main__":
     run_tests()
 
-@pytest.mark.parametrize("simulator", ["icarus", "verilator"])
+@pytest.mark.parametrize("simulator", SIMULATORS)
 def test_instruction_memory_runner(simulator):
-    os.environ["SIM"] = simulator
-    run_tests()
+    run_tests(simulator)
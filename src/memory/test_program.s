@@ -0,0 +1,13 @@
+# test_program.s, source for test_program.hex
+        addi x1, x0, 5          # Set x1 = 5
+        addi x2, x0, 10         # Set x2 = 10
+        add  x3, x1, x2         # Set x3 = 15 (5 + 10)
+        sub  x4, x1, x3         # Set x4 = -10 (5 - 15)
+        addi x5, x0, 6          # Set x5 = 6
+        sw   x5, 4(x3)          # Store 6 to memory[x3+4] (byte address 19, word address 4)
+        lw   x5, 4(x3)          # Load from memory[19] into x5 (should be 6)
+        sw   x5, 0(x3)          # Store x5 to memory[15] (word address 3)
+        bne  x3, x4, halt       # Branch if x3 != x4 (branch taken)
+        addi x10, x0, 1         # Set x10 = 1 (skipped if branch taken)
+halt:   ecall                   # Program termination
+never:  addi x11, x0, 2         # Set x11 = 2 (never reached)
@@ -0,0 +1,243 @@
+"""Run every test_*_runner.py in parallel.
+
+Each (runner, simulator, parameter set) is a job with its own build and
+results directory under --out. Jobs go to a process pool longest-first,
+using the durations recorded by earlier runs, and the per-job cocotb
+results are merged into a single JUnit XML file and a JSON summary.
+Functional coverage is collected in every job (COVERAGE_DIR) and merged
+into coverage.cov with a report of the holes in coverage.txt. Jobs use
+the fast build profile unless --profile says otherwise.
+
+    python regress.py -j 8
+    python regress.py --sim verilator -k riscv_core
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+
+import sim_stats
+from build_cache import RUN_ERRORS, add_profile_argument, use_profile
+from func_coverage import merge_files
+
+SRC_DIR = Path(__file__).resolve().parent
+HISTORY_FILE = "durations.json"
+
+
+def load_runner(path):
+    # Runners import their testbench by module name and cocotb hands
+    # sys.path to the simulator, so the runner's directory must be on it
+    if str(path.parent) not in sys.path:
+        sys.path.insert(0, str(path.parent))
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def job_name(runner_path, sim, parameters):
+    name = f"{runner_path.stem[len('test_'):-len('_runner')]}-{sim}"
+    for key, value in sorted(parameters.items()):
+        name += f"-{key}={value}"
+    # Parameter values can be quoted paths, keep the name usable as a directory
+    return re.sub(r"[^\w.=-]", "_", name)
+
+
+def discover_jobs(root, sims=None, keyword=None):
+    jobs = []
+    for path in sorted(root.glob("**/test_*_runner.py")):
+        module = load_runner(path)
+        for sim in module.SIMULATORS:
+            if sims and sim not in sims:
+                continue
+            for parameters in getattr(module, "PARAMETER_SETS", [{}]):
+                name = job_name(path, sim, parameters)
+                if keyword and keyword not in name:
+                    continue
+                jobs.append({"name": name, "runner": str(path), "sim": sim, "parameters": parameters})
+    return jobs
+
+
+@contextmanager
+def redirect_output(log_path):
+    """Send this process' stdout/stderr to log_path for the duration"""
+    # Redirect the file descriptors rather than sys.stdout so the
+    # build/simulator subprocesses end up in the log as well
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = os.dup(1), os.dup(2)
+    with open(log_path, "w") as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            for fd in saved_fds:
+                os.close(fd)
+
+
+def run_job(job, out_dir, coverage=True):
+    """Run one job in the current (worker) process, output goes to job.log"""
+    job_dir = Path(out_dir) / job["name"]
+    job_dir.mkdir(parents=True, exist_ok=True)
+    results_xml = job_dir / "results.xml"
+    log_path = job_dir / "job.log"
+    coverage_dir = job_dir / "coverage"
+    if results_xml.exists():
+        results_xml.unlink()
+    shutil.rmtree(coverage_dir, ignore_errors=True)
+    # The runners hand their environment to the simulator
+    if coverage:
+        os.environ["COVERAGE_DIR"] = str(coverage_dir)
+    else:
+        os.environ.pop("COVERAGE_DIR", None)
+
+    error = None
+    first_record = len(sim_stats.RECORDS)
+    start = time.monotonic()
+    with redirect_output(log_path):
+        try:
+            module = load_runner(Path(job["runner"]))
+            module.run_tests(
+                job["sim"],
+                build_dir=job_dir / "build",
+                parameters=job["parameters"],
+                results_xml=str(results_xml),
+            )
+        except RUN_ERRORS as e:
+            error = f"{type(e).__name__}: {e}"
+
+    result = dict(job, duration=time.monotonic() - start, log=str(log_path), error=error,
+                  results_xml=str(results_xml) if results_xml.exists() else None,
+                  stats=sim_stats.RECORDS[first_record:])
+    result["tests"], result["failures"] = count_results(result)
+    return result
+
+
+def test_cases(result):
+    if result["results_xml"] is None:
+        return []
+    return list(ET.parse(result["results_xml"]).getroot().iter("testcase"))
+
+
+def is_failure(case):
+    return case.find("failure") is not None or case.find("error") is not None
+
+
+def count_results(result):
+    cases = test_cases(result)
+    failures = sum(is_failure(case) for case in cases)
+    # A job that never produced results (build error, simulator crash) counts as one failure
+    if result["error"] is not None or not cases:
+        return len(cases) + 1, failures + 1
+    return len(cases), failures
+
+
+def write_junit(results, path):
+    root = ET.Element("testsuites")
+    for result in results:
+        suite = ET.SubElement(root, "testsuite", name=result["name"],
+                              tests=str(result["tests"]), failures=str(result["failures"]),
+                              time=f"{result['duration']:.3f}")
+        for case in test_cases(result):
+            case.set("classname", f"{result['name']}.{case.get('classname', '')}")
+            suite.append(case)
+        if result["error"] is not None or not test_cases(result):
+            case = ET.SubElement(suite, "testcase", name="run_tests", classname=result["name"])
+            ET.SubElement(case, "error", message=result["error"] or "no results produced").text = \
+                f"See {result['log']}"
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def load_history(out_dir):
+    path = out_dir / HISTORY_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def save_history(out_dir, history, results):
+    for result in results:
+        history[result["name"]] = round(result["duration"], 3)
+    (out_dir / HISTORY_FILE).write_text(json.dumps(history, indent=2, sort_keys=True))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run all cocotb runners in parallel")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--sim", action="append", help="only run this simulator (repeatable)")
+    parser.add_argument("-k", dest="keyword", help="only run jobs whose name contains this")
+    parser.add_argument("--out", default=str(SRC_DIR / "regress_out"), help="build/results directory")
+    parser.add_argument("--list", action="store_true", help="list the jobs and exit")
+    parser.add_argument("--no-coverage", action="store_true", help="don't collect functional coverage")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    out_dir = Path(args.out).resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    use_profile(args.profile, args.jobs)
+    jobs = discover_jobs(SRC_DIR, args.sim, args.keyword)
+
+    # Longest first; jobs we have never timed go to the front
+    history = load_history(out_dir)
+    jobs.sort(key=lambda job: history.get(job["name"], math.inf), reverse=True)
+
+    if args.list:
+        for job in jobs:
+            print(f"{job['name']:50} {history.get(job['name'], '?')}")
+        return 0
+
+    start = time.monotonic()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(run_job, job, out_dir, not args.no_coverage) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = "PASS" if result["failures"] == 0 else "FAIL"
+            slow = " SLOW" if any(record["slow"] for record in result["stats"]) else ""
+            print(f"{status} {result['name']:50} {result['tests']:3} tests {result['duration']:7.1f}s{slow}")
+    wall_time = time.monotonic() - start
+
+    results.sort(key=lambda result: result["name"])
+    save_history(out_dir, history, results)
+    write_junit(results, out_dir / "results.xml")
+    summary = {
+        "wall_time": wall_time,
+        "profile": args.profile,
+        "tests": sum(result["tests"] for result in results),
+        "failures": sum(result["failures"] for result in results),
+        "jobs": results,
+    }
+    (out_dir / "results.json").write_text(json.dumps(summary, indent=2))
+    coverage_files = sorted(out_dir.glob("*/coverage/*.cov"))
+    if coverage_files:
+        coverage = merge_files(coverage_files)
+        coverage.save(out_dir / "coverage.cov")
+        (out_dir / "coverage.txt").write_text(coverage.report() + "\n")
+
+    print(f"{summary['tests']} tests, {summary['failures']} failures, "
+          f"{len(results)} jobs in {wall_time:.1f}s ({args.jobs} workers, {args.profile} builds)")
+    slow = [result["name"] for result in results if any(record["slow"] for record in result["stats"])]
+    if slow:
+        print(f"Slower than their throughput baseline: {', '.join(slow)} (python sim_stats.py)")
+    if coverage_files:
+        hit, bins = coverage.counts()
+        print(f"Functional coverage: {hit}/{bins} bins from {len(coverage_files)} runs ({out_dir / 'coverage.txt'})")
+    print(f"Reports: {out_dir / 'results.xml'}, {out_dir / 'results.json'}")
+    return 1 if summary["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Simulation throughput history for the cocotb runners.
+
+timed_test() wraps runner.test(): it times the run, reads simulated time
+out of the results file and appends one JSON line per run to the history
+file, together with the build time cached_build() recorded on the runner.
+Runners pass the period of their testbench's clock, which is recorded
+with the run and turns simulated time into cycles. Combinational
+testbenches have no clock and only record simulated time.
+Each run is compared against the median throughput of the last runs of
+the same (toplevel, test module, testcase, simulator, build profile) and
+flagged when it is more than SIM_SLOW_THRESHOLD slower.
+
+    SIM_HISTORY=path       history file (default src/sim_history.jsonl, empty disables it)
+    SIM_SLOW_THRESHOLD=0.25  fraction below the baseline that counts as slow
+    SIM_BASELINE_RUNS=10   how many earlier runs make up the baseline
+
+    python sim_stats.py    # latest run of every key against its baseline
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent
+DEFAULT_HISTORY = SRC_DIR / "sim_history.jsonl"
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_BASELINE_RUNS = 10
+
+# Records written by this process, regress.py reports the slow ones
+RECORDS = []
+
+
+def history_path():
+    path = os.getenv("SIM_HISTORY")
+    if path is None:
+        return DEFAULT_HISTORY
+    return Path(path) if path else None
+
+
+def read_results(results_xml):
+    """(tests, failures, simulated ns) from a cocotb results file"""
+    tests = failures = 0
+    sim_time_ns = 0.0
+    for case in ET.parse(results_xml).getroot().iter("testcase"):
+        tests += 1
+        failures += case.find("failure") is not None or case.find("error") is not None
+        sim_time_ns += float(case.get("sim_time_ns", 0))
+    return tests, failures, sim_time_ns
+
+
+def run_key(record):
+    # Runs from before build profiles were recorded were debug builds
+    return (record["toplevel"], record["test_module"], record["testcase"], record["sim"],
+            record.get("profile", "debug"))
+
+
+def load_history(path):
+    if path is None or not Path(path).exists():
+        return []
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass  # a run killed halfway through its write
+    return records
+
+
+def baseline(record, history, runs=DEFAULT_BASELINE_RUNS):
+    """Median cycles/s of the last passing runs like this one, None without any"""
+    key = run_key(record)
+    rates = [old["cycles_per_second"] for old in history
+             if run_key(old) == key and not old["failures"] and old["cycles_per_second"]]
+    return statistics.median(rates[-runs:]) if rates else None
+
+
+def is_slow(record, baseline_rate, threshold=DEFAULT_THRESHOLD):
+    if not baseline_rate or not record["cycles_per_second"]:
+        return False
+    return record["cycles_per_second"] < baseline_rate * (1 - threshold)
+
+
+def append_record(path, record):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One write per line, parallel regression jobs append to the same file
+    with open(path, "a") as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def timed_test(runner, sim, clock_period_ns=None, **test_kwargs):
+    """runner.test() that also records how fast the simulation ran, in cycles of clock_period_ns"""
+    start = time.monotonic()
+    try:
+        return runner.test(**test_kwargs)
+    finally:
+        test_seconds = time.monotonic() - start
+        # test() picks the file name (it differs under pytest), and the
+        # file isn't there when the simulator never started
+        results_xml = Path(getattr(runner, "env", {}).get("COCOTB_RESULTS_FILE", ""))
+        if results_xml.is_file():
+            record_run(runner, sim, test_kwargs, test_seconds, results_xml, clock_period_ns)
+
+
+def record_run(runner, sim, test_kwargs, test_seconds, results_xml, clock_period_ns=None):
+    tests, failures, sim_time_ns = read_results(results_xml)
+    cycles = int(sim_time_ns // clock_period_ns) if clock_period_ns else None
+    testcase = test_kwargs.get("testcase")
+    record = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": socket.gethostname(),
+        "toplevel": test_kwargs.get("hdl_toplevel"),
+        "test_module": test_kwargs.get("test_module"),
+        "testcase": testcase if isinstance(testcase, str) or testcase is None else ",".join(testcase),
+        "sim": sim,
+        "profile": getattr(runner, "build_profile", None),
+        "build_seconds": round(getattr(runner, "build_seconds", 0.0), 3),
+        "build_cached": getattr(runner, "build_cached", False),
+        "test_seconds": round(test_seconds, 3),
+        "tests": tests,
+        "failures": failures,
+        "sim_time_ns": sim_time_ns,
+        "clock_period_ns": clock_period_ns,
+        "cycles": cycles,
+        "cycles_per_second": round(cycles / test_seconds, 1) if cycles is not None and test_seconds > 0 else None,
+    }
+
+    path = history_path()
+    history = load_history(path)
+    threshold = float(os.getenv("SIM_SLOW_THRESHOLD", DEFAULT_THRESHOLD))
+    record["baseline_cycles_per_second"] = baseline(
+        record, history, int(os.getenv("SIM_BASELINE_RUNS", DEFAULT_BASELINE_RUNS)))
+    record["slow"] = is_slow(record, record["baseline_cycles_per_second"], threshold)
+
+    print(f"INFO: {record['toplevel']}/{sim} ({record['profile']}): build {record['build_seconds']:.1f}s"
+          f"{' (cached)' if record['build_cached'] else ''}, test {test_seconds:.1f}s, "
+          + (f"{cycles} cycles, {record['cycles_per_second'] or 0:.0f} cycles/s" if cycles is not None
+             else f"{sim_time_ns:.0f} ns simulated"))
+    if record["slow"]:
+        print(f"WARNING: {record['toplevel']}/{sim} ran at {record['cycles_per_second']:.0f} cycles/s, "
+              f"more than {threshold:.0%} below its baseline of "
+              f"{record['baseline_cycles_per_second']:.0f} cycles/s")
+    if path is not None:
+        append_record(path, record)
+    RECORDS.append(record)
+    return record
+
+
+def format_table(history):
+    latest = {}
+    for index, record in enumerate(history):
+        latest[run_key(record)] = index
+    lines = [f"{'toplevel':22} {'test module':22} {'testcase':16} {'sim':10} {'profile':8} {'build s':>8} "
+             f"{'test s':>8} {'cycles':>9} {'cycles/s':>10} {'baseline':>10}"]
+    for key, index in sorted(latest.items(), key=lambda item: [str(part) for part in item[0]]):
+        record = history[index]
+        base = baseline(record, history[:index])
+        lines.append(f"{record['toplevel']:22} {record['test_module']:22} {record['testcase'] or '':16} "
+                     f"{record['sim']:10} {record.get('profile', 'debug'):8} {record['build_seconds']:8.1f} {record['test_seconds']:8.1f} "
+                     f"{record['cycles'] or 0:9} {record['cycles_per_second'] or 0:10.0f} "
+                     f"{base or 0:10.0f}{'  SLOW' if record['slow'] else ''}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latest simulation throughput against the baseline")
+    parser.add_argument("--history", default=str(history_path() or DEFAULT_HISTORY), help="history file")
+    args = parser.parse_args(argv)
+    history = load_history(args.history)
+    if not history:
+        print(f"No runs recorded in {args.history}")
+        return 0
+    print(format_table(history))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Helpers shared by the cocotb testbenches.
+
+Reading values: read_int() gives None for anything with X/Z bits,
+resolve_x() raises instead, both can convert to signed. Handles and
+ArrayReader look hierarchy paths up once, so monitors that sample every
+cycle don't pay for dut.a.b.c each time. read_registers()/read_memory()
+snapshot a whole register file or memory range in one call, as Python
+ints or as a NumPy uint32 array.
+"""
+from cocotb.binary import BinaryValue
+from cocotb.triggers import RisingEdge
+
+# Reset inputs go by either name in this repo
+RESET_NAMES = ("rst_i", "reset_i")
+# The clock every clocked testbench drives, the runners' sim_stats count cycles of it
+CLOCK_PERIOD_NS = 10
+
+
+def to_signed(value, bits=32):
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def to_unsigned(value, bits=32):
+    return value & ((1 << bits) - 1)
+
+
+def binstr(handle):
+    """Raw 0/1/x/z string of a signal"""
+    # Going straight to the GPI handle skips building a BinaryValue per read
+    raw = getattr(handle, "_handle", None)
+    if raw is not None and hasattr(raw, "get_signal_val_binstr"):
+        return raw.get_signal_val_binstr()
+    return handle.value.binstr
+
+
+def read_int(handle, signed=False):
+    """Integer value of a handle, None if it has X/Z bits"""
+    bits = binstr(handle)
+    try:
+        value = int(bits, 2)
+    except ValueError:
+        return None
+    return to_signed(value, len(bits)) if signed else value
+
+
+def resolve_x(value, signed=False):
+    """Integer from a handle's value, raises ValueError if it has X/Z bits"""
+    if isinstance(value, BinaryValue):
+        value = value.integer
+    value = int(value)
+    return to_signed(value) if signed else value
+
+
+async def reset(dut, cycles=2):
+    """Hold rst_i/reset_i high for `cycles` clocks, return one clock after releasing it"""
+    rst = next(getattr(dut, name) for name in RESET_NAMES if hasattr(dut, name))
+    rst.value = 1
+    for _ in range(cycles):
+        await RisingEdge(dut.clk_i)
+    rst.value = 0
+    await RisingEdge(dut.clk_i)
+
+
+class Handles:
+    """Hierarchy lookups done once: handles = Handles(dut); handles["reg_file.registers"]"""
+
+    def __init__(self, dut):
+        self.dut = dut
+        self.cache = {}
+
+    def __getitem__(self, path):
+        handle = self.cache.get(path)
+        if handle is None:
+            handle = self.dut
+            for name in path.split("."):
+                handle = getattr(handle, name)
+            self.cache[path] = handle
+        return handle
+
+
+class ArrayReader:
+    """Reads a range of an unpacked array (register file, RAM) through cached element handles"""
+
+    def __init__(self, array, start=0, count=None):
+        count = len(array) - start if count is None else count
+        if start < 0 or start + count > len(array):
+            raise IndexError(f"{start}..{start + count - 1} is outside {array._name}[0..{len(array) - 1}]")
+        self.elements = [array[i] for i in range(start, start + count)]
+
+    def read(self, x=None):
+        """Element values as ints, `x` in place of any with X/Z bits"""
+        values = []
+        for element in self.elements:
+            value = read_int(element)
+            values.append(x if value is None else value)
+        return values
+
+    def read_array(self):
+        """Element values as a uint32 NumPy array, X/Z read as 0"""
+        # Imported here, it adds seconds to every simulator start otherwise
+        import numpy as np
+        return np.array(self.read(x=0), dtype=np.uint32)
+
+
+def read_registers(dut, signed=False, x=None):
+    """All 32 registers of a core's register file"""
+    values = ArrayReader(dut.reg_file.registers).read(x)
+    if signed:
+        values = [value if value is None else to_signed(value) for value in values]
+    return values
+
+
+def read_memory(mem, start=0, count=None, x=0, numpy=False):
+    """Words start..start+count-1 of a RAM's mem array, X/Z read as `x`"""
+    reader = ArrayReader(mem, start, count)
+    return reader.read_array() if numpy else reader.read(x)
@@ -0,0 +1,447 @@
+"""Waveform capture, off unless WAVES asks for it.
+
+    WAVES=full             the simulator dumps the whole design to FST
+    WAVES=cycles:1000-2000 only clock cycles 1000..2000 of each test
+    WAVES=pc:0x40-0x80     from the core retiring pc 0x40 until it retires 0x80
+    WAVES=failure:500      the last 500 cycles before a test fails, nothing if it passes
+    WAVES_SCOPE=reg_file,perf  what the windowed modes record (default: the
+                           top level's own signals), each scope with everything below it
+    WAVES_DIR=path         where the windowed modes write (default: the simulator's directory)
+
+"full" is a build option, simulator_waves() gives the runners what to pass
+to cached_build() and runner.test(). For the other modes icarus is built
+with the waves_dump module and a DumpGate switches its dump on for each
+test's window only ("failure": for the whole test), then cuts the test's
+part out of it. Verilator can't switch cocotb's trace at run time, there a
+WaveRecorder samples the chosen scopes from Python on both clock edges.
+Either way each test gets its own file, FST through GTKWave's vcd2fst when
+that is installed, gzip compressed VCD otherwise. Tests opt in with the
+record_waves decorator:
+
+    @cocotb.test()
+    @record_waves
+    async def test_something(dut):
+"""
+import functools
+import gzip
+import os
+import re
+import shutil
+import subprocess
+from collections import deque
+from pathlib import Path
+
+import cocotb
+from cocotb import simulator
+from cocotb.handle import HierarchyObject, ModifiableObject, NonHierarchyIndexableObject, RealObject, SimHandle
+from cocotb.triggers import Edge, FallingEdge, ReadOnly, Timer
+from cocotb.utils import get_sim_time
+
+from build_cache import DEFAULT_PROFILE, build_profile
+from tb_utils import Handles, binstr, read_int
+
+MODES = ("full", "cycles", "pc", "failure")
+# Verilator only traces when built for it, icarus gets its dump module from cocotb
+TRACE_ARGS = {"verilator": ["--trace-fst", "--trace-structs"]}
+# The windowed modes' dump on icarus, and the file it writes in the simulator's directory
+DUMP_MODULE = Path(__file__).resolve().parent / "waves_dump.v"
+RAW_DUMP = "waves_raw.vcd"
+UNIT_FS = {"s": 10**15, "ms": 10**12, "us": 10**9, "ns": 10**6, "ps": 10**3, "fs": 1}
+
+
+def parse_range(text):
+    start, _, end = text.partition("-")
+    return int(start, 0), int(end or start, 0)
+
+
+def parse_waves(spec=None):
+    """(mode, argument) from a WAVES value, (None, None) when waves are off"""
+    spec = os.getenv("WAVES", "") if spec is None else spec
+    if spec in ("", "0"):
+        return None, None
+    if spec == "1":
+        spec = "full"
+    mode, _, argument = spec.partition(":")
+    if mode not in MODES:
+        raise ValueError(f"WAVES={spec!r}: mode must be one of {', '.join(MODES)}")
+    if mode == "full":
+        return mode, None
+    if not argument:
+        example = "500" if mode == "failure" else "0-100"
+        raise ValueError(f"WAVES={spec!r} needs an argument, e.g. {mode}:{example}")
+    return mode, int(argument, 0) if mode == "failure" else parse_range(argument)
+
+
+def waves_scopes():
+    return [scope for scope in os.getenv("WAVES_SCOPE", "").split(",") if scope]
+
+
+def dump_args(toplevel):
+    """icarus build arguments adding waves_dump for the WAVES_SCOPE scopes of `toplevel`"""
+    scopes = waves_scopes()
+    # Without scopes only the top level's own signals, like WaveRecorder
+    levels, names = (0, [f"{toplevel}.{scope}" for scope in scopes]) if scopes else (1, [toplevel])
+    return ["-s", "waves_dump", f"-DWAVES_LEVELS={levels}", f"-DWAVES_SCOPES={','.join(names)}",
+            str(DUMP_MODULE)]
+
+
+def simulator_waves(sim, toplevel=None):
+    """(waves, extra build_args) for a runner.
+
+    Full-design tracing only with WAVES=full, the windowed modes add
+    waves_dump to icarus builds of `toplevel` (whatever the profile, it
+    costs nothing while it is switched off).
+    """
+    mode, _ = parse_waves()
+    if mode not in (None, "full"):
+        return False, dump_args(toplevel) if sim == "icarus" and toplevel else []
+    # Throughput builds never trace
+    if mode != "full" or build_profile() != DEFAULT_PROFILE:
+        return False, []
+    return True, TRACE_ARGS.get(sim, [])
+
+
+def collect_signals(handle, path, recursive):
+    """(path, handle) of every signal under a hierarchy handle"""
+    signals = []
+    for child in sorted(handle, key=lambda child: child._name):
+        name = f"{path}.{child._name}" if path else child._name
+        if isinstance(child, HierarchyObject):
+            if recursive:
+                signals += collect_signals(child, name, recursive)
+        elif isinstance(child, NonHierarchyIndexableObject):
+            signals += [(f"{name}({i})", child[i]) for i in range(len(child))]
+        elif isinstance(child, ModifiableObject) and not isinstance(child, RealObject):
+            signals.append((name, child))
+    return signals
+
+
+def vcd_id(index):
+    """Short printable VCD identifier for the index-th signal"""
+    chars = ""
+    index += 1
+    while index:
+        index, digit = divmod(index - 1, 94)
+        chars += chr(33 + digit)
+    return chars
+
+
+class VCDWriter:
+    def __init__(self, path, top, signals, widths):
+        self.file = gzip.open(path, "wt", compresslevel=1) if str(path).endswith(".gz") else open(path, "w")
+        self.ids = [vcd_id(i) for i in range(len(signals))]
+        self.widths = widths
+        self.last = [None] * len(signals)
+        self.file.write("$timescale 1ps $end\n")
+        self.write_scopes(top, signals)
+        self.file.write("$enddefinitions $end\n")
+
+    def write_scopes(self, top, signals):
+        scope = []
+        for (name, _), id_, width in zip(signals, self.ids, self.widths):
+            *parents, leaf = [top] + name.split(".")
+            common = 0
+            while common < min(len(scope), len(parents)) and scope[common] == parents[common]:
+                common += 1
+            self.file.write("$upscope $end\n" * (len(scope) - common))
+            for parent in parents[common:]:
+                self.file.write(f"$scope module {parent} $end\n")
+            scope = parents
+            self.file.write(f"$var wire {width} {id_} {leaf} $end\n")
+        self.file.write("$upscope $end\n" * len(scope))
+
+    def sample(self, time_ps, values):
+        changes = []
+        for i, value in enumerate(values):
+            if value != self.last[i]:
+                self.last[i] = value
+                changes.append(f"{value}{self.ids[i]}" if self.widths[i] == 1 else f"b{value} {self.ids[i]}")
+        if changes:
+            self.file.write(f"#{time_ps}\n" + "\n".join(changes) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class PCWindow:
+    """Whether the current cycle is inside a WAVES=pc window, from what the core retires"""
+
+    def __init__(self, dut, start, stop):
+        if not hasattr(dut, "retire_pc"):
+            raise ValueError(f"WAVES=pc needs a core, {dut._name} has no retire_pc")
+        self.retire, self.retire_pc = dut.retire, dut.retire_pc
+        self.start, self.stop = start, stop
+        self.recording = False
+
+    def __call__(self):
+        if read_int(self.retire):
+            pc = read_int(self.retire_pc)
+            if pc == self.start:
+                self.recording = True
+            elif pc == self.stop and self.recording:
+                self.recording = False
+                return True  # Include the stop instruction itself
+        return self.recording
+
+
+class WaveRecorder:
+    """Samples a set of signals on both clock edges into a VCD file.
+
+    mode is "cycles" (argument: (first, last) cycle), "pc" (argument:
+    (start, stop) retire_pc of the core) or "failure" (argument: cycles to
+    keep). Each sample is taken once the edge has settled, at the edge's
+    own time. Start run() with cocotb.start_soon() and await close() at
+    the end of the test.
+    """
+
+    def __init__(self, dut, path, mode, argument, scopes=()):
+        self.clk = dut.clk_i
+        self.path = Path(path)
+        self.mode, self.argument = mode, argument
+        handles = Handles(dut)
+        if scopes:
+            self.signals = []
+            for scope in scopes:
+                self.signals += collect_signals(handles[scope], scope, recursive=True)
+        else:
+            self.signals = collect_signals(dut, "", recursive=False)
+        self.handles = [handle for _, handle in self.signals]
+        self.top = dut._name
+        self.window = PCWindow(dut, *argument) if mode == "pc" else None
+        # Two samples a cycle
+        self.ring = deque(maxlen=2 * argument) if mode == "failure" else None
+        self.writer = None
+        self.cycle = 0
+        self.keep = False
+
+    def read(self):
+        return [binstr(handle) for handle in self.handles]
+
+    def open(self, first_values):
+        widths = [len(value) for value in first_values]
+        self.writer = VCDWriter(self.path, self.top, self.signals, widths)
+
+    def record(self, time_ps, values):
+        if self.writer is None:
+            self.open(values)
+        self.writer.sample(time_ps, values)
+
+    def triggered(self):
+        """Whether this cycle is recorded, for the cycle and PC windows"""
+        if self.mode == "cycles":
+            first, last = self.argument
+            return first <= self.cycle <= last
+        return self.window()
+
+    async def run(self):
+        edge, settled = Edge(self.clk), ReadOnly()
+        while True:
+            await edge
+            await settled
+            if self.clk.value:
+                self.cycle += 1
+                self.keep = self.triggered()
+            if self.ring is not None:
+                self.ring.append((get_sim_time("ps"), self.read()))
+            elif self.keep:
+                self.record(get_sim_time("ps"), self.read())
+            elif self.mode == "cycles" and self.cycle > self.argument[1]:
+                return  # Past the window, stop paying for the callback
+
+    async def close(self, failed=False):
+        """Finish the file, returns its path (None if nothing was recorded)"""
+        if self.ring is not None and failed:
+            for time_ps, values in self.ring:
+                self.record(time_ps, values)
+        if self.writer is None:
+            return None
+        self.writer.close()
+        return to_fst(self.path)
+
+
+class RawDump:
+    """waves_dump's VCD, read one test's part at a time while the simulation writes it"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        lines = []
+        for line in iter(self.file.readline, b""):
+            lines.append(line)
+            if b"$enddefinitions" in line:
+                break
+        self.header = b"".join(lines)
+        number, unit = re.search(rb"\$timescale\s+(\d+)\s*([munpf]?s)", self.header).groups()
+        self.unit_fs = int(number) * UNIT_FS[unit.decode()]
+
+    def read(self):
+        """Everything dumped since the last read"""
+        return self.file.read()
+
+
+raw_dump = None
+
+
+def cut_vcd(body, start):
+    """The part of a VCD body from time `start` on, opening with the values at `start`"""
+    values = {}
+    out = []
+    for line in body.splitlines(keepends=True):
+        if out:
+            out.append(line)
+        elif line.startswith(b"#"):
+            time = int(line[1:])
+            if time >= start:
+                out.append(b"#%d\n$dumpvars\n%b$end\n" % (start, b"".join(values.values())))
+                if time > start:
+                    out.append(line)
+        elif line[:1] in b"01xzXZ":
+            values[line[1:].strip()] = line
+        elif line[:1] in b"bBrR":
+            values[line.split()[-1]] = line
+    if not out:
+        out.append(b"#%d\n$dumpvars\n%b$end\n" % (start, b"".join(values.values())))
+    return b"".join(out)
+
+
+class DumpGate:
+    """Switches the simulator's own dump (waves_dump) on for one test's window.
+
+    Same modes and arguments as WaveRecorder, but the simulator does the
+    dumping: Python only switches it, and reads retire_pc every cycle for
+    "pc". close() cuts the test's part out of waves_raw.vcd into its own
+    file, for "failure" only the last cycles and only if the test failed.
+    Start run() with cocotb.start_soon() and await close() at the end of
+    the test.
+    """
+
+    def __init__(self, dut, module, path, mode, argument):
+        self.clk = dut.clk_i
+        self.module = module
+        self.path = Path(path)
+        self.mode, self.argument = mode, argument
+        self.window = PCWindow(dut, *argument) if mode == "pc" else None
+        self.start = get_sim_time("step")
+        self.period = None
+        self.on = False
+        self.recorded = False
+
+    def switch(self, on):
+        if on != self.on:
+            self.on = on
+            self.recorded |= on
+            self.module.dump_on.value = int(on)
+
+    async def run(self):
+        edge = FallingEdge(self.clk)
+        if self.mode == "failure":
+            self.switch(True)
+        # The period from the first two cycles, windows further on are waited for with a Timer
+        cycle, times = 0, []
+        while True:
+            await edge
+            cycle += 1
+            times.append(get_sim_time("step"))
+            if self.mode == "pc":
+                self.switch(self.window())
+            elif self.mode == "cycles":
+                first, last = self.argument
+                self.switch(first <= cycle <= last)
+            if cycle == 2:
+                break
+        self.period = times[1] - times[0]
+        if self.mode == "pc":
+            while True:
+                await edge
+                self.switch(self.window())
+        elif self.mode == "cycles":
+            first, last = self.argument
+            for switch_cycle in (first, last + 1):
+                if switch_cycle > cycle:
+                    await Timer(times[0] + (switch_cycle - 1) * self.period - get_sim_time("step"), units="step")
+                    cycle = switch_cycle
+                    self.switch(first <= cycle <= last)
+
+    async def close(self, failed=False):
+        """Finish the file, returns its path (None if nothing was recorded)"""
+        global raw_dump
+        self.task.kill()
+        if self.on:
+            self.switch(False)
+            await Timer(1, units="step")  # For waves_dump to switch off and flush
+        if not self.recorded:
+            return None
+        if raw_dump is None:
+            raw_dump = RawDump(RAW_DUMP)
+        body = raw_dump.read()
+        if self.mode == "failure":
+            if not failed:
+                return None
+            # From the step to the dump's timescale
+            scale = get_sim_time("fs") / get_sim_time("step") / raw_dump.unit_fs
+            start = self.start
+            if self.period is not None:
+                start = max(start, get_sim_time("step") - self.argument * self.period)
+            body = cut_vcd(body, round(start * scale))
+        with (gzip.open if self.path.suffix == ".gz" else open)(self.path, "wb") as f:
+            f.write(raw_dump.header)
+            f.write(body)
+        return to_fst(self.path)
+
+
+def to_fst(vcd_path):
+    """Convert a plain VCD to FST if vcd2fst is around, return the file kept"""
+    tool = shutil.which("vcd2fst")
+    if tool is None or vcd_path.suffix != ".vcd":
+        return vcd_path
+    fst_path = vcd_path.with_suffix(".fst")
+    if subprocess.run([tool, str(vcd_path), str(fst_path)], capture_output=True).returncode != 0:
+        return vcd_path
+    vcd_path.unlink()
+    return fst_path
+
+
+def dump_module():
+    """waves_dump's handle, None unless this is an icarus build with it"""
+    if "icarus" not in cocotb.SIM_NAME.lower():
+        return None
+    handle = simulator.get_root_handle("waves_dump")
+    return None if handle is None else SimHandle(handle)
+
+
+def start_waves(dut, name):
+    """A running DumpGate or WaveRecorder for the windowed WAVES modes, None otherwise"""
+    mode, argument = parse_waves()
+    if mode in (None, "full"):
+        return None
+    out_dir = Path(os.getenv("WAVES_DIR") or ".")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # FST is compressed already, without vcd2fst compress the VCD instead
+    suffix = ".vcd" if shutil.which("vcd2fst") else ".vcd.gz"
+    path = out_dir / f"{name}{suffix}"
+    module = dump_module()
+    if module is not None:
+        recorder = DumpGate(dut, module, path, mode, argument)
+    else:
+        recorder = WaveRecorder(dut, path, mode, argument, waves_scopes())
+    recorder.task = cocotb.start_soon(recorder.run())
+    return recorder
+
+
+def record_waves(test):
+    """Decorator for cocotb tests, records waves as WAVES says and tells the recorder whether it failed"""
+    @functools.wraps(test)
+    async def wrapper(dut, *args, **kwargs):
+        recorder = start_waves(dut, test.__name__)
+        if recorder is None:
+            return await test(dut, *args, **kwargs)
+        try:
+            result = await test(dut, *args, **kwargs)
+        except BaseException:
+            path = await recorder.close(failed=True)
+            dut._log.info(f"Waves of the failure: {path}")
+            raise
+        path = await recorder.close()
+        if path:
+            dut._log.info(f"Waves: {path}")
+        return result
+    return wrapper
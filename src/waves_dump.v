@@ -0,0 +1,26 @@
+`timescale 1ns/1ps
+
+// The simulator's own dump for the windowed WAVES modes on icarus (see
+// waves.py). Built in as a second top level, it dumps WAVES_SCOPES to
+// waves_raw.vcd, off until the testbench sets dump_on. Every switch off
+// flushes the file so the testbench can cut each test's part out of it.
+// Simulation only.
+module waves_dump;
+    reg dump_on = 1'b0;
+
+    initial begin
+        $dumpfile("waves_raw.vcd");
+        $dumpvars(`WAVES_LEVELS, `WAVES_SCOPES);
+        $dumpoff;
+    end
+
+    always @(dump_on) begin
+        if (dump_on) begin
+            $dumpon;
+        end else begin
+            $dumpoff;
+            $dumpflush;
+        end
+    end
+
+endmodule